@@ -0,0 +1,72 @@
+"""
+Compare the pitch/tempo shift modes of QuantizeRenderer.pitch_shift, and analytic beat rescaling with beat tracking
+after the shift.
+
+Usage:
+    python benchmarks/pitch_shift_benchmark.py [audio_file] [--target-bpm 128] [--repeat 3]
+
+Without an audio file, a 60 s synthetic loop at 125 BPM is used.
+"""
+import argparse
+import os
+import sys
+import time
+import librosa
+import numpy as np
+from technob.audio.quantize import QuantizeAnalysis, QuantizeRenderer
+
+# The synthetic loop is shared with the stretch benchmark, next to this script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stretch_benchmark import synthetic_loop  # noqa: E402
+
+
+def best_time(run, repeat):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_file", nargs="?")
+    parser.add_argument("--target-bpm", type=float, default=128.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.audio_file:
+        audio_data, sample_rate = librosa.load(args.audio_file, sr=None)
+    else:
+        sample_rate = 22050
+        audio_data = synthetic_loop(sample_rate)
+    duration = len(audio_data) / sample_rate
+    analysis = QuantizeAnalysis.from_audio(audio_data, sample_rate)
+    semitones = 12 * np.log2(args.target_bpm / analysis.tempo)
+    print(f"{duration:.1f} s of audio at {sample_rate} Hz, {analysis.tempo:.2f} -> {args.target_bpm:g} BPM")
+
+    renderer = QuantizeRenderer("phase_vocoder")
+    modes = {
+        "varispeed": dict(mode="varispeed"),
+        "quality (key kept)": dict(mode="quality"),
+        f"quality ({semitones:+.2f} st)": dict(mode="quality", semitones=semitones),
+    }
+    for name, kwargs in modes.items():
+        elapsed, shifted = best_time(
+            lambda: renderer.pitch_shift(audio_data, sample_rate, analysis.tempo, args.target_bpm, **kwargs),
+            args.repeat)
+        print(f"{name:>22}: {elapsed:.3f} s ({duration / elapsed:.0f}x real time)")
+
+    shifted = renderer.pitch_shift(audio_data, sample_rate, analysis.tempo, args.target_bpm)
+    elapsed, rescaled = best_time(lambda: analysis.rescaled(len(shifted)), args.repeat)
+    print(f"{'rescale beats':>22}: {elapsed * 1000:.2f} ms, tempo {rescaled.tempo:.2f}")
+    elapsed, tracked = best_time(lambda: QuantizeAnalysis.from_audio(shifted, sample_rate), 1)
+    n_beats = min(len(tracked.beat_frames), len(rescaled.beat_frames))
+    error = np.median(np.abs(tracked.beat_frames[:n_beats] - rescaled.beat_frames[:n_beats])) / sample_rate
+    print(f"{'track beats again':>22}: {elapsed:.3f} s, tempo {tracked.tempo:.2f}, "
+          f"median beat difference {error * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
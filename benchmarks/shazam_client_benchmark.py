@@ -0,0 +1,56 @@
+"""
+Time concurrent recognitions of AsyncShazamClient against a local mock of the recognition API, which answers each
+request after a fixed delay.
+
+Usage:
+    python benchmarks/shazam_client_benchmark.py [--requests 24] [--delay 0.1]
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from technob.audio.search.shazam.algorithm import VectorizedSignatureGenerator
+from technob.audio.search.shazam.client import AsyncShazamClient
+
+
+async def run(n_requests, delay):
+    async def handle(request):
+        await request.json()
+        await asyncio.sleep(delay)
+        return web.json_response({"track": {"title": "Song", "subtitle": "Artist"}})
+
+    app = web.Application()
+    app.router.add_post("/tag/{first}/{second}", handle)
+    server = TestServer(app)
+    await server.start_server()
+    api_url = f"http://{server.host}:{server.port}/tag/%s/%s"
+
+    generator = VectorizedSignatureGenerator()
+    generator.feed_input(np.random.default_rng(0).normal(0, 3000, n_requests * 3 * 16000).astype(np.int16))
+    generator.MAX_TIME_SECONDS = 3
+    signatures = [generator.get_next_signature() for _ in range(n_requests)]
+    try:
+        for max_concurrency in (1, 4, 8):
+            async with AsyncShazamClient(max_concurrency=max_concurrency, requests_per_second=None,
+                                         api_url=api_url) as client:
+                start = time.perf_counter()
+                await client.recognize_many(signatures)
+                elapsed = time.perf_counter() - start
+            print(f"{max_concurrency:>2} in flight: {elapsed:.3f} s for {n_requests} requests "
+                  f"(serial lower bound {n_requests * delay:.1f} s)")
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=24)
+    parser.add_argument("--delay", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.delay))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare the list-based and vectorized Shazam signature generators on a synthetic clip, and time the binary codec
+of the signatures.
+
+Usage:
+    python benchmarks/signature_benchmark.py [--seconds 120] [--repeat 3]
+"""
+import argparse
+import time
+import numpy as np
+from technob.audio.search.shazam.algorithm import SignatureGenerator, VectorizedSignatureGenerator
+from technob.audio.search.shazam.signature_format import DecodedMessage
+
+
+def synthetic_clip(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * 16000)) / 16000
+    clip = 0.02 * rng.normal(size=len(t))
+    for _ in range(int(4 * seconds)):
+        start, duration = rng.uniform(0, seconds), rng.uniform(0.1, 1.5)
+        clip += rng.uniform(0.05, 0.3) * np.sin(2 * np.pi * rng.uniform(200, 6000) * t) * ((t > start) & (t < start + duration))
+    return np.clip(clip * 8000, -32768, 32767).astype(np.int16)
+
+
+def generate_signatures(generator, samples):
+    generator.feed_input(samples)
+    generator.MAX_TIME_SECONDS = 3.1
+    result = []
+    while True:
+        signature = generator.get_next_signature()
+        if not signature:
+            return result
+        result.append(signature)
+
+
+def best_time(run, repeat):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = run()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=120.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    samples = synthetic_clip(args.seconds)
+    duration = len(samples) / 16000
+    generators = {"list-based": SignatureGenerator, "vectorized": VectorizedSignatureGenerator}
+    for name, generator_class in generators.items():
+        best, signatures = best_time(lambda: generate_signatures(generator_class(), samples), args.repeat)
+        print(f"{name:>12} generator: {best:.3f} s for {duration:.0f} s of audio ({duration / best:.0f}x real time), "
+              f"{len(signatures)} signatures")
+
+    best, encoded = best_time(lambda: [signature.encode_to_binary() for signature in signatures], args.repeat)
+    print(f"{'encode':>12}: {1e3 * best / len(signatures):.3f} ms per signature")
+    best, _ = best_time(lambda: [DecodedMessage.decode_from_binary(data) for data in encoded], args.repeat)
+    print(f"{'decode':>12}: {1e3 * best / len(signatures):.3f} ms per signature")
+
+
+if __name__ == "__main__":
+    main()
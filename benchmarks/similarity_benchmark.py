@@ -0,0 +1,57 @@
+"""
+Time searches and insertions of the SimilarityIndex modes on clustered synthetic embeddings.
+
+Usage:
+    python benchmarks/similarity_benchmark.py [--tracks 5000] [--dim 64] [--repeat 3]
+"""
+import argparse
+import time
+import numpy as np
+from technob.audio.search.similarity import SimilarityIndex
+
+
+def clustered_embeddings(n_tracks, dim, n_clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    vectors = centers[rng.integers(0, n_clusters, n_tracks)] + 0.3 * rng.normal(size=(n_tracks, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    vectors = clustered_embeddings(args.tracks, args.dim)
+    ids = [f"track-{i}" for i in range(args.tracks)]
+    queries = vectors[np.random.default_rng(1).integers(0, args.tracks, 100)]
+    n_inserted = min(1000, args.tracks // 5)
+
+    indexes = {
+        "exact": SimilarityIndex(args.dim),
+        "ivf": SimilarityIndex(args.dim, mode="ivf", n_lists=32, n_probe=8),
+        "ivf-pq": SimilarityIndex(args.dim, mode="ivf", n_lists=32, n_probe=8, pq_subvectors=8),
+    }
+    for name, index in indexes.items():
+        index.add(ids[:-n_inserted], vectors[:-n_inserted])
+        if index.mode == "ivf":
+            index.train()
+        # Insertions one track at a time, after training
+        start = time.perf_counter()
+        for track_id, vector in zip(ids[-n_inserted:], vectors[-n_inserted:]):
+            index.add(track_id, vector)
+        insertion = (time.perf_counter() - start) / n_inserted
+        elapsed = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for query in queries:
+                index.search(query, 10)
+            elapsed.append(time.perf_counter() - start)
+        print(f"{name:>8}: {1e3 * min(elapsed) / len(queries):.3f} ms per search, {1e6 * insertion:.0f} us per "
+              f"insertion, {len(index)} tracks")
+
+
+if __name__ == "__main__":
+    main()
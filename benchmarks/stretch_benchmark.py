@@ -0,0 +1,75 @@
+"""
+Compare the in-process TimeStretcher with the pyrubberband backend on a beat time map.
+
+Usage:
+    python benchmarks/stretch_benchmark.py [audio_file] [--target-bpm 128] [--repeat 3]
+
+Without an audio file, a 60 s synthetic loop at 125 BPM is used. The rubberband backend is skipped when the
+rubberband CLI is not installed.
+"""
+import argparse
+import shutil
+import time
+import librosa
+import numpy as np
+from technob.audio.stretch import TimeStretcher
+
+
+def synthetic_loop(sample_rate, duration=60.0, bpm=125.0):
+    beat_times = np.arange(0.0, duration, 60.0 / bpm)
+    length = int(duration * sample_rate)
+    t = np.arange(length) / sample_rate
+    audio = 0.6 * librosa.clicks(times=beat_times, sr=sample_rate, length=length, click_freq=60, click_duration=0.1)
+    audio += 0.2 * np.sin(2 * np.pi * 110 * t) + 0.1 * np.sin(2 * np.pi * 330 * t)
+    return audio.astype(np.float32)
+
+
+def beat_time_map(audio_data, sample_rate, target_bpm):
+    tempo, beats = librosa.beat.beat_track(y=audio_data, sr=sample_rate, trim=False)
+    beat_samples = librosa.frames_to_samples(beats)
+    fixed = np.round((beat_samples[0] / sample_rate + np.arange(len(beat_samples)) * 60.0 / target_bpm)
+                     * sample_rate).astype(np.int64)
+    time_map = [(0, 0)] + list(zip(beat_samples.tolist(), fixed.tolist()))
+    end = fixed[-1] + int(round((len(audio_data) - beat_samples[-1]) * float(np.atleast_1d(tempo)[0]) / target_bpm))
+    return time_map + [(len(audio_data), end)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio_file", nargs="?")
+    parser.add_argument("--target-bpm", type=float, default=128.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.audio_file:
+        audio_data, sample_rate = librosa.load(args.audio_file, sr=None)
+    else:
+        sample_rate = 22050
+        audio_data = synthetic_loop(sample_rate)
+    duration = len(audio_data) / sample_rate
+    time_map = beat_time_map(audio_data, sample_rate, args.target_bpm)
+
+    backends = {
+        "phase_vocoder": lambda: TimeStretcher("phase_vocoder").stretch(audio_data, time_map),
+        "wsola": lambda: TimeStretcher("wsola").stretch(audio_data, time_map),
+    }
+    if shutil.which("rubberband"):
+        import pyrubberband as pyrb
+        backends["rubberband"] = lambda: pyrb.timemap_stretch(audio_data, sample_rate, time_map)
+    else:
+        print("rubberband CLI not found, skipping the pyrubberband backend")
+
+    print(f"{duration:.1f} s of audio at {sample_rate} Hz, {len(time_map)} time map points")
+    for name, run in backends.items():
+        elapsed = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            output = run()
+            elapsed.append(time.perf_counter() - start)
+        best = min(elapsed)
+        print(f"{name:>14}: {best:.3f} s ({duration / best:.0f}x real time), {len(output)} samples "
+              f"(expected {time_map[-1][1]})")
+
+
+if __name__ == "__main__":
+    main()
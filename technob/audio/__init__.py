@@ -1,3 +1,7 @@
 from .features.utils import ProcessorUtils
-from .quantize import Quantizer
+from .quantize import Quantizer, QuantizeAnalysis, QuantizeRenderer
 from .features.extract import LibrosaFeaturesExtractor, Extractor
+from .features.screening import Screener
+from .beat_grid import BeatGrid, BeatGridEstimator
+from .stretch import TimeStretcher
+from .batch import BatchQuantizer
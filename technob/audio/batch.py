@@ -0,0 +1,246 @@
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import librosa
+import soundfile as sf
+from technob.audio.features.screening import Screener
+from technob.audio.quantize import QuantizeAnalysis, QuantizeRenderer, quantized_file_name
+
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".aiff", ".aif")
+
+
+def quantize_track(input_path, output_dir, target_bpm, cache_dir, beat_tracker="auto", stretch_backend="wsola",
+                   overwrite=False, relative_path=None, track_name=None):
+    """
+    Quantize one track of a batch: reuse or compute its analysis, then stretch and write it.
+    Defined at module level so that it can run in worker processes.
+
+    Parameters:
+        input_path (str): Path of the track.
+        output_dir (str): Directory of the quantized tracks.
+        target_bpm (float): Target BPM (Beats Per Minute).
+        cache_dir (str): Directory of the cached analyses.
+        beat_tracker (str): "dp", "grid" or "auto", see `Quantizer`. Default is "auto".
+        stretch_backend (str): "wsola", "phase_vocoder" or "rubberband". Default is "wsola".
+        overwrite (bool): If True, tracks that were already rendered are rendered again. Default is False.
+        relative_path (str, optional): Path of the track relative to the root of the library. The cached analysis
+            is keyed on it, and the output is written to the same subdirectory of `output_dir`. Default is the file
+            name of the track.
+        track_name (str, optional): Name of the track in the output name. Default is the file name of the track
+            without extension.
+
+    Returns:
+        dict: Result of the track, with the keys "input", "output", "status" ("rendered" or "skipped"),
+            "duration" (seconds of audio), "tempo" and "key".
+    """
+    relative_path = relative_path or os.path.basename(input_path)
+    # The extension is part of the key, so that "x.mp3" and "x.wav" have their own analysis
+    cache_file = os.path.join(cache_dir, relative_path + ".json")
+    output_dir = os.path.join(output_dir, os.path.dirname(relative_path))
+    name_path = (track_name or os.path.splitext(os.path.basename(input_path))[0]) + ".wav"
+    result = {"input": input_path, "output": None, "status": None, "duration": 0.0, "tempo": None, "key": None}
+
+    # With a cached analysis of the same file, the output name is known before decoding the track
+    stat = os.stat(input_path)
+    source = {"size": stat.st_size, "mtime": stat.st_mtime}
+    cached = QuantizeAnalysis.load(cache_file) if os.path.exists(cache_file) else None
+    if cached is not None and not overwrite:
+        output_path = os.path.join(output_dir, quantized_file_name(name_path, target_bpm, cached.tempo, cached.key))
+        if cached.key is not None and cached.source == source and os.path.exists(output_path):
+            result.update(output=output_path, status="skipped", duration=cached.n_samples / cached.sample_rate,
+                          tempo=cached.tempo, key=cached.key)
+            return result
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    audio_data, sample_rate = librosa.load(input_path, sr=None, mono=False)
+    audio_data = audio_data.T if audio_data.ndim > 1 else audio_data
+    mono = audio_data.mean(axis=1) if audio_data.ndim > 1 else audio_data
+    analysis = QuantizeAnalysis.from_audio(mono, sample_rate, beat_tracker, cache_file=cache_file)
+    if analysis.key is None or analysis.source != source:
+        if analysis.key is None:
+            analysis.key, _ = Screener.estimate_key(librosa.feature.chroma_stft(y=mono, sr=sample_rate))
+        analysis.source = source
+        analysis.save(cache_file)
+
+    output_path = os.path.join(output_dir, quantized_file_name(name_path, target_bpm, analysis.tempo, analysis.key))
+    result.update(output=output_path, duration=len(mono) / sample_rate, tempo=analysis.tempo, key=analysis.key)
+    # An output rendered from an earlier version of the file is rendered again
+    changed = cached is not None and cached.audio_hash is not None and cached.audio_hash != analysis.audio_hash
+    if os.path.exists(output_path) and not overwrite and not changed:
+        result["status"] = "skipped"
+        return result
+
+    renderer = QuantizeRenderer(stretch_backend)
+    # Write to a temporary name first, so that an interrupted job never leaves a file that looks rendered
+    partial_path = output_path + ".partial"
+    try:
+        sf.write(partial_path, renderer.render(audio_data, analysis, target_bpm), sample_rate, format="WAV")
+        os.replace(partial_path, output_path)
+    finally:
+        # Nothing is left behind by a failed render
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    result["status"] = "rendered"
+    return result
+
+
+class BatchQuantizer:
+    """
+    Class Usage: Quantize a whole folder (e.g. a sample pack) to a single target BPM.
+
+    Tracks are decoded, analyzed and stretched on a process pool. The tempo/beat analysis of every track is cached
+    as JSON (see `QuantizeAnalysis`), so re-running the job, or rendering the folder to another BPM, skips the beat
+    tracking. Outputs are named after the track with its key and original tempo, in the same subdirectories as in
+    the library, and tracks whose output already exists are skipped.
+    """
+
+    def __init__(self, target_bpm, output_dir, cache_dir=None, beat_tracker="auto", stretch_backend="wsola",
+                 n_workers=None, overwrite=False, extensions=AUDIO_EXTENSIONS, verbose=True):
+        """
+        Initialize the BatchQuantizer.
+
+        Parameters:
+            target_bpm (float): Target BPM (Beats Per Minute) of all the tracks.
+            output_dir (str): Directory of the quantized tracks.
+            cache_dir (str, optional): Directory of the cached analyses. Default is "<output_dir>/.analysis".
+            beat_tracker (str): "dp", "grid" or "auto", see `Quantizer`. Default is "auto".
+            stretch_backend (str): "wsola", "phase_vocoder" or "rubberband". Default is "wsola".
+            n_workers (int, optional): Number of worker processes. Default is the number of cores.
+            overwrite (bool): If True, tracks that were already rendered are rendered again. Default is False.
+            extensions (tuple): Extensions of the audio files picked up from directories.
+            verbose (bool): If True, progress is printed. Default is True.
+        """
+        self.target_bpm = target_bpm
+        self.output_dir = output_dir
+        self.cache_dir = cache_dir or os.path.join(output_dir, ".analysis")
+        self.beat_tracker = beat_tracker
+        self.stretch_backend = stretch_backend
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.overwrite = overwrite
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.verbose = verbose
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def find_tracks(self, inputs):
+        """
+        List the audio files to quantize. The output and cache directories are not searched, so that a library
+        holding its own outputs is not quantized twice.
+
+        Parameters:
+            inputs (str or list): Directory (searched recursively), audio file, or list of those.
+
+        Returns:
+            list: Sorted paths of the audio files.
+        """
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        excluded = {os.path.realpath(self.output_dir), os.path.realpath(self.cache_dir)}
+        tracks = []
+        for path in inputs:
+            if os.path.isdir(path):
+                for root, directories, files in os.walk(path):
+                    directories[:] = [name for name in directories
+                                      if os.path.realpath(os.path.join(root, name)) not in excluded]
+                    tracks += [os.path.join(root, name) for name in files if name.lower().endswith(self.extensions)]
+            else:
+                tracks.append(path)
+        return sorted(tracks)
+
+    @staticmethod
+    def track_names(tracks, inputs):
+        """
+        Paths of the tracks relative to the root of the library, and their names in the outputs.
+
+        Parameters:
+            tracks (list): Paths of the tracks, as returned by `find_tracks`.
+            inputs (str or list): Directories and audio files the tracks were found in.
+
+        Returns:
+            dict: (relative path, name) of each track. The root is the deepest directory containing all the inputs,
+                so relative paths are unique. Tracks that only differ by their extension in the same directory
+                get the extension in their name, e.g. "x (mp3)" and "x (wav)".
+        """
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        roots = [os.path.abspath(path if os.path.isdir(path) else os.path.dirname(path)) for path in inputs]
+        root = os.path.commonpath(roots) if roots else ""
+        relative_paths = {track: os.path.relpath(os.path.abspath(track), root) for track in tracks}
+
+        stems = {}
+        for relative_path in relative_paths.values():
+            stem = os.path.splitext(relative_path)[0]
+            stems[stem] = stems.get(stem, 0) + 1
+        names = {}
+        for track, relative_path in relative_paths.items():
+            stem, extension = os.path.splitext(relative_path)
+            name = os.path.basename(stem)
+            names[track] = (relative_path, f"{name} ({extension[1:]})" if stems[stem] > 1 else name)
+        return names
+
+    def run(self, inputs):
+        """
+        Quantize the tracks.
+
+        Parameters:
+            inputs (str or list): Directory (searched recursively), audio file, or list of those.
+
+        Returns:
+            dict: Summary of the job, with the results per track ("results"), the number of rendered, skipped and
+                failed tracks, the errors per track ("errors"), the elapsed time, and the throughput in tracks per
+                second and in seconds of audio per second ("realtime_factor").
+        """
+        tracks = self.find_tracks(inputs)
+        names = self.track_names(tracks, inputs)
+        os.makedirs(self.output_dir, exist_ok=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        arguments = (self.output_dir, self.target_bpm, self.cache_dir, self.beat_tracker, self.stretch_backend,
+                     self.overwrite)
+
+        start = time.perf_counter()
+        results, errors = {}, {}
+        if self.n_workers <= 1:
+            for track in tracks:
+                try:
+                    results[track] = quantize_track(track, *arguments, *names[track])
+                except Exception as e:
+                    errors[track] = "".join(traceback.format_exception_only(type(e), e)).strip()
+                self._log_progress(track, results, errors)
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                futures = {executor.submit(quantize_track, track, *arguments, *names[track]): track for track in tracks}
+                for future in as_completed(futures):
+                    track = futures[future]
+                    try:
+                        results[track] = future.result()
+                    except Exception as e:
+                        errors[track] = "".join(traceback.format_exception_only(type(e), e)).strip()
+                    self._log_progress(track, results, errors)
+        elapsed = time.perf_counter() - start
+
+        rendered = [result for result in results.values() if result["status"] == "rendered"]
+        audio_seconds = sum(result["duration"] for result in rendered)
+        summary = {
+            "results": [results[track] for track in tracks if track in results],
+            "n_tracks": len(tracks),
+            "rendered": len(rendered),
+            "skipped": len(results) - len(rendered),
+            "failed": len(errors),
+            "errors": errors,
+            "elapsed": elapsed,
+            "tracks_per_second": len(tracks) / elapsed if elapsed > 0 else 0.0,
+            "realtime_factor": audio_seconds / elapsed if elapsed > 0 else 0.0,
+        }
+        self._log(f"Quantized {summary['rendered']} tracks to {self.target_bpm:g} BPM in {elapsed:.1f}s "
+                  f"({summary['realtime_factor']:.1f}x real time), skipped {summary['skipped']}, "
+                  f"failed {summary['failed']}")
+        for track, error in errors.items():
+            self._log(f"  {track}: {error}")
+        return summary
+
+    def _log_progress(self, track, results, errors):
+        status = results[track]["status"] if track in results else "failed"
+        self._log(f"[{len(results) + len(errors)}] {status}: {os.path.basename(track)}")
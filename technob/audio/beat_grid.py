@@ -0,0 +1,224 @@
+import librosa
+import numpy as np
+
+
+class BeatGrid:
+    """
+    Result of the beat-grid estimation: a single phase-aligned grid, t_k = offset + k * period (+ drift * k ** 2).
+    """
+
+    def __init__(self, tempo, offset, drift, beat_times, sample_rate, confidence):
+        """
+        Parameters:
+            tempo (float): Tempo in BPM at the start of the grid.
+            offset (float): Time of the first beat in seconds.
+            drift (float): Quadratic drift term in seconds per beat squared (0 for a constant tempo).
+            beat_times (numpy.ndarray): Times of the beats in seconds.
+            sample_rate (int): Sample rate of the analyzed audio.
+            confidence (float): Confidence of the grid in [0, 1].
+        """
+        self.tempo = tempo
+        self.offset = offset
+        self.drift = drift
+        self.beat_times = beat_times
+        self.sample_rate = sample_rate
+        self.confidence = confidence
+
+    @property
+    def beat_frames(self):
+        """Beat positions as sample indices."""
+        return np.round(self.beat_times * self.sample_rate).astype(np.int64)
+
+    def beats(self, hop_length=512):
+        """Beat positions as onset-envelope frame indices, as returned by librosa.beat.beat_track."""
+        return librosa.time_to_frames(self.beat_times, sr=self.sample_rate, hop_length=hop_length)
+
+    def __repr__(self):
+        return (f"BeatGrid(tempo={self.tempo:.3f}, offset={self.offset:.4f}, drift={self.drift:.3g}, "
+                f"n_beats={len(self.beat_times)}, confidence={self.confidence:.2f})")
+
+
+class BeatGridEstimator:
+    """
+    Class Usage: Fast constant-tempo beat tracking for four-on-the-floor material.
+
+    Instead of HPSS followed by the dynamic-programming beat tracker, the estimator:
+        1. computes full-band and kick-band onset envelopes of the mix (HPSS is skipped in the fast mode),
+        2. estimates the beat period with a comb filter over the autocorrelation of the full-band envelope,
+        3. finds the grid phase by folding the kick envelope onto one beat period,
+        4. snaps every grid position to the strongest nearby onset and fits a single grid
+           (optionally with a slow quadratic drift) to those onsets by weighted least squares.
+
+    The confidence combines the share of grid positions that land on a clear onset and the fit residual.
+    Callers should fall back to the dynamic-programming tracker when it is below `min_confidence`.
+    """
+
+    def __init__(self, hop_length=512, bpm_range=(90.0, 180.0), bpm_resolution=0.01, allow_drift=False,
+                 fast=True, min_confidence=0.5, kick_fmax=150.0):
+        """
+        Initialize the BeatGridEstimator.
+
+        Parameters:
+            hop_length (int): Hop length of the onset envelope. Default is 512.
+            bpm_range (tuple): Range of tempi considered, in BPM. Default is (90, 180).
+            bpm_resolution (float): Resolution of the tempo search, in BPM. Default is 0.01.
+            allow_drift (bool): If True, a slow quadratic drift of the grid is fitted as well. Default is False.
+            fast (bool): If True, the onset envelope is computed on the full mix without HPSS. Default is True.
+            min_confidence (float): Confidence below which the grid should not be trusted. Default is 0.5.
+            kick_fmax (float): Upper frequency of the band used to align the grid on the kick. Default is 150 Hz.
+        """
+        self.hop_length = hop_length
+        self.bpm_range = bpm_range
+        self.bpm_resolution = bpm_resolution
+        self.allow_drift = allow_drift
+        self.fast = fast
+        self.min_confidence = min_confidence
+        self.kick_fmax = kick_fmax
+
+    def onset_envelope(self, audio_data, sample_rate):
+        """
+        Compute the onset envelopes used for the grid estimation from a single mel spectrogram.
+
+        Parameters:
+            audio_data (np.ndarray): Audio data as a numpy array.
+            sample_rate (int): Sample rate of the audio.
+
+        Returns:
+            tuple: Full-band onset envelope (used for the tempo) and low-band onset envelope below `kick_fmax`
+                (used for the phase, so that the grid locks on the kick rather than on off-beat hats).
+        """
+        if not self.fast:
+            audio_data = librosa.effects.percussive(audio_data)
+        mel = librosa.feature.melspectrogram(y=audio_data, sr=sample_rate, hop_length=self.hop_length)
+        log_mel = librosa.power_to_db(mel, ref=np.max)
+        full_band = librosa.onset.onset_strength(S=log_mel, sr=sample_rate, hop_length=self.hop_length)
+        low_bins = librosa.mel_frequencies(n_mels=mel.shape[0], fmax=sample_rate / 2) < self.kick_fmax
+        low_band = librosa.onset.onset_strength(S=log_mel[low_bins], sr=sample_rate, hop_length=self.hop_length)
+        return full_band, low_band
+
+    def estimate_period(self, onset_env, frame_rate):
+        """
+        Estimate the beat period by comb filtering the autocorrelation of the onset envelope.
+
+        Parameters:
+            onset_env (np.ndarray): Onset strength envelope.
+            frame_rate (float): Frames per second of the envelope.
+
+        Returns:
+            tuple: Period in frames (float) and salience of the tempo peak in [0, 1].
+        """
+        envelope = onset_env - onset_env.mean()
+        n_harmonics = 4
+        max_lag = int(np.ceil(n_harmonics * 60 * frame_rate / self.bpm_range[0])) + 2
+        autocorrelation = librosa.autocorrelate(envelope, max_size=min(max_lag, len(envelope)))
+        if autocorrelation[0] <= 0:
+            return 60 * frame_rate / np.mean(self.bpm_range), 0.0
+        autocorrelation = autocorrelation / autocorrelation[0]
+
+        bpms = np.arange(self.bpm_range[0], self.bpm_range[1] + self.bpm_resolution, self.bpm_resolution)
+        periods = 60 * frame_rate / bpms
+        lags = periods[:, None] * np.arange(1, n_harmonics + 1)[None, :]
+        comb = np.interp(lags, np.arange(len(autocorrelation)), autocorrelation, right=0.0).mean(axis=1)
+        best = int(np.argmax(comb))
+        return periods[best], float(np.clip(comb[best], 0.0, 1.0))
+
+    @staticmethod
+    def estimate_phase(onset_env, period):
+        """
+        Find the grid phase by folding the onset envelope onto one beat period.
+
+        Parameters:
+            onset_env (np.ndarray): Onset strength envelope.
+            period (float): Beat period in frames.
+
+        Returns:
+            float: Phase of the grid in frames, in [0, period).
+        """
+        n_bins = max(8, int(np.ceil(period * 4)))
+        positions = np.mod(np.arange(len(onset_env)), period) / period * n_bins
+        histogram = np.bincount(positions.astype(np.int64) % n_bins, weights=onset_env, minlength=n_bins)
+        # Smooth circularly over a quarter of a frame on each side
+        histogram = histogram + np.roll(histogram, 1) + np.roll(histogram, -1)
+        return (np.argmax(histogram) + 0.5) / n_bins * period
+
+    def fit_grid(self, onset_env, period, phase):
+        """
+        Snap each grid position to the strongest nearby onset, and fit the grid to those onsets by least squares.
+
+        Parameters:
+            onset_env (np.ndarray): Onset strength envelope.
+            period (float): Beat period in frames.
+            phase (float): Phase of the grid in frames.
+
+        Returns:
+            tuple: Fitted coefficients (offset, period, drift) in frames, and the share of grid positions
+                landing on a clear onset.
+        """
+        grid = np.arange(phase, len(onset_env), period)
+        if len(grid) < 4:
+            return (phase, period, 0.0), 0.0
+        radius = max(1, int(round(period / 4)))
+        windows = np.clip(np.round(grid).astype(np.int64)[:, None] + np.arange(-radius, radius + 1)[None, :],
+                          0, len(onset_env) - 1)
+        values = onset_env[windows]
+        best = np.argmax(values, axis=1)
+        rows = np.arange(len(grid))
+        onsets = windows[rows, best].astype(np.float64)
+        weights = values[rows, best]
+
+        # Sub-frame onset position by parabolic interpolation around the maximum
+        before = onset_env[np.clip(onsets.astype(np.int64) - 1, 0, len(onset_env) - 1)]
+        after = onset_env[np.clip(onsets.astype(np.int64) + 1, 0, len(onset_env) - 1)]
+        curvature = before - 2 * weights + after
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shift = np.where(curvature < 0, 0.5 * (before - after) / curvature, 0.0)
+        onsets += np.clip(shift, -0.5, 0.5)
+
+        # An onset is clear when it stands well above the typical envelope level
+        threshold = np.median(onset_env) + 2 * np.median(np.abs(onset_env - np.median(onset_env)))
+        hits = weights > threshold
+
+        index = np.arange(len(grid), dtype=np.float64)
+        columns = [np.ones_like(index), index] + ([index ** 2] if self.allow_drift else [])
+        design = np.stack(columns, axis=1)
+        w = np.where(hits, weights, 0.0)
+        if np.count_nonzero(w) < design.shape[1]:
+            return (phase, period, 0.0), 0.0
+        sqrt_w = np.sqrt(w)[:, None]
+        coefficients, *_ = np.linalg.lstsq(design * sqrt_w, onsets * sqrt_w[:, 0], rcond=None)
+        offset, fitted_period = coefficients[0], coefficients[1]
+        drift = coefficients[2] if self.allow_drift else 0.0
+        return (offset, fitted_period, drift), float(hits.mean())
+
+    def estimate(self, audio_data, sample_rate):
+        """
+        Estimate the beat grid of the audio.
+
+        Parameters:
+            audio_data (np.ndarray): Audio data as a numpy array.
+            sample_rate (int): Sample rate of the audio.
+
+        Returns:
+            BeatGrid: Estimated beat grid.
+        """
+        onset_env, kick_env = self.onset_envelope(audio_data, sample_rate)
+        frame_rate = sample_rate / self.hop_length
+        period, salience = self.estimate_period(onset_env, frame_rate)
+        phase = self.estimate_phase(kick_env, period)
+        (offset, period, drift), hit_rate = self.fit_grid(kick_env, period, phase)
+        if hit_rate < self.min_confidence:
+            # No clear kick: align the grid on the full-band onsets instead
+            phase = self.estimate_phase(onset_env, period)
+            (offset, period, drift), hit_rate = self.fit_grid(onset_env, period, phase)
+
+        # Bring the first beat back to the start of the audio, then lay the grid until its end
+        first = int(np.ceil(-offset / period)) if offset < 0 else -int(np.floor(offset / period))
+        index = np.arange(first, first + int(len(onset_env) / period) + 2, dtype=np.float64)
+        frames = offset + index * period + drift * index ** 2
+        frames = frames[(frames >= 0) & (frames < len(onset_env))]
+        beat_times = frames / frame_rate
+
+        tempo = 60 * frame_rate / (period + 2 * drift * first)
+        confidence = float(np.clip(hit_rate * (0.5 + 0.5 * salience), 0.0, 1.0))
+        return BeatGrid(tempo, beat_times[0] if len(beat_times) else 0.0, drift / frame_rate, beat_times,
+                        sample_rate, confidence)
@@ -1,3 +1,5 @@
 from .librosa_features import LibrosaFeaturesExtractor
 from .utils import ProcessorUtils
 from .extract import Extractor
+from .screening import Screener
+from .encoding import EncodedFeature, EncodedFeatures
@@ -0,0 +1,225 @@
+import json
+import numpy as np
+
+
+SUPPORTED_DTYPES = ("int8", "float16")
+
+
+class EncodedFeature:
+    """
+    Class Usage: Compact storage of one feature matrix.
+
+    Every feature (last axis of the matrix, e.g. one MFCC coefficient or one chroma bin of a (frames, features)
+    matrix) gets its own scale and offset, and the values are stored as:
+        - int8: x ~= offset + scale * code, codes in [-127, 127] (8x smaller than float64)
+        - float16: x ~= offset + scale * code, codes normalized to [-1, 1] (4x smaller than float64)
+    A 1-D array (e.g. volume over frames) is a single feature, with a single scale and offset.
+
+    The maximum absolute error of a feature is scale / 2 for int8, and about (max - min) / 2 ** 12 for float16.
+    Integer and boolean arrays (e.g. segment labels) are not quantized: they are stored losslessly, with their dtype,
+    and without scale and offset.
+    """
+
+    def __init__(self, codes, scale, offset):
+        """
+        Initialize the EncodedFeature from already-encoded data. Use `EncodedFeature.encode` to encode a matrix.
+
+        Parameters:
+            codes (numpy.ndarray): Encoded values (int8 or float16), or the values of a lossless feature.
+            scale (numpy.ndarray or None): Per-feature scale, shaped like the last axis of `codes` (a scalar for 1-D
+                codes), None for a lossless feature.
+            offset (numpy.ndarray or None): Per-feature offset, shaped like `scale`, None for a lossless feature.
+        """
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+
+    @classmethod
+    def encode(cls, values, dtype="int8"):
+        """
+        Encode a feature matrix with per-feature scale and offset.
+
+        Parameters:
+            values (numpy.ndarray): Feature values of shape (n_frames,) or (n_frames, n_features).
+            dtype (str): Storage type of float values, "int8" or "float16". Default is "int8". Integer and boolean
+                values are stored as is.
+
+        Returns:
+            EncodedFeature: Encoded feature.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"dtype must be one of {SUPPORTED_DTYPES}, got {dtype}.")
+        values = np.asarray(values)
+        if values.dtype.kind in "biu":
+            return cls(values.copy(), None, None)
+
+        values = values.astype(np.float64, copy=False)
+        # One scale and offset per column of a matrix, one for the whole of a 1-D array
+        axes = tuple(range(max(values.ndim - 1, 1)))
+        feature_shape = values.shape[-1:] if values.ndim > 1 else ()
+        low = np.nanmin(values, axis=axes) if values.size else np.zeros(feature_shape)
+        high = np.nanmax(values, axis=axes) if values.size else np.zeros(feature_shape)
+
+        offset = (high + low) / 2
+        half_range = (high - low) / 2
+        # Constant features get a zero scale and decode exactly to their offset
+        safe_half_range = np.where(half_range > 0, half_range, 1.0)
+
+        if dtype == "int8":
+            scale = half_range / 127
+            codes = np.clip(np.rint((values - offset) / (safe_half_range / 127)), -127, 127).astype(np.int8)
+        else:
+            scale = half_range
+            codes = ((values - offset) / safe_half_range).astype(np.float16)
+        return cls(codes, scale.astype(np.float32), offset.astype(np.float32))
+
+    @property
+    def dtype(self):
+        return self.codes.dtype.name
+
+    @property
+    def lossless(self):
+        return self.scale is None
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        if self.lossless:
+            return self.codes.nbytes
+        return self.codes.nbytes + self.scale.nbytes + self.offset.nbytes
+
+    def max_error(self):
+        """
+        Upper bound of the absolute reconstruction error of every feature.
+
+        Returns:
+            numpy.ndarray: Per-feature error bound.
+        """
+        if self.lossless:
+            return np.zeros(self.codes.shape[-1:] if self.codes.ndim > 1 else ())
+        scale = self.scale.astype(np.float64)
+        # Scale and offset are stored as float32, which adds a small representation error
+        representation = (np.abs(self.offset) + scale * np.abs(self.codes).max(initial=0)) * np.finfo(np.float32).eps
+        if self.dtype == "int8":
+            return scale / 2 + representation
+        # float16 has an 11-bit significand, and the codes lie in [-1, 1]
+        return scale * 2.0 ** -11 + representation
+
+    def decode(self, dtype=np.float32):
+        """
+        Decode the feature matrix.
+
+        Parameters:
+            dtype (numpy.dtype): Type of the decoded values. Default is float32. Lossless features keep their dtype.
+
+        Returns:
+            numpy.ndarray: Decoded feature values.
+        """
+        if self.lossless:
+            return self.codes.copy()
+        return (self.codes.astype(dtype) * self.scale.astype(dtype) + self.offset.astype(dtype)).astype(dtype, copy=False)
+
+
+class EncodedFeatures:
+    """
+    Class Usage: Catalog storage of the features returned by `Extractor.extract`.
+
+    Array features (timbre, pitch and intensity frames, volume, ...) are stored as EncodedFeature objects and
+    decoded lazily the first time they are read. Scalar features (tempo, key, duration, ...) are stored as is.
+    Saved files are plain .npz archives, whose arrays numpy also loads lazily.
+    """
+
+    def __init__(self, encoded=None, metadata=None):
+        """
+        Initialize the EncodedFeatures.
+
+        Parameters:
+            encoded (dict, optional): Mapping of feature name to EncodedFeature.
+            metadata (dict, optional): Mapping of feature name to JSON-serializable scalar value.
+        """
+        self.encoded = encoded if encoded is not None else {}
+        self.metadata = metadata if metadata is not None else {}
+        self._decoded = {}
+
+    @classmethod
+    def from_features(cls, features, dtype="int8", dtypes=None):
+        """
+        Encode a dictionary of features.
+
+        Parameters:
+            features (dict): Features as returned by `Extractor.extract`.
+            dtype (str): Default storage type of the array features, "int8" or "float16". Default is "int8".
+            dtypes (dict, optional): Storage type per feature name, overriding `dtype`.
+
+        Returns:
+            EncodedFeatures: Encoded features.
+        """
+        dtypes = dtypes or {}
+        encoded, metadata = {}, {}
+        for name, value in features.items():
+            if isinstance(value, np.ndarray) and value.ndim >= 1 and np.issubdtype(value.dtype, np.number):
+                encoded[name] = EncodedFeature.encode(value, dtypes.get(name, dtype))
+            elif isinstance(value, np.ndarray) and value.size == 1:
+                metadata[name] = value.item()
+            elif isinstance(value, np.generic):
+                metadata[name] = value.item()
+            elif isinstance(value, (str, int, float, bool, type(None))):
+                metadata[name] = value
+        return cls(encoded, metadata)
+
+    def __getitem__(self, name):
+        if name in self.metadata:
+            return self.metadata[name]
+        if name not in self._decoded:
+            self._decoded[name] = self.encoded[name].decode()
+        return self._decoded[name]
+
+    def __contains__(self, name):
+        return name in self.metadata or name in self.encoded
+
+    def keys(self):
+        return list(self.metadata) + list(self.encoded)
+
+    @property
+    def nbytes(self):
+        return sum(feature.nbytes for feature in self.encoded.values())
+
+    def save(self, file_name):
+        """
+        Save the encoded features to an .npz archive.
+
+        Parameters:
+            file_name (str): Path of the archive.
+        """
+        arrays = {"__metadata__": np.array(json.dumps(self.metadata))}
+        for name, feature in self.encoded.items():
+            arrays[f"{name}/codes"] = feature.codes
+            if not feature.lossless:
+                arrays[f"{name}/scale"] = feature.scale
+                arrays[f"{name}/offset"] = feature.offset
+        np.savez(file_name, **arrays)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Load encoded features saved with `save`. The arrays are only decoded when they are read.
+
+        Parameters:
+            file_name (str): Path of the archive.
+
+        Returns:
+            EncodedFeatures: Encoded features.
+        """
+        with np.load(file_name) as archive:
+            metadata = json.loads(str(archive["__metadata__"]))
+            names = {key.rsplit("/", 1)[0] for key in archive.files if "/" in key}
+            encoded = {}
+            for name in sorted(names):
+                lossless = f"{name}/scale" not in archive.files
+                encoded[name] = EncodedFeature(archive[f"{name}/codes"],
+                                               None if lossless else archive[f"{name}/scale"],
+                                               None if lossless else archive[f"{name}/offset"])
+        return cls(encoded, metadata)
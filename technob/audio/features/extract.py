@@ -2,14 +2,18 @@
 import librosa
 import numpy as np
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from technob.audio.features.utils import ProcessorUtils
 from technob.audio.features.librosa_features import LibrosaFeaturesExtractor
+from technob.audio.beat_grid import BeatGridEstimator
 
 class Extractor:
     """
     Class Usage: This class will be used for extracting features from audio files.
     """
-    def __init__(self, audio_file, sample_rate=None, extract_midi=False, verbose=True, extractor="librosa"):
+    def __init__(self, audio_file, sample_rate=None, extract_midi=False, verbose=True, extractor="librosa", n_workers=1,
+                 beat_tracker="dp"):
         if isinstance(audio_file, str):
             self.audio_file_path = audio_file
             self.audio_data, self.sample_rate = librosa.load(self.audio_file_path, sr=None)
@@ -21,6 +25,13 @@ class Extractor:
         self.processor = ProcessorUtils(bit_depth=16, default_silence_threshold=-80.8)
         self.extract_midi = extract_midi
         self.verbose = verbose
+        # Number of threads used for the independent feature computations; None uses all cores
+        self.n_workers = n_workers if n_workers is not None else os.cpu_count()
+        self.timings = {}
+        # "dp" (dynamic programming), "grid" (constant-tempo grid) or "auto" (grid, "dp" when unsure)
+        if beat_tracker not in ("dp", "grid", "auto"):
+            raise ValueError(f"beat_tracker must be 'dp', 'grid' or 'auto', got {beat_tracker}.")
+        self.beat_tracker = beat_tracker
 
         self.song_duration = librosa.get_duration(y=self.audio_data, sr=self.sample_rate)
         if extractor == "librosa":
@@ -37,8 +48,71 @@ class Extractor:
         """Set a different feature extractor if needed."""
         self.features = extractor
 
+    def _timed(self, task):
+        """Run a zero-argument callable and return its result with the elapsed wall-clock time."""
+        start = time.perf_counter()
+        result = task()
+        return result, time.perf_counter() - start
+
+    def _run_features(self, tasks):
+        """
+        Run independent feature computations, concurrently on a thread pool when n_workers > 1.
+        librosa spends most of its time in numpy/scipy kernels that release the GIL, so threads overlap well.
+
+        Parameters:
+            tasks (dict): Mapping of feature name to a zero-argument callable.
+
+        Returns:
+            dict: Mapping of feature name to result, in the order of `tasks` whatever the completion order.
+        """
+        if self.n_workers <= 1 or len(tasks) == 1:
+            outputs = {name: self._timed(task) for name, task in tasks.items()}
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.n_workers, len(tasks))) as executor:
+                futures = {name: executor.submit(self._timed, task) for name, task in tasks.items()}
+                outputs = {name: future.result() for name, future in futures.items()}
+
+        results = {}
+        for name, (result, elapsed) in outputs.items():
+            self.timings[name] = elapsed
+            results[name] = result
+        return results
+
+    def extract_beat_synchronous(self, y_harmonic, beats):
+        """
+        Compute the beat-synchronous features and the loudness, which are independent once the beats are known,
+        concurrently when n_workers > 1 (see `_run_features`).
+
+        Parameters:
+            y_harmonic (numpy.ndarray): Harmonic component of the audio.
+            beats (numpy.ndarray): Beat frames.
+
+        Returns:
+            dict: "intensity", "timbre" and "pitch" beat-synchronous features, and "loudness" measurements.
+        """
+        return self._run_features({
+            "intensity": lambda: self.features.get_intensity(self.audio_data, self.sample_rate, beats),
+            "timbre": lambda: self.features.get_timbre(self.audio_data, self.sample_rate, beats),
+            "pitch": lambda: self.features.get_pitch(y_harmonic, self.sample_rate, beats),
+            "loudness": lambda: self.processor.get_volume_from_buffer(self.audio_data, self.sample_rate),
+        })
+
+    def _track_beats(self, y_percussive):
+        """Track the beats with the configured beat tracker, returning the tempo and the beat frames."""
+        if self.beat_tracker in ("grid", "auto"):
+            estimator = BeatGridEstimator()
+            grid = estimator.estimate(self.audio_data, self.sample_rate)
+            if self.beat_tracker == "grid" or grid.confidence >= estimator.min_confidence:
+                return grid.tempo, grid.beats()
+            self._log(f"Beat grid confidence {grid.confidence:.2f} is low, falling back to the beat tracker")
+        return librosa.beat.beat_track(
+            sr=self.sample_rate,
+            onset_envelope=librosa.onset.onset_strength(y=y_percussive, sr=self.sample_rate),
+            trim=False)
+
     def extract(self):
         """Main function to extract audio features."""
+        self.timings = {}
         try:
             self._log("1/8 Segment the audio")
             segments_boundaries, segments_labels = self.features.get_segments(self.audio_data, self.sample_rate)
@@ -48,16 +122,15 @@ class Extractor:
             avg_pitch, key = self.features.get_average_pitch(frequency_frames)
 
             self._log("3/8 Separate harmonic and percussive")
-            y_harmonic, y_percussive = librosa.effects.hpss(self.audio_data)
+            (y_harmonic, y_percussive), self.timings["hpss"] = self._timed(lambda: librosa.effects.hpss(self.audio_data))
             
             self._log("4/8 Track beats")
-            onset_env = librosa.onset.onset_strength(y=y_percussive, sr=self.sample_rate)
-            tempo, beats = librosa.beat.beat_track(sr=self.sample_rate, onset_envelope=onset_env, trim=False)
+            (tempo, beats), self.timings["beats"] = self._timed(lambda: self._track_beats(y_percussive))
             
             self._log("5.1/8 Extract features beat-synchronously")
-            CQT_sync = self.features.get_intensity(self.audio_data, self.sample_rate, beats)
-            M_sync = self.features.get_timbre(self.audio_data, self.sample_rate, beats)
-            C_sync = self.features.get_pitch(y_harmonic, self.sample_rate, beats)
+            independent = self.extract_beat_synchronous(y_harmonic, beats)
+            CQT_sync, M_sync, C_sync = independent["intensity"], independent["timbre"], independent["pitch"]
+            self._log("Feature timings: " + ", ".join(f"{name} {elapsed:.2f}s" for name, elapsed in self.timings.items()))
 
             self._log('5.2 Aggregate features')
             intensity_frames = np.matrix(CQT_sync).getT()
@@ -65,7 +138,8 @@ class Extractor:
             timbre_frames = np.matrix(M_sync).getT()
 
             self._log("6/8 Get loudness, volume, and trim silence")
-            volume, avg_volume, loudness = self.processor.get_volume(self.audio_file_path)
+            loudness_measurements = independent["loudness"]
+            volume, avg_volume, loudness = self.processor.volume_from_measurements(loudness_measurements)
             
             self._log("7/8 Extract stems")
             destination = self.audio_file_path
@@ -89,11 +163,17 @@ class Extractor:
                 "loudness": loudness,
                 "volume": volume,
                 "avg_volume": avg_volume,
+                "integrated_lufs": loudness_measurements["integrated_lufs"],
+                "short_term_lufs": loudness_measurements["short_term_lufs"],
+                "true_peak_db": loudness_measurements["true_peak_db"],
+                "silence_bounds": (loudness_measurements["silence_start"] / self.sample_rate,
+                                   loudness_measurements["silence_end"] / self.sample_rate),
                 "key": key,
                 "beats": librosa.frames_to_time(beats, sr=self.sample_rate),
                 "segments_boundaries": segments_boundaries,
                 "segments_labels": segments_labels,
                 "frequency_frames": frequency_frames,
+                "timings": dict(self.timings),
                 # "frequency": avg_frequency,  # Uncomment if needed
             }
 
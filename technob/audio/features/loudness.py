@@ -0,0 +1,261 @@
+import numpy as np
+import soundfile as sf
+from scipy import signal
+
+
+def k_weighting_sos(sample_rate):
+    """
+    Design the ITU-R BS.1770 K-weighting filter (high shelf followed by a high pass) for any sample rate.
+
+    Parameters:
+        sample_rate (int): Sample rate of the audio.
+
+    Returns:
+        numpy.ndarray: Second-order sections of shape (2, 6), usable with `scipy.signal.sosfilt`.
+    """
+    # Stage 1: high shelf modelling the acoustic effect of the head (coefficients re-derived as in libebur128)
+    gain_db, fc, q = 3.999843853973347, 1681.974450955533, 0.7071752369554196
+    k = np.tan(np.pi * fc / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    # Stage 2: RLB high pass
+    fc, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * fc / sample_rate)
+    a0 = 1 + k / q + k * k
+    high_pass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    sos = np.array([shelf, high_pass])
+    return sos
+
+
+class _BinAccumulator:
+    """Sum a stream of values into consecutive bins of fixed size, carrying the incomplete bin across blocks."""
+
+    def __init__(self, bin_size):
+        self.bin_size = bin_size
+        self.remainder = np.zeros(0)
+        self.bins = []
+
+    def push(self, values):
+        values = np.concatenate([self.remainder, values])
+        n_complete = len(values) // self.bin_size
+        split = n_complete * self.bin_size
+        if n_complete:
+            self.bins.append(values[:split].reshape(n_complete, self.bin_size).sum(axis=1))
+        self.remainder = values[split:]
+
+    def result(self):
+        return np.concatenate(self.bins) if self.bins else np.zeros(0)
+
+
+class LoudnessAnalyzer:
+    """
+    Class Usage: Single-pass, block-wise loudness analysis.
+
+    Every block is read once and feeds all the measurements at the same time:
+        - per-frame RMS (non-centered frames of `frame_length` samples every `hop_length` samples)
+        - momentary (400 ms), short-term (3 s) and gated integrated loudness in LUFS (ITU-R BS.1770 K-weighting)
+        - true-peak estimate (4x polyphase oversampling)
+        - leading/trailing silence bounds
+
+    Filter states and incomplete frames are carried across blocks, so the result does not depend on the block size.
+    """
+
+    LUFS_OFFSET = -0.691
+    ABSOLUTE_GATE = -70.0
+    RELATIVE_GATE = -10.0
+
+    def __init__(self, sample_rate, channels=1, frame_length=2048, hop_length=512, silence_threshold=-60.0,
+                 block_size=65536, oversampling=4):
+        """
+        Initialize the LoudnessAnalyzer.
+
+        Parameters:
+            sample_rate (int): Sample rate of the audio.
+            channels (int): Number of channels. Default is 1.
+            frame_length (int): Length of the RMS frames, must be a multiple of `hop_length`. Default is 2048.
+            hop_length (int): Hop length of the RMS frames. Default is 512.
+            silence_threshold (float): Silence threshold in dBFS used for the silence bounds. Default is -60 dB.
+            block_size (int): Number of samples per block when analyzing an array or a file. Default is 65536.
+            oversampling (int): Oversampling factor of the true-peak estimate. Default is 4.
+        """
+        if frame_length % hop_length:
+            raise ValueError("frame_length must be a multiple of hop_length.")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.silence_threshold = silence_threshold
+        self.block_size = block_size
+        self.oversampling = oversampling
+
+        self.sos = k_weighting_sos(sample_rate)
+        # 48-tap interpolation filter split into its polyphase components
+        taps = signal.firwin(12 * oversampling, 1.0 / oversampling) * oversampling
+        self.true_peak_phases = [taps[phase::oversampling] for phase in range(oversampling)]
+        self.reset()
+
+    def reset(self):
+        """Clear the filter states and the accumulated measurements."""
+        self._k_state = np.zeros((self.sos.shape[0], 2, self.channels))
+        self._true_peak_states = [np.zeros((len(phase) - 1, self.channels)) for phase in self.true_peak_phases]
+        self._loudness_bins = _BinAccumulator(int(round(0.1 * self.sample_rate)))
+        self._rms_bins = _BinAccumulator(self.hop_length)
+        self._samples = 0
+        self._sum_of_squares = 0.0
+        self._sample_peak = 0.0
+        self._true_peak = 0.0
+        self._first_loud = None
+        self._last_loud = None
+
+    def process(self, block):
+        """
+        Feed the next block of samples.
+
+        Parameters:
+            block (numpy.ndarray): Samples of shape (n_samples,) or (n_samples, channels), as read by soundfile.
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim == 1:
+            block = block[:, None]
+        if block.shape[1] != self.channels:
+            raise ValueError(f"Expected {self.channels} channels, got {block.shape[1]}.")
+        if not len(block):
+            return
+
+        squares = np.square(block)
+        power = squares.mean(axis=1)
+        self._rms_bins.push(power)
+        self._sum_of_squares += float(power.sum())
+
+        # K-weighted energy, summed over channels (all channel weights are 1 for mono and stereo)
+        weighted, self._k_state = signal.sosfilt(self.sos, block, axis=0, zi=self._k_state)
+        self._loudness_bins.push(np.square(weighted).sum(axis=1))
+
+        # Peaks and silence bounds
+        magnitude = np.abs(block).max(axis=1)
+        self._sample_peak = max(self._sample_peak, float(magnitude.max()))
+        loud = np.flatnonzero(magnitude > 10 ** (self.silence_threshold / 20))
+        if len(loud):
+            if self._first_loud is None:
+                self._first_loud = self._samples + int(loud[0])
+            self._last_loud = self._samples + int(loud[-1])
+
+        for index, phase in enumerate(self.true_peak_phases):
+            upsampled, self._true_peak_states[index] = signal.lfilter(
+                phase, 1.0, block, axis=0, zi=self._true_peak_states[index])
+            self._true_peak = max(self._true_peak, float(np.abs(upsampled).max()))
+
+        self._samples += len(block)
+
+    def _windowed_lufs(self, energy_bins, n_bins):
+        """Loudness of windows of `n_bins` consecutive 100 ms bins, with a step of one bin."""
+        if len(energy_bins) < n_bins:
+            return np.zeros(0)
+        cumulative = np.concatenate([[0.0], np.cumsum(energy_bins)])
+        mean_square = (cumulative[n_bins:] - cumulative[:-n_bins]) / (n_bins * self._loudness_bins.bin_size)
+        return self.LUFS_OFFSET + 10 * np.log10(np.maximum(mean_square, 1e-12))
+
+    def _integrated_lufs(self, energy_bins):
+        """Gated integrated loudness over 400 ms blocks with 75% overlap."""
+        if len(energy_bins) < 4:
+            return -np.inf
+        cumulative = np.concatenate([[0.0], np.cumsum(energy_bins)])
+        block_energy = (cumulative[4:] - cumulative[:-4]) / (4 * self._loudness_bins.bin_size)
+        block_lufs = self.LUFS_OFFSET + 10 * np.log10(np.maximum(block_energy, 1e-12))
+
+        gated = block_energy[block_lufs > self.ABSOLUTE_GATE]
+        if not len(gated):
+            return -np.inf
+        relative_gate = self.LUFS_OFFSET + 10 * np.log10(gated.mean()) + self.RELATIVE_GATE
+        gated = block_energy[(block_lufs > self.ABSOLUTE_GATE) & (block_lufs > relative_gate)]
+        return float(self.LUFS_OFFSET + 10 * np.log10(gated.mean()))
+
+    def result(self):
+        """
+        Finalize the measurements of the samples fed so far.
+
+        Returns:
+            dict: Dictionary with the following keys:
+                "rms" (numpy.ndarray): Per-frame RMS.
+                "avg_rms" (float): Mean of the per-frame RMS.
+                "momentary_lufs" (numpy.ndarray): Momentary loudness, one value every 100 ms.
+                "short_term_lufs" (numpy.ndarray): Short-term loudness, one value every 100 ms.
+                "integrated_lufs" (float): Gated integrated loudness.
+                "sample_peak" (float): Largest absolute sample value.
+                "true_peak" (float): True-peak estimate (linear), and "true_peak_db" in dBTP.
+                "silence_start" / "silence_end" (int): Sample bounds of the non-silent audio.
+                "loudness" (float): RMS of the non-silent audio, normalized by the sample peak.
+                "duration" (float): Duration in seconds.
+        """
+        hop_power = self._rms_bins.result()
+        hops_per_frame = self.frame_length // self.hop_length
+        if len(hop_power) >= hops_per_frame:
+            cumulative = np.concatenate([[0.0], np.cumsum(hop_power)])
+            frame_power = (cumulative[hops_per_frame:] - cumulative[:-hops_per_frame]) / self.frame_length
+            rms = np.sqrt(np.maximum(frame_power, 0.0))
+        else:
+            rms = np.zeros(0)
+
+        energy_bins = self._loudness_bins.result()
+
+        start = self._first_loud if self._first_loud is not None else 0
+        end = self._last_loud + 1 if self._last_loud is not None else 0
+        loudness = 0.0
+        if end > start and self._sample_peak > 0:
+            # Silent samples lie below the threshold, so their energy is negligible in the sum of squares
+            loudness = float(np.sqrt(self._sum_of_squares / (end - start)) / self._sample_peak)
+
+        return {
+            "rms": rms,
+            "avg_rms": float(np.mean(rms)) if len(rms) else 0.0,
+            "momentary_lufs": self._windowed_lufs(energy_bins, 4),
+            "short_term_lufs": self._windowed_lufs(energy_bins, 30),
+            "integrated_lufs": self._integrated_lufs(energy_bins),
+            "sample_peak": self._sample_peak,
+            "true_peak": self._true_peak,
+            "true_peak_db": float(20 * np.log10(self._true_peak)) if self._true_peak > 0 else -np.inf,
+            "silence_start": start,
+            "silence_end": end,
+            "loudness": loudness,
+            "duration": self._samples / self.sample_rate,
+        }
+
+    def analyze(self, audio_data):
+        """
+        Analyze an already-decoded buffer block by block.
+
+        Parameters:
+            audio_data (numpy.ndarray): Audio data of shape (n_samples,) or (channels, n_samples) as returned by librosa.
+
+        Returns:
+            dict: Loudness measurements (see `result`).
+        """
+        self.reset()
+        frames = audio_data.T if audio_data.ndim > 1 else audio_data
+        for start in range(0, len(frames), self.block_size):
+            self.process(frames[start:start + self.block_size])
+        return self.result()
+
+    @classmethod
+    def from_file(cls, file, block_size=65536, **kwargs):
+        """
+        Analyze an audio file in a single block-wise read, without decoding it fully into memory.
+
+        Parameters:
+            file (str): Path to the audio file.
+            block_size (int): Number of samples per block. Default is 65536.
+            **kwargs: Additional arguments passed to the LoudnessAnalyzer constructor.
+
+        Returns:
+            dict: Loudness measurements (see `result`).
+        """
+        info = sf.info(file)
+        analyzer = cls(info.samplerate, channels=info.channels, block_size=block_size, **kwargs)
+        for block in sf.blocks(file, blocksize=block_size, always_2d=True):
+            analyzer.process(block)
+        return analyzer.result()
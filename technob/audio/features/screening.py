@@ -0,0 +1,214 @@
+import time
+import librosa
+import numpy as np
+
+from technob.audio.features.extract import Extractor
+
+
+# Krumhansl-Schmuckler key profiles, indexed from C.
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+PITCH_CLASSES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+
+class Screener:
+    """
+    Class Usage: Cheap first-tier analysis used to triage a catalog before running the full Extractor.
+
+    The audio is decoded at a low sample rate (11025 Hz mono by default) with a fast resampler, and only
+    a compact summary is computed: tempo, key, an energy curve and the onset density. Tracks whose summary
+    passes a filter can then be escalated to the full-bandwidth pipeline.
+    """
+    def __init__(self, sample_rate=11025, res_type="soxr_qq", hop_length=512, energy_resolution=1.0, verbose=False):
+        """
+        Initialize the Screener.
+
+        Parameters:
+            sample_rate (int): Sample rate used for the screening analysis. Default is 11025 Hz.
+            res_type (str): Resampling method passed to librosa. Default is "soxr_qq" (fastest soxr preset).
+            hop_length (int): Hop length of the onset and energy frames. Default is 512 samples.
+            energy_resolution (float): Duration in seconds of one point of the energy curve. Default is 1.0.
+            verbose (bool): If True, progress messages are printed. Default is False.
+        """
+        self.sample_rate = sample_rate
+        self.res_type = res_type
+        self.hop_length = hop_length
+        self.energy_resolution = energy_resolution
+        self.verbose = verbose
+
+    def _log(self, message):
+        """Helper function to print messages only if verbose mode is on."""
+        if self.verbose:
+            print(message)
+
+    def load(self, audio_file, sample_rate=None):
+        """
+        Decode (or resample) the audio to the screening sample rate.
+
+        Parameters:
+            audio_file (str or numpy.ndarray): Path to the audio file, or audio data as a numpy array.
+            sample_rate (int, optional): Sample rate of `audio_file` when it is a numpy array.
+
+        Returns:
+            numpy.ndarray: Mono audio data at the screening sample rate.
+        """
+        if isinstance(audio_file, str):
+            audio_data, _ = librosa.load(audio_file, sr=self.sample_rate, mono=True, res_type=self.res_type)
+            return audio_data
+        elif isinstance(audio_file, np.ndarray):
+            if sample_rate is None:
+                raise ValueError("sample_rate is required when audio_file is a numpy array.")
+            audio_data = librosa.to_mono(audio_file) if audio_file.ndim > 1 else audio_file
+            if sample_rate != self.sample_rate:
+                audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=self.sample_rate,
+                                              res_type=self.res_type)
+            return audio_data.astype(np.float32, copy=False)
+        raise TypeError("audio_file must be str or np.ndarray")
+
+    @staticmethod
+    def _correlate(profiles, vector):
+        """Pearson correlation of every row of `profiles` with `vector`."""
+        profiles = profiles - profiles.mean(axis=1, keepdims=True)
+        vector = vector - vector.mean()
+        norms = np.linalg.norm(profiles, axis=1) * np.linalg.norm(vector)
+        return profiles @ vector / np.maximum(norms, np.finfo(float).tiny)
+
+    @staticmethod
+    def estimate_key(chroma):
+        """
+        Estimate the musical key by correlating the average chroma with the Krumhansl-Schmuckler profiles.
+
+        Parameters:
+            chroma (numpy.ndarray): Chromagram of shape (12, n_frames).
+
+        Returns:
+            tuple: Tuple containing the key name (e.g. "A minor") and the correlation of the best match.
+        """
+        profile = chroma.mean(axis=1)
+        if not np.any(profile > 0):
+            return None, 0.0
+        # Rotate the reference profiles to every tonic in one go: row t is the profile of the key on tonic t
+        index = (np.arange(12)[None, :] - np.arange(12)[:, None]) % 12
+        major = Screener._correlate(MAJOR_PROFILE[index], profile)
+        minor = Screener._correlate(MINOR_PROFILE[index], profile)
+        if major.max() >= minor.max():
+            tonic, mode, score = int(major.argmax()), "major", major.max()
+        else:
+            tonic, mode, score = int(minor.argmax()), "minor", minor.max()
+        return f"{PITCH_CLASSES[tonic]} {mode}", float(score)
+
+    def summarize(self, audio_data):
+        """
+        Compute the screening summary of mono audio at the screening sample rate.
+
+        Parameters:
+            audio_data (numpy.ndarray): Mono audio data at `self.sample_rate`.
+
+        Returns:
+            dict: Summary with the duration, tempo, key, energy curve and onset density.
+        """
+        sr, hop = self.sample_rate, self.hop_length
+        duration = len(audio_data) / sr
+
+        self._log("1/4 Onset envelope and tempo")
+        onset_env = librosa.onset.onset_strength(y=audio_data, sr=sr, hop_length=hop)
+        tempo = float(np.atleast_1d(librosa.feature.tempo(onset_envelope=onset_env, sr=sr, hop_length=hop))[0])
+
+        self._log("2/4 Onset density")
+        onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, hop_length=hop)
+        onset_density = len(onsets) / duration if duration > 0 else 0.0
+
+        self._log("3/4 Key")
+        chroma = librosa.feature.chroma_stft(y=audio_data, sr=sr, hop_length=hop * 4)
+        key, key_confidence = self.estimate_key(chroma)
+
+        self._log("4/4 Energy curve")
+        rms = librosa.feature.rms(y=audio_data, hop_length=hop)[0]
+        frames_per_point = max(1, int(round(self.energy_resolution * sr / hop)))
+        n_points = int(np.ceil(len(rms) / frames_per_point))
+        padded = np.pad(rms, (0, n_points * frames_per_point - len(rms)), mode="edge")
+        energy = librosa.amplitude_to_db(padded.reshape(n_points, frames_per_point).mean(axis=1), ref=1.0)
+
+        return {
+            "duration": duration,
+            "tempo": tempo,
+            "key": key,
+            "key_confidence": key_confidence,
+            "energy": energy,
+            "avg_energy": float(np.mean(energy)) if len(energy) else -np.inf,
+            "onset_density": onset_density,
+            "sample_rate": sr,
+        }
+
+    def screen(self, audio_file, sample_rate=None):
+        """
+        Decode the audio at the screening sample rate and compute its summary.
+
+        Parameters:
+            audio_file (str or numpy.ndarray): Path to the audio file, or audio data as a numpy array.
+            sample_rate (int, optional): Sample rate of `audio_file` when it is a numpy array.
+
+        Returns:
+            dict: Screening summary (see `summarize`).
+        """
+        return self.summarize(self.load(audio_file, sample_rate))
+
+    @staticmethod
+    def passes(summary, bpm_range=None, keys=None, min_energy=None, min_onset_density=None):
+        """
+        Check whether a screening summary passes the triage filter.
+
+        Parameters:
+            summary (dict): Screening summary returned by `screen`.
+            bpm_range (tuple, optional): Inclusive (min_bpm, max_bpm) range. Default is None (any tempo).
+            keys (iterable, optional): Accepted key names, e.g. {"A minor", "F minor"}. Default is None (any key).
+            min_energy (float, optional): Minimum average energy in dB. Default is None.
+            min_onset_density (float, optional): Minimum number of onsets per second. Default is None.
+
+        Returns:
+            bool: True if the track should be escalated to the full pipeline.
+        """
+        if bpm_range is not None and not bpm_range[0] <= summary["tempo"] <= bpm_range[1]:
+            return False
+        if keys is not None and summary["key"] not in keys:
+            return False
+        if min_energy is not None and summary["avg_energy"] < min_energy:
+            return False
+        if min_onset_density is not None and summary["onset_density"] < min_onset_density:
+            return False
+        return True
+
+    def triage(self, audio_files, escalate=True, **filter_kwargs):
+        """
+        Screen a list of audio files and escalate the ones passing the filter to the full Extractor.
+
+        Parameters:
+            audio_files (list): Paths to the audio files.
+            escalate (bool): If True, the full Extractor is run on the tracks passing the filter. Default is True.
+            **filter_kwargs: Filter arguments forwarded to `passes`.
+
+        Returns:
+            dict: Mapping of file path to a dict with the "screening" summary, whether it "passed",
+                the full "features" (None if not escalated) and the time spent in each tier.
+        """
+        results = {}
+        for audio_file in audio_files:
+            start = time.perf_counter()
+            summary = self.screen(audio_file)
+            screening_time = time.perf_counter() - start
+            passed = self.passes(summary, **filter_kwargs)
+
+            features, full_time = None, 0.0
+            if passed and escalate:
+                start = time.perf_counter()
+                features = Extractor(audio_file, verbose=self.verbose).extract()
+                full_time = time.perf_counter() - start
+
+            results[audio_file] = {
+                "screening": summary,
+                "passed": passed,
+                "features": features,
+                "screening_time": screening_time,
+                "full_time": full_time,
+            }
+        return results
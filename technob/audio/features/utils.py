@@ -3,6 +3,7 @@ import librosa
 import sys
 
 from ...math.utils import root_mean_square
+from .loudness import LoudnessAnalyzer
 
 
 class ProcessorUtils:
@@ -134,7 +135,8 @@ class ProcessorUtils:
 
     def get_loudness(self, file):
         """
-        Calculate the loudness of an audio file by loading, normalizing, and trimming it.
+        Calculate the loudness of an audio file: the RMS of the non-silent audio, normalized by its peak.
+        The file is streamed block by block through the LoudnessAnalyzer instead of being fully decoded.
 
         Parameters:
             file (str): Path to the audio file.
@@ -145,15 +147,14 @@ class ProcessorUtils:
         # todo: Handle the case when audio is silent or an error occurs during processing.
         loudness = -1
         try:
-            audio, rate = self.load_and_trim_silence(file)
-            loudness = self.loudness_of(audio)
+            loudness = LoudnessAnalyzer.from_file(file, silence_threshold=self.default_silence_threshold)["loudness"]
         except Exception as e:
             sys.stderr.write(f"Failed to run on {file}: {e}\n")
         return loudness
 
     def get_volume(self, file):
         """
-        Calculate the volume, average volume, and loudness of an audio file.
+        Calculate the volume, average volume, and loudness of an audio file in a single block-wise read.
 
         Parameters:
             file (str): Path to the audio file.
@@ -161,16 +162,40 @@ class ProcessorUtils:
         Returns:
             tuple: Tuple containing the volume, average volume, and loudness of the audio file.
         """
-        # todo: Calculate volume using a more appropriate method.
         volume = -1
         avg_volume = -1
         loudness = -1
         try:
-            audio, rate = self.load_and_trim(file)
-            volume = librosa.feature.rms(y=audio)[0] # todo: check what the defintion of volume is.
-            avg_volume = np.mean(volume)
-            loudness = self.loudness_of(audio)
+            measurements = LoudnessAnalyzer.from_file(file, silence_threshold=self.default_silence_threshold)
+            volume, avg_volume, loudness = self.volume_from_measurements(measurements)
         except Exception as e:
             sys.stderr.write(f"Failed to get Volume and Loudness on {file}: {e}\n")
         return volume, avg_volume, loudness
-    
\ No newline at end of file
+
+    def get_volume_from_buffer(self, audio_data, sample_rate):
+        """
+        Calculate the loudness measurements of already-decoded audio, without reading the file again.
+
+        Parameters:
+            audio_data (numpy.ndarray): Audio data as returned by librosa.
+            sample_rate (int): Sample rate of the audio data.
+
+        Returns:
+            dict: Loudness measurements returned by LoudnessAnalyzer (RMS frames, LUFS, true peak, silence bounds).
+        """
+        channels = audio_data.shape[0] if audio_data.ndim > 1 else 1
+        analyzer = LoudnessAnalyzer(sample_rate, channels=channels, silence_threshold=self.default_silence_threshold)
+        return analyzer.analyze(audio_data)
+
+    @staticmethod
+    def volume_from_measurements(measurements):
+        """
+        Extract the (volume, average volume, loudness) triple from LoudnessAnalyzer measurements.
+
+        Parameters:
+            measurements (dict): Loudness measurements returned by LoudnessAnalyzer.
+
+        Returns:
+            tuple: Tuple containing the volume (per-frame RMS), average volume, and loudness.
+        """
+        return measurements["rms"], measurements["avg_rms"], measurements["loudness"]
@@ -1,11 +1,766 @@
 
 from typing import Any
+import hashlib
+import json
+import os
 import librosa
 import numpy as np
 import soundfile as sf
-import pyrubberband as pyrb
 import sys
 from math import log2
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor
+from technob.audio.beat_grid import BeatGridEstimator
+from technob.audio.stretch import TimeStretcher, VarispeedFile, varispeed
+
+
+DEMUCS_STEMS = ("bass", "drums", "guitar", "other", "piano", "vocals")
+
+
+def get_stem_paths(input_audio, separated_dir="separated", model_name="htdemucs_6s", stems=DEMUCS_STEMS):
+    """
+    Find the stems separated by demucs for a track, laid out as <separated_dir>/<model_name>/<track name>/<stem>.wav.
+
+    Parameters:
+        input_audio (str): Path of the track.
+        separated_dir (str): Output directory of demucs. Default is "separated".
+        model_name (str): Name of the demucs model. Default is "htdemucs_6s".
+        stems (tuple): Names of the stems to look for.
+
+    Returns:
+        list: Paths of the stems that exist.
+    """
+    track_name = os.path.splitext(os.path.basename(input_audio))[0]
+    paths = [os.path.join(separated_dir, model_name, track_name, f"{stem}.wav") for stem in stems]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def stretch_file(input_path, output_path, time_map, sample_rate, stretch_backend="wsola", speed=1.0, block_beats=64,
+                 crossfade=0.02):
+    """
+    Stretch an audio file along a time map and write the result block by block, for the in-process backends.
+    Defined at module level so that it can run in worker processes.
+
+    The input is cut every `block_beats` rows of the time map. Every block is read with a small margin, stretched
+    along its part of the time map and crossfaded with the end of the previous block around the beat where they
+    meet, so that the seams are click-free. Memory is bounded by the block size.
+
+    Parameters:
+        input_path (str): Path of the audio file to stretch.
+        output_path (str): Path of the output file.
+        time_map (np.ndarray): Time map in samples at `sample_rate`, as an (N, 2) array.
+        sample_rate (int): Sample rate of the time map. The map is rescaled if the file has another sample rate.
+        stretch_backend (str): "wsola", "phase_vocoder" or "rubberband". Default is "wsola".
+            The rubberband command line needs the whole file, which is then read at once.
+        speed (float): The file is played `speed` times faster while it is read, see `VarispeedFile`, so that the
+            time map applies to the shifted audio. Default is 1.
+        block_beats (int): Number of rows of the time map (beats) per block. Default is 64.
+        crossfade (float): Duration of the crossfade at the block boundaries in seconds. Default is 0.02.
+
+    Returns:
+        str: Path of the output file.
+    """
+    time_map = np.asarray(time_map, dtype=np.int64)
+    with VarispeedFile(input_path, speed) as source:
+        if source.samplerate != sample_rate:
+            time_map = np.round(time_map * source.samplerate / sample_rate).astype(np.int64)
+        if stretch_backend == "rubberband":
+            import pyrubberband as pyrb
+            sf.write(output_path, pyrb.timemap_stretch(source.read(), source.samplerate, time_map),
+                     source.samplerate)
+            return output_path
+
+        stretcher = TimeStretcher(method=stretch_backend)
+        output_length = int(time_map[-1, 1])
+        half_fade = max(1, int(crossfade * source.samplerate) // 2)
+
+        # Block boundaries on every `block_beats`-th beat of the time map, in input and output samples
+        boundaries = time_map[block_beats:-1:block_beats]
+        boundaries = boundaries[(boundaries[:, 1] > half_fade) & (boundaries[:, 1] < output_length - half_fade)]
+        output_starts = np.concatenate([[0], boundaries[:, 1]])
+        output_ends = np.concatenate([boundaries[:, 1], [output_length]])
+        fade_in = np.linspace(0.0, 1.0, 2 * half_fade, endpoint=False, dtype=np.float32)[:, None]
+
+        with sf.SoundFile(output_path, "w", samplerate=source.samplerate, channels=source.channels) as sink:
+            tail = None
+            for output_start, output_end in zip(output_starts, output_ends):
+                # Render the block with half a crossfade on each side
+                render_start = max(0, output_start - half_fade)
+                render_end = min(output_length, output_end + half_fade)
+                positions = stretcher.input_positions(np.array([render_start, render_end], dtype=np.float64),
+                                                      time_map[:, 0].astype(np.float64), time_map[:, 1].astype(np.float64))
+                margin = 2 * (stretcher.frame_length + stretcher.tolerance)
+                read_start = max(0, int(positions[0]) - margin)
+                read_end = min(source.frames, int(positions[1]) + margin)
+                source.seek(read_start)
+                block = source.read(read_end - read_start, always_2d=True)
+
+                local_map = time_map - [read_start, render_start]
+                rendered = stretcher.stretch(block, local_map, output_length=render_end - render_start)
+
+                if tail is not None:
+                    # Crossfade the end of the previous block with the start of this one, around their common beat
+                    rendered[:len(tail)] = tail * (1 - fade_in[:len(tail)]) + rendered[:len(tail)] * fade_in[:len(tail)]
+                # Keep the last crossfade (centred on the next boundary) for the next block
+                keep = len(rendered) - (render_end - output_end) - (half_fade if output_end < output_length else 0)
+                sink.write(rendered[:keep])
+                tail = rendered[keep:]
+    return output_path
+
+
+def quantized_file_name(input_audio_path, target_bpm, original_bpm=None, key=None, stem_name=None):
+    """
+    File name of a quantized track: "<track> [- Stem <stem>] [- Key <key>] [- BPM Original <bpm>] - BPM <target>.wav".
+
+    Parameters:
+        input_audio_path (str): Path of the original track.
+        target_bpm (float): Target BPM of the quantized track.
+        original_bpm (float, optional): Original BPM of the track.
+        key (str, optional): Musical key of the track.
+        stem_name (str, optional): Name of the stem, for quantized stems.
+
+    Returns:
+        str: File name of the quantized track.
+    """
+    parts = [os.path.splitext(os.path.basename(input_audio_path))[0]]
+    if stem_name:
+        parts.append(f"Stem {stem_name}")
+    if key:
+        parts.append(f"Key {key}")
+    if original_bpm:
+        parts.append(f"BPM Original {int(round(original_bpm))}")
+    parts.append(f"BPM {target_bpm:g}")
+    return " - ".join(parts) + ".wav"
+
+
+def click_sample(sample_rate, click_freq=1000.0, click_duration=0.1):
+    """
+    Synthesize one metronome click: an exponentially decaying sine, as `librosa.clicks`.
+
+    Parameters:
+        sample_rate (int): Sample rate of the click.
+        click_freq (float): Frequency of the click in Hz. Default is 1000.
+        click_duration (float): Duration of the click in seconds. Default is 0.1.
+
+    Returns:
+        np.ndarray: Click as a float32 array.
+    """
+    n = int(round(click_duration * sample_rate))
+    decay = 2.0 ** np.linspace(0, -10, n)
+    return (decay * np.sin(2 * np.pi * click_freq * np.arange(n) / sample_rate)).astype(np.float32)
+
+
+def click_track(beat_frames, length, sample_rate, accents=(1.0, 0.5, 0.5, 0.5), bar_offset=0, click=None, start=0):
+    """
+    Render a click track by scattering one click sample onto every beat in a single vectorized add.
+
+    Parameters:
+        beat_frames (np.ndarray): Beat positions as sample indices.
+        length (int): Length of the rendered click track in samples.
+        sample_rate (int): Sample rate of the click track.
+        accents (tuple): Gain of every beat of a bar; its length is the number of beats per bar.
+            Default is an accented downbeat in 4/4.
+        bar_offset (int): Position in the bar of the first beat. Default is 0 (the first beat is a downbeat).
+        click (np.ndarray, optional): Click sample. Default is `click_sample(sample_rate)`.
+        start (int): First sample to render, to render a long click track block by block. Default is 0.
+
+    Returns:
+        np.ndarray: Click track samples [start, start + length) as a float32 array.
+    """
+    click = click_sample(sample_rate) if click is None else click
+    beat_frames = np.asarray(beat_frames, dtype=np.int64)
+    gains = np.asarray(accents, dtype=np.float32)[(np.arange(len(beat_frames)) + bar_offset) % len(accents)]
+
+    # Only the clicks that overlap [start, start + length)
+    first, last = np.searchsorted(beat_frames, [start - len(click) + 1, start + length])
+    positions, gains = beat_frames[first:last] - start, gains[first:last]
+    indices = positions[:, None] + np.arange(len(click))[None, :]
+    values = gains[:, None] * click[None, :]
+    inside = (indices >= 0) & (indices < length)
+
+    output = np.zeros(length, dtype=np.float32)
+    if len(positions) < 2 or np.min(np.diff(positions)) >= len(click):
+        # Clicks do not overlap, so every index appears at most once
+        output[indices[inside]] += values[inside]
+    else:
+        np.add.at(output, indices[inside], values[inside])
+    return output
+
+
+def write_click_track(file_name, beat_frames, length, sample_rate, accents=(1.0, 0.5, 0.5, 0.5), bar_offset=0,
+                      block_size=2 ** 20):
+    """
+    Write a click track to a file block by block, so that memory does not grow with the length of the track.
+
+    Parameters:
+        file_name (str): Path of the click track.
+        beat_frames (np.ndarray): Beat positions as sample indices.
+        length (int): Length of the click track in samples.
+        sample_rate (int): Sample rate of the click track.
+        accents (tuple): Gain of every beat of a bar. Default is an accented downbeat in 4/4.
+        bar_offset (int): Position in the bar of the first beat. Default is 0.
+        block_size (int): Number of samples rendered at once. Default is 2 ** 20.
+
+    Returns:
+        str: Path of the click track.
+    """
+    click = click_sample(sample_rate)
+    beat_frames = np.asarray(beat_frames, dtype=np.int64)
+    with sf.SoundFile(file_name, "w", samplerate=sample_rate, channels=1) as f:
+        for start in range(0, length, block_size):
+            f.write(click_track(beat_frames, min(block_size, length - start), sample_rate, accents, bar_offset,
+                                click, start))
+    return file_name
+
+
+def audio_hash(audio_data):
+    """
+    Content hash of audio samples, to check that a cached analysis was computed for the same audio.
+
+    Parameters:
+        audio_data (np.ndarray): Audio data as a numpy array.
+
+    Returns:
+        str: SHA-1 hex digest of the samples as float32.
+    """
+    samples = np.ascontiguousarray(audio_data, dtype=np.float32)
+    return hashlib.sha1(str(samples.shape).encode() + samples.tobytes()).hexdigest()
+
+
+class QuantizeAnalysis:
+    """
+    Class Usage: Analysis step of the quantization (tempo and beats), computed once per track and reused for
+    any number of renders.
+
+    The analysis only depends on the audio, not on the target BPM, so it can be saved next to the track
+    (a small JSON file) and reloaded instead of running HPSS and beat tracking again.
+    """
+
+    def __init__(self, sample_rate, n_samples, tempo, beat_frames, beat_tracker="dp", confidence=None, key=None,
+                 audio_hash=None, source=None):
+        """
+        Initialize the QuantizeAnalysis.
+
+        Parameters:
+            sample_rate (int): Sample rate of the analyzed audio.
+            n_samples (int): Length of the analyzed audio in samples.
+            tempo (float): Tempo of the audio in BPM.
+            beat_frames (np.ndarray): Beat positions as sample indices.
+            beat_tracker (str): Beat tracker used for the analysis. Default is "dp".
+            confidence (float, optional): Confidence of the beat grid, when the grid tracker was used.
+            key (str, optional): Musical key of the audio (e.g. "A minor"), when it was estimated.
+            audio_hash (str, optional): Content hash of the analyzed samples, see `audio_hash`.
+            source (dict, optional): "size" and "mtime" of the analyzed file, to check that it has not changed
+                without decoding it again.
+        """
+        self.sample_rate = int(sample_rate)
+        self.n_samples = int(n_samples)
+        self.tempo = float(np.atleast_1d(tempo)[0])
+        self.beat_frames = np.asarray(beat_frames, dtype=np.int64)
+        self.beat_tracker = beat_tracker
+        self.confidence = confidence
+        self.key = key
+        self.audio_hash = audio_hash
+        self.source = source
+
+    @property
+    def beats(self):
+        """Beat positions as onset-envelope frame indices, as returned by librosa.beat.beat_track."""
+        return librosa.samples_to_frames(self.beat_frames)
+
+    @staticmethod
+    def track_beats(audio_data, sample_rate, beat_tracker="dp"):
+        """
+        Track the beats of the audio.
+
+        Parameters:
+            audio_data (np.ndarray): Audio data as a numpy array.
+            sample_rate (int): Sample rate of the audio.
+            beat_tracker (str): "dp", "grid" or "auto", see `Quantizer`. Default is "dp".
+
+        Returns:
+            tuple: Tempo, beats (onset frames), beat frames (sample indices) and confidence of the beat grid
+                (None when the dynamic-programming tracker was used).
+        """
+        confidence = None
+        if beat_tracker in ("grid", "auto"):
+            estimator = BeatGridEstimator()
+            beat_grid = estimator.estimate(audio_data, sample_rate)
+            confidence = beat_grid.confidence
+            if beat_tracker == "grid" or beat_grid.confidence >= estimator.min_confidence:
+                return beat_grid.tempo, beat_grid.beats(), beat_grid.beat_frames, confidence
+
+        # separate harmonic and percussive components
+        y_harmonic, y_percussive = librosa.effects.hpss(audio_data)
+
+        # calculate onset strength envelope for percussive component (onset envelope)
+        onset_env = librosa.onset.onset_strength(y=y_percussive, sr=sample_rate)
+
+        # calculate tempo and beat frames from onset envelope
+        tempo, beats = librosa.beat.beat_track(sr=sample_rate, onset_envelope=onset_env, trim=False)
+
+        # convert beat frames to sample indices
+        beat_frames = librosa.frames_to_samples(beats)
+
+        return tempo, beats, beat_frames, confidence
+
+    @classmethod
+    def from_audio(cls, audio_data, sample_rate, beat_tracker="dp", cache_file=None):
+        """
+        Analyze the audio, or reload the analysis from `cache_file` when it was saved for the same audio (same
+        sample rate, beat tracker and content hash of the samples).
+
+        Parameters:
+            audio_data (np.ndarray): Audio data of shape (n_samples,), or (n_channels, n_samples) as loaded by
+                librosa.
+            sample_rate (int): Sample rate of the audio.
+            beat_tracker (str): "dp", "grid" or "auto", see `Quantizer`. Default is "dp".
+            cache_file (str, optional): Path of the cached analysis. It is written after a new analysis.
+
+        Returns:
+            QuantizeAnalysis: Analysis of the audio.
+        """
+        content_hash = audio_hash(audio_data) if cache_file is not None else None
+        if cache_file is not None and os.path.exists(cache_file):
+            analysis = cls.load(cache_file)
+            if (analysis.sample_rate, analysis.n_samples, analysis.beat_tracker, analysis.audio_hash) == \
+                    (int(sample_rate), audio_data.shape[-1], beat_tracker, content_hash):
+                return analysis
+
+        # Beats are tracked on the mix of the channels
+        mono = librosa.to_mono(audio_data) if audio_data.ndim > 1 else audio_data
+        tempo, _, beat_frames, confidence = cls.track_beats(mono, sample_rate, beat_tracker)
+        analysis = cls(sample_rate, audio_data.shape[-1], tempo, beat_frames, beat_tracker, confidence,
+                       audio_hash=content_hash)
+        if cache_file is not None:
+            analysis.save(cache_file)
+        return analysis
+
+    @classmethod
+    def from_file(cls, file_name, beat_tracker="grid", block_duration=120.0, overlap_duration=10.0):
+        """
+        Analyze an audio file block by block, so that memory is bounded by the block size (e.g. for DJ sets).
+
+        Every block is beat tracked on its own, which also follows slow tempo changes over a long recording.
+        The beats of overlapping blocks are joined at the middle of the overlap, and missing or duplicate beats
+        at the joins are repaired from the median beat interval.
+
+        Parameters:
+            file_name (str): Path of the audio file.
+            beat_tracker (str): "dp", "grid" or "auto", see `Quantizer`. Default is "grid".
+            block_duration (float): Duration of the analysis blocks in seconds. Default is 120.
+            overlap_duration (float): Overlap between consecutive blocks in seconds. Default is 10.
+
+        Returns:
+            QuantizeAnalysis: Analysis of the file, in samples at the sample rate of the file.
+        """
+        info = sf.info(file_name)
+        sample_rate, n_samples = info.samplerate, info.frames
+        block_size = int(block_duration * sample_rate)
+        overlap = min(int(overlap_duration * sample_rate), block_size // 2)
+
+        beat_frames, confidences = [], []
+        blocks = sf.blocks(file_name, blocksize=block_size, overlap=overlap, dtype="float32", always_2d=True)
+        for index, block in enumerate(blocks):
+            start = index * (block_size - overlap)
+            _, _, block_beats, confidence = cls.track_beats(block.mean(axis=1), sample_rate, beat_tracker)
+            block_beats = np.asarray(block_beats, dtype=np.int64) + start
+            # Keep the beats between the middles of the overlaps with the previous and the next block
+            low = start + overlap // 2 if index > 0 else 0
+            high = start + block_size - overlap // 2 if start + block_size < n_samples else n_samples
+            beat_frames.append(block_beats[(block_beats >= low) & (block_beats < high)])
+            if confidence is not None:
+                confidences.append(confidence)
+            if start + block_size >= n_samples:
+                break
+
+        beat_frames = np.concatenate(beat_frames) if beat_frames else np.zeros(0, dtype=np.int64)
+        if len(beat_frames) < 2:
+            return cls(sample_rate, n_samples, 0.0, beat_frames, beat_tracker, None)
+
+        # Repair the joins: drop beats closer than half a beat, fill gaps longer than one and a half beats
+        period = np.median(np.diff(beat_frames))
+        keep = np.concatenate([[True], np.diff(beat_frames) > period / 2])
+        beat_frames = beat_frames[keep]
+        intervals = np.diff(beat_frames)
+        n_missing = np.maximum(np.round(intervals / period).astype(np.int64) - 1, 0)
+        fills = [beat_frames[i] + intervals[i] * np.arange(1, n + 1) / (n + 1)
+                 for i, n in zip(np.flatnonzero(n_missing), n_missing[n_missing > 0])]
+        if fills:
+            beat_frames = np.sort(np.concatenate([beat_frames] + fills)).astype(np.int64)
+
+        tempo = 60.0 * sample_rate / np.median(np.diff(beat_frames))
+        confidence = float(np.min(confidences)) if confidences else None
+        return cls(sample_rate, n_samples, tempo, beat_frames, beat_tracker, confidence)
+
+    def rescaled(self, n_samples):
+        """
+        Analysis of the audio after a constant tempo change (e.g. a varispeed shift) to `n_samples` samples,
+        obtained by rescaling the beats instead of tracking them again. The key is not kept, since a varispeed
+        shift also changes it.
+
+        Parameters:
+            n_samples (int): Length of the shifted audio in samples.
+
+        Returns:
+            QuantizeAnalysis: Rescaled analysis.
+        """
+        factor = n_samples / self.n_samples
+        beat_frames = np.round(self.beat_frames * factor).astype(np.int64)
+        return QuantizeAnalysis(self.sample_rate, n_samples, self.tempo / factor, beat_frames[beat_frames < n_samples],
+                                self.beat_tracker, self.confidence)
+
+    def to_dict(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "n_samples": self.n_samples,
+            "tempo": self.tempo,
+            "beat_frames": self.beat_frames.tolist(),
+            "beat_tracker": self.beat_tracker,
+            "confidence": self.confidence,
+            "key": self.key,
+            "audio_hash": self.audio_hash,
+            "source": self.source,
+        }
+
+    def save(self, file_name):
+        """
+        Save the analysis to a JSON file.
+
+        Parameters:
+            file_name (str): Path of the file.
+        """
+        with open(file_name, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Load an analysis saved with `save`.
+
+        Parameters:
+            file_name (str): Path of the file.
+
+        Returns:
+            QuantizeAnalysis: Loaded analysis.
+        """
+        with open(file_name) as f:
+            return cls(**json.load(f))
+
+
+class QuantizeRenderer:
+    """
+    Class Usage: Rendering step of the quantization: maps a QuantizeAnalysis to a target BPM and stretches the audio.
+
+    The renderer holds no per-track state, so one analysis can be rendered to any number of target BPMs,
+    e.g. a "BPM ladder" of one track with `render_ladder`.
+    """
+
+    def __init__(self, stretch_backend="wsola"):
+        """
+        Initialize the QuantizeRenderer.
+
+        Parameters:
+            stretch_backend (str): "wsola" or "phase_vocoder" for the in-process TimeStretcher, or "rubberband"
+                for pyrubberband (requires the rubberband CLI). Default is "wsola".
+        """
+        if stretch_backend not in ("wsola", "phase_vocoder", "rubberband"):
+            raise ValueError(f"stretch_backend must be 'wsola', 'phase_vocoder' or 'rubberband', got {stretch_backend}.")
+        self.stretch_backend = stretch_backend
+
+    def calculate_fixed_beat_frames(self, beat_frames, original_bpm, target_bpm=120, sample_rate=22050):
+        """
+        Calculate fixed beat frames based on target BPM and beat frames from audio data 
+        Fix Beat Frames is defined as the beat frames that will be used to stretch the audio to the desired BPM. 
+        The fixed beats form a metronome at the target BPM, 60 / target_bpm seconds apart. The first fixed beat is
+        the first beat of the audio scaled by the ratio of the original BPM to the target BPM, so that the intro
+        before the first beat is stretched like the rest of the track.
+        For example, if the target BPM is 120, the fixed beats are 0.5 seconds apart.
+
+        Parameters:
+            beat_frames (np.ndarray): Beat frames (sample indices) as a numpy array.
+            original_bpm (float): Original BPM (Beats Per Minute) of the audio.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization. Default is 120.
+            sample_rate (int): Sample rate of the beat frames. Default is 22050.
+
+        Returns:
+            np.ndarray: Fixed beat frames (int64 sample indices) as a numpy array.
+        """
+        beat_frames = np.asarray(beat_frames, dtype=np.int64)
+        if len(beat_frames) == 0:
+            return np.zeros(0, dtype=np.int64)
+        first_beat = beat_frames[0] * float(original_bpm) / target_bpm
+        beat_period = 60.0 * sample_rate / target_bpm
+        return np.round(first_beat + np.arange(len(beat_frames)) * beat_period).astype(np.int64)
+
+    def create_time_map(self, beat_frames, fixed_beat_frames, n_samples, original_bpm, target_bpm):
+        """
+        Create a time map for stretching the audio to the desired BPM. 
+        The time map is an (N, 2) array of (original sample, fixed sample) pairs: it starts at (0, 0), maps
+        every beat frame to its fixed beat frame and ends with the length of the audio, whose tail after the last
+        beat is stretched by the ratio of the original BPM to the target BPM.
+        For example, if the original beat frames are [100, 200, 300] and the fixed beat frames are [120, 240, 360],
+        then the time map will be [(0, 0), (100, 120), (200, 240), (300, 360), (n_samples, end)].
+        Pairs that would make the map not strictly increasing (e.g. a beat on the first or after the last sample)
+        are dropped, so the map can be used by both the rubberband backend and the TimeStretcher.
+
+        Parameters:
+            beat_frames (np.ndarray): Beat frames as a numpy array.
+            fixed_beat_frames (np.ndarray): Fixed beat frames as a numpy array.
+            n_samples (int): Length of the audio in samples.
+            original_bpm (float): Original BPM (Beats Per Minute) of the audio.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
+
+        Returns:
+            np.ndarray: Time map as an (N, 2) int64 array.
+        """
+        beat_frames = np.asarray(beat_frames, dtype=np.int64)
+        fixed_beat_frames = np.asarray(fixed_beat_frames, dtype=np.int64)
+        ratio = float(original_bpm) / target_bpm
+        inside = (beat_frames > 0) & (beat_frames < n_samples)
+        beat_frames, fixed_beat_frames = beat_frames[inside], fixed_beat_frames[inside]
+
+        # The tail after the last beat (or the whole audio without beats) is stretched at the tempo ratio
+        last_beat = beat_frames[-1] if len(beat_frames) else 0
+        last_fixed = fixed_beat_frames[-1] if len(fixed_beat_frames) else 0
+        end = int(round(last_fixed + (n_samples - last_beat) * ratio))
+
+        time_map = np.empty((len(beat_frames) + 2, 2), dtype=np.int64)
+        time_map[0] = 0
+        time_map[1:-1, 0], time_map[1:-1, 1] = beat_frames, fixed_beat_frames
+        time_map[-1] = n_samples, end
+
+        # Keep the pairs that increase in both columns over everything before them
+        increasing = (time_map[1:] > np.maximum.accumulate(time_map[:-1], axis=0)).all(axis=1)
+        increasing[-1] = True
+        time_map = time_map[np.concatenate([[True], increasing])]
+        if len(time_map) > 2 and time_map[-1, 1] <= time_map[-2, 1]:
+            time_map = np.delete(time_map, -2, axis=0)
+        return time_map
+
+    def stretch_audio(self, audio_data, sample_rate, time_map, backend=None):
+        """
+        Stretch the audio to the desired BPM using the time map.
+
+        Parameters:
+            audio_data (np.ndarray): Audio data as a numpy array.
+            sample_rate (int): Sample rate of the audio.
+            time_map (np.ndarray): Time map as an (N, 2) array of (original sample, stretched sample) pairs.
+            backend (str, optional): Stretch backend, "wsola", "phase_vocoder" or "rubberband".
+                Default is the backend of the renderer.
+
+        Returns:
+            np.ndarray: Stretched audio data as a numpy array.
+        """
+        backend = backend or self.stretch_backend
+        if backend == "rubberband":
+            # Optional high-quality backend: round-trips through temporary files and the rubberband CLI
+            import pyrubberband as pyrb
+            return pyrb.timemap_stretch(audio_data, sample_rate, time_map)
+        return TimeStretcher(method=backend).stretch(audio_data, time_map)
+
+    def pitch_shift(self, audio_data, sample_rate, original_bpm, target_bpm, mode="varispeed", semitones=0.0):
+        """
+        Shift the audio to the desired BPM.
+
+        Two modes are available:
+            - "varispeed": tempo and pitch change together (like the pitch fader of a turntable), by polyphase
+              resampling. This is cheap, and is how DJs usually pitch tracks.
+            - "quality": the tempo is changed by time stretching with the stretch backend, and the pitch is shifted
+              independently by `semitones` (0 keeps the key of the track).
+
+        Parameters:
+            audio_data (np.ndarray): Audio data as a numpy array.
+            sample_rate (int): Sample rate of the audio.
+            original_bpm (float): Original BPM (Beats Per Minute) of the audio.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
+            mode (str): "varispeed" or "quality". Default is "varispeed".
+            semitones (float): Pitch shift of the quality mode in semitones. Default is 0.
+
+        Returns:
+            np.ndarray: Pitch-shifted audio data as a numpy array.
+        """
+        speed = float(target_bpm) / float(np.atleast_1d(original_bpm)[0])
+        if mode == "varispeed":
+            return varispeed(audio_data, speed)[0]
+        if mode != "quality":
+            raise ValueError(f"mode must be 'varispeed' or 'quality', got {mode}.")
+
+        # Stretch to the target tempo, scaled by the pitch ratio; resampling by the pitch ratio then restores the
+        # target tempo and shifts the pitch
+        pitch_ratio = Fraction(2.0 ** (semitones / 12.0)).limit_denominator(1000)
+        n_samples = audio_data.shape[-1]
+        stretched_length = int(round(n_samples / speed * float(pitch_ratio)))
+        time_map = np.array([[0, 0], [n_samples, stretched_length]], dtype=np.int64)
+        stretched = self.stretch_audio(audio_data, sample_rate, time_map)
+        return varispeed(stretched, float(pitch_ratio))[0] if pitch_ratio != 1 else stretched
+
+    def fixed_beat_frames(self, analysis, target_bpm):
+        """
+        Positions of the beats of the analysis on the grid at the target BPM, one per analyzed beat.
+
+        Parameters:
+            analysis (QuantizeAnalysis): Analysis of the audio.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
+
+        Returns:
+            np.ndarray: Fixed beat frames (int64 sample indices) as a numpy array.
+        """
+        return self.calculate_fixed_beat_frames(analysis.beat_frames, analysis.tempo, target_bpm, analysis.sample_rate)
+
+    def time_map(self, analysis, target_bpm):
+        """
+        Create the time map that moves the beats of the analysis to a grid at the target BPM.
+
+        Parameters:
+            analysis (QuantizeAnalysis): Analysis of the audio.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
+
+        Returns:
+            np.ndarray: Time map as an (N, 2) int64 array.
+        """
+        return self.create_time_map(analysis.beat_frames, self.fixed_beat_frames(analysis, target_bpm),
+                                    analysis.n_samples, analysis.tempo, target_bpm)
+
+    def render_click_track(self, analysis, target_bpm, output_path, accents=(1.0, 0.5, 0.5, 0.5), bar_offset=0):
+        """
+        Write the click track of the quantized audio: one click on every fixed beat. Beats dropped from the time
+        map (e.g. a beat on the first sample) still click, so that the accents stay on the beats of the bar.
+
+        Parameters:
+            analysis (QuantizeAnalysis): Analysis of the audio.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
+            output_path (str): Path of the click track.
+            accents (tuple): Gain of every beat of a bar. Default is an accented downbeat in 4/4.
+            bar_offset (int): Position in the bar of the first beat. Default is 0.
+
+        Returns:
+            str: Path of the click track.
+        """
+        length = int(self.time_map(analysis, target_bpm)[-1, 1])
+        return write_click_track(output_path, self.fixed_beat_frames(analysis, target_bpm), length,
+                                 analysis.sample_rate, accents, bar_offset)
+
+    def render(self, audio_data, analysis, target_bpm):
+        """
+        Quantize the audio to the target BPM using its analysis.
+
+        Parameters:
+            audio_data (np.ndarray): Audio data as a numpy array, as analyzed.
+            analysis (QuantizeAnalysis): Analysis of the audio.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
+
+        Returns:
+            np.ndarray: Quantized audio data as a numpy array.
+        """
+        return self.stretch_audio(audio_data, analysis.sample_rate, self.time_map(analysis, target_bpm))
+
+    def render_ladder(self, audio_data, analysis, bpms=range(128, 146), output_dir=None, name="quantized",
+                      with_click=False):
+        """
+        Render one track to several target BPMs from a single analysis.
+
+        Parameters:
+            audio_data (np.ndarray): Audio data as a numpy array, as analyzed.
+            analysis (QuantizeAnalysis): Analysis of the audio.
+            bpms (iterable): Target BPMs. Default is 128 to 145.
+            output_dir (str, optional): If given, every render is streamed to "<name> - BPM <bpm>.wav" in this
+                directory instead of being kept in memory.
+            name (str): Prefix of the output file names. Default is "quantized".
+            with_click (bool): If True, a click track "<name> - BPM <bpm> - click.wav" is written next to every
+                render in `output_dir`. Default is False.
+
+        Returns:
+            dict: Mapping of target BPM to quantized audio, or to the output path when `output_dir` is given.
+        """
+        renders = {}
+        for bpm in bpms:
+            if output_dir is None:
+                renders[bpm] = self.render(audio_data, analysis, bpm)
+                continue
+            path = os.path.join(output_dir, f"{name} - BPM {bpm:g}.wav")
+            time_map = self.time_map(analysis, bpm)
+            if self.stretch_backend == "rubberband":
+                sf.write(path, self.stretch_audio(audio_data, analysis.sample_rate, time_map), analysis.sample_rate)
+            else:
+                channels = 1 if np.ndim(audio_data) == 1 else np.shape(audio_data)[1]
+                with sf.SoundFile(path, "w", samplerate=analysis.sample_rate, channels=channels) as f:
+                    for chunk in TimeStretcher(method=self.stretch_backend).stream(audio_data, time_map):
+                        f.write(chunk)
+            if with_click:
+                self.render_click_track(analysis, bpm, os.path.join(output_dir, f"{name} - BPM {bpm:g} - click.wav"))
+            renders[bpm] = path
+        return renders
+
+    def render_file(self, input_path, output_path, analysis, target_bpm, block_beats=64, crossfade=0.02,
+                    click_path=None):
+        """
+        Quantize an audio file block by block, writing the output incrementally (e.g. for DJ sets), see
+        `stretch_file`. Memory is bounded by the block size.
+
+        Parameters:
+            input_path (str): Path of the audio file.
+            output_path (str): Path of the quantized file.
+            analysis (QuantizeAnalysis): Analysis of the file, e.g. from `QuantizeAnalysis.from_file`.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
+            block_beats (int): Number of beats per block. Default is 64.
+            crossfade (float): Duration of the crossfade at the block boundaries in seconds. Default is 0.02.
+            click_path (str, optional): If given, the click track of the quantized file is written there as well.
+
+        Returns:
+            str: Path of the quantized file.
+        """
+        if self.stretch_backend == "rubberband":
+            raise ValueError("Streaming quantization requires the 'wsola' or 'phase_vocoder' stretch backend.")
+        stretch_file(input_path, output_path, self.time_map(analysis, target_bpm), analysis.sample_rate,
+                     self.stretch_backend, block_beats=block_beats, crossfade=crossfade)
+        if click_path is not None:
+            self.render_click_track(analysis, target_bpm, click_path)
+        return output_path
+
+    def render_stems(self, stem_paths, analysis, target_bpm, output_dir, name="quantized", n_workers=None, speed=1.0,
+                     pitch_shift_mode="varispeed"):
+        """
+        Quantize the stems of a track with the time map of its full mix, stretching the stems concurrently.
+
+        The time map is computed once from the analysis of the mix, so all stems stay aligned. Every stem is
+        stretched in its own worker process and streamed block by block to disk, so on a multi-core machine all
+        the stems take about as long as one.
+
+        Parameters:
+            stem_paths (list): Paths of the stem files.
+            analysis (QuantizeAnalysis): Analysis of the full mix.
+            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
+            output_dir (str): Directory of the quantized stems.
+            name (str): Prefix of the output file names, "<name> - Stem <stem> - BPM <bpm>.wav". Default is "quantized".
+            n_workers (int, optional): Number of worker processes. Default is one per stem, up to the number of cores.
+            speed (float): Tempo change of the mix before its analysis (e.g. pitch_shift_first), applied to the
+                stems on the fly so that they match the analysis. Default is 1.
+            pitch_shift_mode (str): Mode of the tempo change, see `pitch_shift`. In "varispeed" mode the stems are
+                resampled while they are read; in "quality" mode the change is folded into the time map.
+                Default is "varispeed".
+
+        Returns:
+            list: Paths of the quantized stems, in the order of `stem_paths`.
+        """
+        if pitch_shift_mode not in ("varispeed", "quality"):
+            raise ValueError(f"pitch_shift_mode must be 'varispeed' or 'quality', got {pitch_shift_mode}.")
+        time_map = np.asarray(self.time_map(analysis, target_bpm), dtype=np.int64)
+        if pitch_shift_mode == "quality" and speed != 1:
+            # The analysis is in samples of the stretched mix, which is `speed` times shorter than the stems
+            time_map[:, 0] = np.round(time_map[:, 0] * speed)
+            speed = 1.0
+        jobs = []
+        for path in stem_paths:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            output_path = os.path.join(output_dir, f"{name} - Stem {stem} - BPM {target_bpm:g}.wav")
+            jobs.append((path, output_path, time_map, analysis.sample_rate, self.stretch_backend, speed))
+
+        n_workers = n_workers or min(len(jobs), os.cpu_count() or 1)
+        if n_workers <= 1:
+            return [stretch_file(*job) for job in jobs]
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            return list(executor.map(stretch_file, *zip(*jobs)))
 
 
 class Quantizer:
@@ -34,7 +789,8 @@ class Quantizer:
     This process keeps the audio sounding natural without changing the pitch or making it sound strange.
 
     """
-    def __init__(self, audio_data, sample_rate, target_bpm=120, pitch_shift_first=False, verbose=True):
+    def __init__(self, audio_data, sample_rate, target_bpm=120, pitch_shift_first=False, verbose=True, beat_tracker="dp",
+                 stretch_backend="wsola", analysis=None, pitch_shift_mode="varispeed", retrack_after_shift=False):
         """
         Initialize the AudioQuantizer.
         Parameters:
@@ -43,30 +799,49 @@ class Quantizer:
             keep_original_bpm (bool): If True, the original BPM of the audio will be preserved. Default is False.
             pitch_shift_first (bool): If True, the audio will be pitch-shifted to the desired BPM before quantization. Default is False.
             extract_midi (bool): If True, MIDI data will be extracted from the quantized audio. Default is False.   
+            beat_tracker (str): "dp" for HPSS and the dynamic-programming beat tracker, "grid" for the fast
+                constant-tempo BeatGridEstimator, or "auto" to use the grid and fall back to "dp" when its
+                confidence is low. Default is "dp".
+            stretch_backend (str): "wsola" or "phase_vocoder" for the in-process TimeStretcher, or "rubberband"
+                for pyrubberband (requires the rubberband CLI). Default is "wsola".
+            analysis (QuantizeAnalysis or str, optional): Precomputed analysis of the audio, or the path of a
+                cached analysis (reused when it matches the audio, written otherwise).
+            pitch_shift_mode (str): Mode of `pitch_shift_audio` when pitch_shift_first is True, "varispeed" or
+                "quality". Default is "varispeed".
+            retrack_after_shift (bool): If True, the beats are tracked again after the shift. By default they are
+                rescaled by the (constant) shift ratio, and only tracked again when there was nothing to rescale.
         """
+        if beat_tracker not in ("dp", "grid", "auto"):
+            raise ValueError(f"beat_tracker must be 'dp', 'grid' or 'auto', got {beat_tracker}.")
+        self.beat_tracker = beat_tracker
+        self.renderer = QuantizeRenderer(stretch_backend)
+        self.stretch_backend = stretch_backend
         self.audio_data = audio_data
         self.sample_rate = sample_rate
         self.target_bpm = target_bpm
         self.pitch_shift_first = pitch_shift_first
+        self.pitch_shift_mode = pitch_shift_mode
 
-        # Extract beats from audio data
-        tempo, beats, beat_frames = self.extract_beats(audio_data, sample_rate)
-        self.original_bpm = tempo
+        # Analyze the audio (tempo and beats), unless an analysis is given
+        if not isinstance(analysis, QuantizeAnalysis):
+            analysis = QuantizeAnalysis.from_audio(audio_data, sample_rate, beat_tracker, cache_file=analysis)
+        self.analysis = analysis
+        self.original_bpm = analysis.tempo
 
         # Pitch shift audio to target BPM if pitch_shift_first is True
         if pitch_shift_first:
-            audio_data = self.pitch_shift_audio(audio_data, sample_rate, tempo, target_bpm)
-            tempo, beats, beat_frames = self.extract_beats(audio_data, sample_rate)
+            audio_data = self.pitch_shift_audio(audio_data, sample_rate, analysis.tempo, target_bpm, pitch_shift_mode)
+            # A constant-ratio shift moves every beat by the same factor: rescale instead of tracking again
+            if retrack_after_shift or len(analysis.beat_frames) < 2:
+                self.analysis = QuantizeAnalysis.from_audio(audio_data, sample_rate, beat_tracker)
+            else:
+                self.analysis = analysis.rescaled(audio_data.shape[-1])
         
         if verbose:
             print(f"Quantize Audio with current BPM: {self.original_bpm} to target BPM: {self.target_bpm} with pitch_shift_first: {self.pitch_shift_first}")
         
-        # Calculate fixed beat frames based on target BPM
-        fixed_beat_frames = self.calculate_fixed_beat_frames(beat_frames, original_bpm=tempo, target_bpm=target_bpm)
-        # Create time map for stretching audio to target BPM
-        time_map = self.create_time_map(beat_frames, fixed_beat_frames, target_bpm, tempo)
-        # Stretch audio to target BPM using time map
-        self.quantized_audio = self.stretch_audio(audio_data, sample_rate, time_map)
+        # Map the beats to a grid at the target BPM and stretch the audio along the resulting time map
+        self.quantized_audio = self.renderer.render(audio_data, self.analysis, target_bpm)
 
     def __call__(self, *args: Any, **kwds: Any) -> Any:
         return self.quantized_audio
@@ -80,191 +855,107 @@ class Quantizer:
             sample_rate (int): Sample rate of the audio.
 
         Returns:
-            np.ndarray: Beat frames as a numpy array.
-            np.ndarray: Beats as a numpy array.
             float: Tempo of the audio.
+            np.ndarray: Beats as a numpy array.
+            np.ndarray: Beat frames as a numpy array.
         """
-
-        # separate harmonic and percussive components
-        y_harmonic, y_percussive = librosa.effects.hpss(audio_data) 
-
-        # calculate onset strength envelope for percussive component (onset envelope)
-        onset_env = librosa.onset.onset_strength(y=y_percussive, sr=sample_rate) 
-        
-        # calculate tempo and beat frames from onset envelope
-        tempo, beats = librosa.beat.beat_track(sr=sample_rate, onset_envelope=onset_env, trim=False)
-
-        # convert beat frames to sample indices
-        beat_frames = librosa.frames_to_samples(beats)
-        
+        tempo, beats, beat_frames, _ = QuantizeAnalysis.track_beats(audio_data, sample_rate, self.beat_tracker)
         return tempo, beats, beat_frames
-    
+
     def calculate_fixed_beat_frames(self, beat_frames, original_bpm, target_bpm=120):
         """
-        Calculate fixed beat frames based on target BPM and beat frames from audio data 
-        Fix Beat Frames is defined as the beat frames that will be used to stretch the audio to the desired BPM. 
-        The beat frames are calculated by multiplying the beat frames from the audio data by the ratio of the target BPM to the original BPM.
-        For example, if the target BPM is 120 and the original BPM is 100, then the fixed beat frames will be 1.2 times the original beat frames.
-
-        Parameters:
-            beat_frames (np.ndarray): Beat frames as a numpy array.
-            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
-            default_bpm (float): Default BPM (Beats Per Minute) for quantization. Default is 120.
-
-        Returns:
-            np.ndarray: Fixed beat frames as a numpy array.
+        Calculate fixed beat frames based on target BPM and beat frames from audio data, see
+        `QuantizeRenderer.calculate_fixed_beat_frames`.
         """
-        # generate metronome
-        fixed_beat_times = []
-        for i in range(len(beat_frames)):
-            fixed_beat_times.append(i * original_bpm / target_bpm)
-        fixed_beat_frames = librosa.time_to_samples(fixed_beat_times)
+        return self.renderer.calculate_fixed_beat_frames(beat_frames, original_bpm, target_bpm, self.sample_rate)
 
-        return fixed_beat_frames
-    
-    def pitch_shift_audio(self, audio_data, sample_rate, original_bpm, target_bpm):
+    def pitch_shift_audio(self, audio_data, sample_rate, original_bpm, target_bpm, mode="varispeed", semitones=0.0):
         """
-        Pitch shift the audio to the desired BPM.
-
-        Parameters:
-            audio_data (np.ndarray): Audio data as a numpy array.
-            sample_rate (int): Sample rate of the audio.
-            original_bpm (float): Original BPM (Beats Per Minute) of the audio.
-            target_bpm (float): Target BPM (Beats Per Minute) for quantization.
-            
-        Returns:
-            np.ndarray: Pitch-shifted audio data as a numpy array.
+        Shift the audio to the desired BPM, see `QuantizeRenderer.pitch_shift`.
         """
+        return self.renderer.pitch_shift(audio_data, sample_rate, original_bpm, target_bpm, mode, semitones)
 
-        # TODO: implement pitch shifting
-        """Pitch shifting options:
-            1. librosa.effects.pitch_shift
-            2. pysox: https://pysox.readthedocs.io/en/latest/api.html#sox.transform.Transformer.pitch
-            3. pyrubberband: https://pyrubberband.readthedocs.io/en/latest/generated/pyrubberband.pyrb.pitch_shift.html
+    def create_time_map(self, beat_frames, fixed_beat_frames, n_samples, original_bpm, target_bpm):
+        """
+        Create a time map for stretching the audio to the desired BPM, see `QuantizeRenderer.create_time_map`.
+        """
+        return self.renderer.create_time_map(beat_frames, fixed_beat_frames, n_samples, original_bpm, target_bpm)
 
+    def stretch_audio(self, audio_data, sample_rate, time_map, backend=None):
         """
-        return None 
-    
-    
-    def create_time_map(self, beat_frames, fixed_beat_frames, original_bpm, target_bpm):
+        Stretch the audio to the desired BPM using the time map, see `QuantizeRenderer.stretch_audio`.
         """
-        Create a time map for stretching the audio to the desired BPM. 
-        The time map is a list of tuples, where each tuple contains the original beat frame and the fixed beat frame.
-        For example, if the original beat frames are [0, 100, 200, 300] and the fixed beat frames are [0, 120, 240, 360], 
-        then the time map will be [(0, 0), (100, 120), (200, 240), (300, 360)].
+        return self.renderer.stretch_audio(audio_data, sample_rate, time_map, backend)
+
+    def process_stems(self, input_audio, output_dir, stem_paths=None, n_workers=None, separated_dir="separated",
+                      model_name="htdemucs_6s"):
+        """
+        Quantize the demucs stems of the track with the time map of the full mix, see `QuantizeRenderer.render_stems`.
+        With pitch_shift_first, the stems are shifted like the mix while they are streamed, so that they match its
+        shifted analysis.
 
         Parameters:
-            beat_frames (np.ndarray): Beat frames as a numpy array.
-            fixed_beat_frames (np.ndarray): Fixed beat frames as a numpy array.
+            input_audio (str): Path of the track, used to find its stems and to name the outputs.
+            output_dir (str): Directory of the quantized stems.
+            stem_paths (list, optional): Paths of the stems. Default is the stems found by `get_stem_paths`.
+            n_workers (int, optional): Number of worker processes. Default is one per stem, up to the number of cores.
+            separated_dir (str): Output directory of demucs. Default is "separated".
+            model_name (str): Name of the demucs model. Default is "htdemucs_6s".
 
         Returns:
-            list: Time map as a list of tuples.
+            list: Paths of the quantized stems.
         """
-        # construct time map
-        time_map = []
-        for i in range(len(beat_frames)):
-            new_member = (beat_frames[i], fixed_beat_frames[i])
-            time_map.append(new_member)
-
-        # calculate and add ending to time map
-        original_length = len(self.audio_data) # TODO: check why does the original code use len(y+1)
-        orig_end_diff = original_length - time_map[i][0]
-        new_ending = int(round(time_map[i][1] + orig_end_diff * (original_bpm / target_bpm)))
-        new_member = (original_length, new_ending)
-        time_map.append(new_member)
-
-        return time_map
-
-    def stretch_audio(self, audio_data, sample_rate, time_map):
+        if stem_paths is None:
+            stem_paths = get_stem_paths(input_audio, separated_dir, model_name)
+        name = os.path.splitext(os.path.basename(input_audio))[0]
+        if not self.pitch_shift_first:
+            return self.renderer.render_stems(stem_paths, self.analysis, self.target_bpm, output_dir, name, n_workers)
+        speed = float(self.target_bpm) / float(np.atleast_1d(self.original_bpm)[0])
+        return self.renderer.render_stems(stem_paths, self.analysis, self.target_bpm, output_dir, name, n_workers,
+                                          speed, self.pitch_shift_mode)
+
+    def generate_metronome(self, audio_data, sample_rate, fixed_beat_times=None, target_bpm=None,
+                           accents=(1.0, 0.5, 0.5, 0.5), output_path=None):
         """
-        Stretch the audio to the desired BPM using the time map.
+        Generate a metronome click track for the quantized audio.
 
         Parameters:
-            audio_data (np.ndarray): Audio data as a numpy array.
+            audio_data (np.ndarray): Quantized audio data; the click track has the same length.
             sample_rate (int): Sample rate of the audio.
-            time_map (list): Time map as a list of tuples.
+            fixed_beat_times (np.ndarray, optional): Times of the clicks in seconds. Default is the fixed beats
+                of the analysis at the target BPM.
+            target_bpm (float, optional): Target BPM of the time map. Default is the target BPM of the quantizer.
+            accents (tuple): Gain of every beat of a bar. Default is an accented downbeat in 4/4.
+            output_path (str, optional): If given, the click track is also written to this file.
 
         Returns:
-            np.ndarray: Stretched audio data as a numpy array.
+            np.ndarray: Click track as a float32 array.
         """
-
-        return pyrb.timemap_stretch(audio_data, sample_rate, time_map)
-
-    def process_stems(self, input_audio, time_map, target_bpm):
-    
-        # Load stem tracks
-        stem_paths = get_stem_paths(input_audio)
-        stems = []
-        for path in stem_paths:
-            stem, _ = librosa.load(path)
-            stems.append(stem)
-
-        # Stretch each stem
-        stretched_stems = []
-        for stem in stems:
-            stretched = self.stretch_audio(stem, time_map)
-            stretched_stems.append(stretched)
-
-        # Save stretched stems
-        output_paths = []
-        for i, stem in enumerate(stretched_stems):
-            path = self._save_quantized_audio(stem, stem_paths[i], 
-                                            target_bpm, output_dir,
-                                            f'stem{i}')  
-            output_paths.append(path)
-
-        return output_paths
-        
-    def generate_metronome(self, audio_data, sample_rate, fixed_beat_times, target_bpm):
-        """
-        Generate a metronome click track for the quantized audio.
-        
-        clicks_audio = librosa.clicks(times=fixed_beat_times, sr=sample_rate)
-        print(len(clicks_audio), len(strechedaudio))
-        clicks_audio = clicks_audio[:len(strechedaudio)]         
-        path = os.path.join(os.getcwd(), 'processed', vid.id + '- click.wav')
-        sf.write(path, clicks_audio, sr)    
-        """
-
-        return None    
+        if fixed_beat_times is None:
+            beat_frames = self.renderer.fixed_beat_frames(self.analysis, target_bpm or self.target_bpm)
+        else:
+            beat_frames = np.round(np.asarray(fixed_beat_times) * sample_rate).astype(np.int64)
+        clicks = click_track(beat_frames, np.shape(audio_data)[-1], sample_rate, accents)
+        if output_path is not None:
+            sf.write(output_path, clicks, sample_rate)
+        return clicks
 
     def save_quantized_audio(self, audio_data, sample_rate, input_audio_path, target_bpm, output_dir, stem_name=None):
-        # ... (audio saving logic)
-        return None
-
         """
-        
+        Save the quantized audio, named after the original track with its key and tempo, see `quantized_file_name`.
 
-        # time strech audio
-        print('- Quantize Audio: source')
-        
-        path_suffix = (
-            f"Key {vid.audio_features['key']} - "
-            f"Freq {round(vid.audio_features['frequency'], 2)} - "
-            f"Timbre {round(vid.audio_features['timbre'], 2)} - "
-            f"BPM Original {int(vid.audio_features['tempo'])} - "
-            f"BPM {bpm}"
-        )
-        path_prefix = (
-            f"{vid.id} - {vid.name}"
-        )
-
-        audiofilepaths = []
-        # save audio to disk
-        path = os.path.join(os.getcwd(), 'processed', path_prefix + " - " + path_suffix +'.wav')
-        sf.write(path, strechedaudio, sr)
-        audiofilepaths.append(path)
-
-        # process stems
-        stems = ['bass', 'drums', 'guitar', 'other', 'piano', 'vocals']
-        for stem in stems:
-            path = os.path.join(os.getcwd(), 'separated', 'htdemucs_6s', vid.id, stem +'.wav')
-            print(f"- Quantize Audio: {stem}")
-            y, sr = librosa.load(path, sr=None)
-            strechedaudio = pyrb.timemap_stretch(y, sr, time_map)
-            # save stems to disk
-            path = os.path.join(os.getcwd(), 'processed', path_prefix + " - Stem " + stem + " - " + path_suffix +'.wav')
-            sf.write(path, strechedaudio, sr)
-            audiofilepaths.append(path)
+        Parameters:
+            audio_data (np.ndarray): Quantized audio data as a numpy array.
+            sample_rate (int): Sample rate of the audio.
+            input_audio_path (str): Path of the original track.
+            target_bpm (float): Target BPM (Beats Per Minute) of the quantized audio.
+            output_dir (str): Directory of the quantized audio.
+            stem_name (str, optional): Name of the stem, for quantized stems.
 
+        Returns:
+            str: Path of the saved file.
         """
+        file_name = quantized_file_name(input_audio_path, target_bpm, self.original_bpm, self.analysis.key, stem_name)
+        path = os.path.join(output_dir, file_name)
+        sf.write(path, audio_data, sample_rate)
+        return path
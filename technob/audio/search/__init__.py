@@ -1 +1,2 @@
-from .shazam.find import Shazam
\ No newline at end of file
+from .shazam.find import Shazam
+from .similarity import SimilarityIndex, track_embedding
@@ -1,13 +1,16 @@
 #  %%
+import asyncio
 import pandas as pd
 from pydub import AudioSegment
 from pydub.silence import detect_silence
-from technob.audio.search.shazam.find import Shazam
+from technob.audio.search.shazam.client import AsyncShazamClient
+from technob.audio.search.shazam.extraction import SignatureExtractor, extract_signatures
+from technob.audio.search.shazam.find import Shazam, recognize_signatures
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
-def find_songs_from_set_with_shazam(audio_file_path, initial_interval_duration=150*1000, overlap_duration=30*1000, confidence_threshold=0.7, consecutive_matches=2, silence_threshold=-50):
+def find_songs_from_set_with_shazam(audio_file_path, initial_interval_duration=150*1000, overlap_duration=30*1000, confidence_threshold=0.7, consecutive_matches=2, silence_threshold=-50, max_concurrency=1, cache=None):
     '''
     Key Features:
     Audio Preparation: The function loads an audio file into an AudioSegment object.
@@ -16,12 +19,12 @@ def find_songs_from_set_with_shazam(audio_file_path, initial_interval_duration=1
     Variable Intervals: The duration of the audio segments can increase or decrease based on the recognition results, ensuring adaptability.
     Dynamic Overlap: Overlap between segments is adjusted dynamically, especially if a song is recognized towards the end of a segment.
     Silence Detection: Silence intervals within segments help identify potential song transitions, thus adjusting the starting point for the next segment.
-    Caching: Results from Shazam are cached based on the start time of the segments. This prevents redundant API calls and speeds up the process.
+    Caching: With a RecognitionCache, Shazam responses are cached by the content of each signature, so re-running the identification on a set, or on overlapping segments, does not repeat API calls.
     Error Handling & Logging: Errors during the song recognition process are gracefully handled and logged. The function also logs information about the recognized songs for better traceability.
+    Concurrent Recognition: With max_concurrency > 1, the recognitions of each segment are sent concurrently through an AsyncShazamClient instead of one after the other.
     
     Suggestions for Further Improvement:
 
-    Enhanced Caching: Instead of just caching based on the start_time, consider a more sophisticated caching mechanism, perhaps based on the audio segment's hash. This would ensure that even if the same audio segment appears at different times, it won't be processed again.
     Advanced Transition Detection: While the function uses silence to detect song transitions, more advanced methods like spectral flux could be explored to detect transitions even when there isn't complete silence.
     Adaptive Confidence Threshold: Dynamically adjust the confidence_threshold based on the quality or clarity of the audio segment. For instance, in a noisy segment, you might be willing to accept a lower confidence score.
     Batch Processing: If the Shazam API supports it, consider sending multiple audio segments in a single batch request. This would reduce the number of API calls and potentially speed up the process.
@@ -43,7 +46,7 @@ def find_songs_from_set_with_shazam(audio_file_path, initial_interval_duration=1
         songs = {}
 
         try:
-            songs = Shazam(segment).get_songs(n_iterations=5, confidence_threshold=confidence_threshold, consecutive_matches=consecutive_matches)
+            songs = Shazam(segment, cache=cache).get_songs(n_iterations=5, confidence_threshold=confidence_threshold, consecutive_matches=consecutive_matches, max_concurrency=max_concurrency)
         except Exception as e:
             logging.error(f"Error recognizing songs for segment starting at {start_time}: {e}")
         logging.info(f"Songs recognized for segment starting at {start_time}: {songs}")
@@ -146,6 +149,111 @@ def find_songs_from_set_with_shazam_v1(audio_file_path):
     return recognized_songs
 
 
+
+def track_label(info):
+    """Identity of a recognized track, None for a failed recognition."""
+    return (info["name"], info["artist"]) if info and "name" in info else None
+
+
+async def identify_set_async(samples, client, hop_seconds=30.0, signature_seconds=8.0, bisection_steps=4,
+                             local_index=None, n_workers=None):
+    '''
+    Two-phase identification of the tracklist of a set.
+
+    1. Scan: windows every `hop_seconds` over the whole set are all recognized concurrently.
+    2. Bisection: between the last window of a track and the first window of the next one, the window halfway is
+       recognized, and the interval is halved towards the window with the other track, `bisection_steps` times.
+       The bisections of all the transitions run concurrently, one step at a time.
+
+    Parameters:
+        samples (np.ndarray): Signed 16-bit 16 kHz mono samples of the set.
+        client (AsyncShazamClient): Client sending the requests.
+        hop_seconds (float): Stride of the scan, in seconds. Default is 30.
+        signature_seconds (float): Duration of each signature, in seconds. Default is 8.
+        bisection_steps (int): Number of bisection steps per transition. Default is 4 (2 seconds with the default
+            stride).
+        local_index (FingerprintIndex, optional): Local library checked before sending requests. Default is None.
+        n_workers (int, optional): Number of processes generating the signatures of the scan. Default is the number
+            of cores.
+
+    Returns:
+        list: Tracks of the set in order, as dicts with the keys of the recognition results ("name", "artist",
+            "genres", ...), plus "start" (estimated start of the track in the set, in seconds) and "n_windows"
+            (number of windows recognizing it).
+    '''
+    extractor = SignatureExtractor(signature_seconds, hop_seconds, n_workers=n_workers)
+    windows = await asyncio.to_thread(extractor.extract, samples)
+    infos = await recognize_signatures([signature for _, signature in windows], client, local_index)
+    logging.info(f"Scanned {len(windows)} windows, {sum(track_label(info) is not None for info in infos)} recognized")
+
+    # Runs of windows recognizing the same track. Unrecognized windows do not break a run.
+    tracks = []
+    for (offset, _), info in zip(windows, infos):
+        label = track_label(info)
+        if label is None:
+            continue
+        if tracks and tracks[-1]["label"] == label:
+            tracks[-1]["last"] = offset
+            tracks[-1]["n_windows"] += 1
+        else:
+            tracks.append({"label": label, "info": info, "first": offset, "last": offset, "n_windows": 1})
+
+    # Each transition is bracketed by the last window of a track and the first window of the next one
+    brackets = [[previous["last"], track["first"]] for previous, track in zip(tracks, tracks[1:])]
+    undecided = set(range(len(brackets)))
+    for _ in range(bisection_steps):
+        pending = sorted(undecided)
+        if not pending:
+            break
+        middles = [sum(brackets[i]) / 2 for i in pending]
+        signatures = extract_signatures(samples, middles, signature_seconds)
+        results = await recognize_signatures(signatures, client, local_index)
+        for i, middle, info in zip(pending, middles, results):
+            label = track_label(info)
+            if label == tracks[i]["label"]:
+                brackets[i][0] = middle
+            elif label == tracks[i + 1]["label"]:
+                brackets[i][1] = middle
+            else:
+                # Neither track (e.g. the blend of both, or a failed recognition): keep the current bracket
+                undecided.discard(i)
+
+    tracklist = []
+    for i, track in enumerate(tracks):
+        # A track starts at the middle of the windows bracketing its transition
+        start = track["first"] if i == 0 else sum(brackets[i - 1]) / 2 + signature_seconds / 2
+        tracklist.append(dict(track["info"], start=start, n_windows=track["n_windows"]))
+    return tracklist
+
+
+def find_songs_from_set_concurrently(audio_file_path, hop_seconds=30.0, signature_seconds=8.0, bisection_steps=4, max_concurrency=16, requests_per_second=10.0, cache=None, local_index=None, n_workers=None):
+    '''
+    Key Features:
+    Planned Scan: Unlike find_songs_from_set_with_shazam, which walks the set sequentially and adapts its segments after each result, the windows to recognize are planned upfront: a fixed-stride scan over the whole set, whose recognitions all run concurrently. The run takes about as long as the slowest batch of requests rather than the sum of all the API latencies.
+    Transition Bisection: Around each change of track between consecutive scan windows, a few targeted recognitions bisect the interval to pin down the transition time (to hop_seconds / 2 ** bisection_steps).
+    Parallel Signatures: The signatures of the scan are generated on several processes (see SignatureExtractor).
+    Rate Limits: Requests go through an AsyncShazamClient, with at most max_concurrency in flight and requests_per_second, retries and timeouts.
+    Caching & Local Library: With a RecognitionCache and/or a FingerprintIndex, known windows are answered without API calls.
+
+    Returns a DataFrame with the same columns as find_songs_from_set_with_shazam: one row per track, with its estimated start time in minutes.
+    '''
+    samples = SignatureExtractor.load_samples(audio_file_path)
+
+    async def identify():
+        async with AsyncShazamClient(max_concurrency=max_concurrency, requests_per_second=requests_per_second, cache=cache) as client:
+            return await identify_set_async(samples, client, hop_seconds, signature_seconds, bisection_steps, local_index, n_workers)
+
+    tracklist = asyncio.run(identify())
+    for track in tracklist:
+        logging.info(f"{track['start'] / 60:.2f} min: {track['name']} - {track['artist']} ({track['n_windows']} windows)")
+    return pd.DataFrame({
+        "Start Time": [track["start"] / 60 for track in tracklist],  # Convert to minutes
+        "Song": [track["name"] for track in tracklist],
+        "Artist": [track["artist"] for track in tracklist],
+        "Genre": [(track.get("genres") or {}).get("primary") for track in tracklist],
+    }, columns=["Start Time", "Song", "Artist", "Genre"])
+
+
 if __name__ == "__main__":
     # Usage
     audio_file = '/Users/nimamanaf/Desktop/Music/misc/Inquisitor (live) @ Monasterio 10 years.wav'
@@ -1,3 +1,7 @@
-from .algorithm import SignatureGenerator
+from .algorithm import SignatureGenerator, VectorizedSignatureGenerator
 from .signature_format import DecodedMessage
-from .find import Shazam
\ No newline at end of file
+from .find import Shazam
+from .extraction import SignatureExtractor
+from .fingerprint_index import FingerprintIndex
+from .client import AsyncShazamClient
+from .cache import RecognitionCache
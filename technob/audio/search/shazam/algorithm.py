@@ -5,15 +5,17 @@ Source: https://github.com/Numenorean/ShazamAPI/tree/main/ShazamAPI
 """
 
 from numpy import fft, array as nparray, maximum, log, hanning, mean, abs, round
+import numpy as np
 from typing import Dict, List, Set, Sequence, Union, Optional, Any
 from struct import pack, unpack
 from enum import IntEnum
 from copy import copy
+from bisect import bisect_right
 
 HANNING_MATRIX = hanning(2050)[1:-1] # Wipe trailing and leading zeroes
 
 
-from .signature_format import DecodedMessage, FrequencyPeak, RawSignatureHeader, FrequencyBand
+from .signature_format import DecodedMessage, FrequencyPeak, FrequencyPeaks, RawSignatureHeader, FrequencyBand
 
 
 class RingBuffer(list):
@@ -36,7 +38,141 @@ class RingBuffer(list):
         self.position += 1
         self.position %= self.buffer_size
         self.num_written += 1
+
+class SampleRingBuffer:
+    
+    """
+        Ring buffer of the last samples, as an int16 numpy array.
+    """
+    
+    def __init__(self, buffer_size : int):
+        
+        self.samples : np.ndarray = np.zeros(buffer_size, dtype = np.int16)
+        
+        self.position : int = 0
+        self.buffer_size : int = buffer_size
+        self.num_written : int = 0
+    
+    def write(self, samples : np.ndarray):
+        
+        self.samples[self.position:self.position + len(samples)] = samples
+        
+        self.position += len(samples)
+        self.position %= self.buffer_size
+        self.num_written += len(samples)
+    
+    """
+        Samples from the oldest to the newest.
+    """
+    
+    def excerpt(self) -> np.ndarray:
+        
+        return np.concatenate((self.samples[self.position:], self.samples[:self.position]))
+
+class SampleBuffer:
+    
+    """
+        Signed 16-bit samples fed in chunks, kept without copying them:
+        int16 numpy arrays are kept as is, and buffers of 16-bit samples
+        (array('h') from pydub, memoryview) or raw s16le bytes are wrapped
+        by numpy. Other integer samples (e.g. array('b') of 8-bit audio, or
+        lists) are converted once, and rejected if they do not fit in 16
+        bits. Non-integer samples are rejected. The chunks must not be
+        modified while the buffer uses them.
+        
+        Slices are views into a chunk, or copies for the few slices that
+        span two chunks.
+    """
+    
+    def __init__(self):
+        
+        self.chunks : List[np.ndarray] = []
+        self.chunk_starts : List[int] = [0] # Position of each chunk in the buffer, and length of the buffer
+    
+    @staticmethod
+    def as_int16(s16le_mono_samples : Any) -> np.ndarray:
+        
+        if not isinstance(s16le_mono_samples, np.ndarray):
+            
+            try:
+                buffer = memoryview(s16le_mono_samples)
+            except TypeError:
+                buffer = None
+            
+            if buffer is not None and buffer.format in ('B', 'c'): # Raw bytes
+                if buffer.nbytes % 2:
+                    raise ValueError('Raw s16le samples must have an even number of bytes')
+                return np.frombuffer(buffer, dtype = '<i2')
+            
+            if buffer is not None and buffer.itemsize == 2 and buffer.format in ('h', '<h', '=h', '@h'):
+                return np.frombuffer(buffer, dtype = np.int16).ravel()
+            
+            s16le_mono_samples = np.asarray(s16le_mono_samples if buffer is None else buffer)
+            
+            if s16le_mono_samples.size == 0:
+                return np.zeros(0, dtype = np.int16)
+        
+        samples = s16le_mono_samples.ravel()
+        
+        if samples.dtype == np.int16:
+            return samples
+        
+        if samples.dtype.kind not in 'iu':
+            raise TypeError('Samples must be signed 16-bit integers, not %s' % samples.dtype)
+        
+        if len(samples) and (samples.min() < -(1 << 15) or samples.max() >= 1 << 15):
+            raise ValueError('Samples out of the signed 16-bit range')
+        
+        return samples.astype(np.int16)
+    
+    def append(self, s16le_mono_samples : Any):
+        
+        samples = self.as_int16(s16le_mono_samples)
+        
+        if len(samples):
+            self.chunks.append(samples)
+            self.chunk_starts.append(self.chunk_starts[-1] + len(samples))
+    
+    def __iadd__(self, s16le_mono_samples : Any) -> 'SampleBuffer':
+        
+        self.append(s16le_mono_samples)
+        return self
+    
+    def __len__(self) -> int:
+        
+        return self.chunk_starts[-1]
+    
+    def __getitem__(self, index : Any) -> Any:
+        
+        if isinstance(index, (int, np.integer)):
+            
+            position = index + len(self) if index < 0 else index
+            if not 0 <= position < len(self):
+                raise IndexError('SampleBuffer index out of range')
+            
+            chunk = bisect_right(self.chunk_starts, position) - 1
+            return int(self.chunks[chunk][position - self.chunk_starts[chunk]])
+        
+        if not isinstance(index, slice):
+            raise TypeError('SampleBuffer indices must be integers or slices, not %s' % type(index).__name__)
+        
+        start, stop, step = index.indices(len(self))
+        
+        if step != 1:
+            return self[:][index]
+        
+        if stop <= start:
+            return np.zeros(0, dtype = np.int16)
+        
+        first_chunk = bisect_right(self.chunk_starts, start) - 1
+        last_chunk = bisect_right(self.chunk_starts, stop - 1) - 1
         
+        pieces = [
+            self.chunks[chunk][max(start - self.chunk_starts[chunk], 0):stop - self.chunk_starts[chunk]]
+            for chunk in range(first_chunk, last_chunk + 1)
+        ]
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
 class SignatureGenerator:
     
     def __init__(self):
@@ -44,17 +180,17 @@ class SignatureGenerator:
         # Used when storing input that will be processed when requiring to
         # generate a signature:
         
-        self.input_pending_processing : List[int] = [] # Signed 16-bits, 16 KHz mono samples to be processed
+        self.input_pending_processing : SampleBuffer = SampleBuffer() # Signed 16-bits, 16 KHz mono samples to be processed
         
         self.samples_processed : int = 0 # Number of samples processed out of "self.input_pending_processing"
         
         # Used when processing input:
         
-        self.ring_buffer_of_samples : RingBuffer[int] = RingBuffer(buffer_size = 2048, default_value = 0)
+        self.ring_buffer_of_samples : SampleRingBuffer = SampleRingBuffer(buffer_size = 2048)
         
         self.fft_outputs : RingBuffer[List[float]] = RingBuffer(buffer_size = 256, default_value = [0. * 1025]) # Lists of 1025 floats, premultiplied with a Hanning function before being passed through FFT, computed from the ring buffer every new 128 samples
         
-        self.spread_ffts_output : RingBuffer[List[float]] = RingBuffer(buffer_size = 256, default_value = [0] * 1025)
+        self.spread_ffts_output : RingBuffer[np.ndarray] = RingBuffer(buffer_size = 256, default_value = np.zeros(1025))
 
         # How much data to send to Shazam at once?
 
@@ -72,12 +208,14 @@ class SignatureGenerator:
     """
         Add data to be generated a signature for, which will be
         processed when self.get_next_signature() is called. This
-        function expects signed 16-bit 16 KHz mono PCM samples.
+        function expects signed 16-bit 16 KHz mono PCM samples, as
+        an int16 numpy array, array('h'), memoryview, bytes or list,
+        which are kept without copying when possible.
     """
     
-    def feed_input(self, s16le_mono_samples : List[int]):
+    def feed_input(self, s16le_mono_samples : Any):
         
-        self.input_pending_processing += s16le_mono_samples
+        self.input_pending_processing.append(s16le_mono_samples)
     
     """
         Consume some of the samples fed to self.feed_input(), and return
@@ -95,7 +233,7 @@ class SignatureGenerator:
         
         while (len(self.input_pending_processing) - self.samples_processed >= 128 and
             (self.next_signature.number_samples / self.next_signature.sample_rate_hz < self.MAX_TIME_SECONDS or
-            sum(len(peaks) for peaks in self.next_signature.frequency_band_to_sound_peaks.values()) < self.MAX_PEAKS
+            self.next_signature.number_peaks < self.MAX_PEAKS
             )):
             
             self.process_input(self.input_pending_processing[self.samples_processed:self.samples_processed + 128])
@@ -109,14 +247,14 @@ class SignatureGenerator:
         self.next_signature.number_samples = 0
         self.next_signature.frequency_band_to_sound_peaks = {}
         
-        self.ring_buffer_of_samples : RingBuffer[int] = RingBuffer(buffer_size = 2048, default_value = 0)
+        self.ring_buffer_of_samples : SampleRingBuffer = SampleRingBuffer(buffer_size = 2048)
         self.fft_outputs : RingBuffer[List[float]] = RingBuffer(buffer_size = 256, default_value = [0. * 1025])
-        self.spread_ffts_output : RingBuffer[List[float]] = RingBuffer(buffer_size = 256, default_value = [0] * 1025)
+        self.spread_ffts_output : RingBuffer[np.ndarray] = RingBuffer(buffer_size = 256, default_value = np.zeros(1025))
         
         return returned_signature
 
     
-    def process_input(self, s16le_mono_samples : List[int]):
+    def process_input(self, s16le_mono_samples : np.ndarray):
     
         self.next_signature.number_samples += len(s16le_mono_samples)
         
@@ -128,19 +266,9 @@ class SignatureGenerator:
         
     def do_fft(self, batch_of_128_s16le_mono_samples):
         
-        self.ring_buffer_of_samples[
-            self.ring_buffer_of_samples.position:
-            self.ring_buffer_of_samples.position + len(batch_of_128_s16le_mono_samples)
-        ] = batch_of_128_s16le_mono_samples
-        
-        self.ring_buffer_of_samples.position += len(batch_of_128_s16le_mono_samples)
-        self.ring_buffer_of_samples.position %= 2048
-        self.ring_buffer_of_samples.num_written +=  len(batch_of_128_s16le_mono_samples)
+        self.ring_buffer_of_samples.write(batch_of_128_s16le_mono_samples)
         
-        excerpt_from_ring_buffer : list = (
-            self.ring_buffer_of_samples[self.ring_buffer_of_samples.position:] +
-            self.ring_buffer_of_samples[:self.ring_buffer_of_samples.position]
-        )
+        excerpt_from_ring_buffer : np.ndarray = self.ring_buffer_of_samples.excerpt()
         
         # The premultiplication of the array is for applying a windowing function before the DFT (slighty rounded Hanning without zeros at edges)
         
@@ -164,105 +292,326 @@ class SignatureGenerator:
     
     def do_peak_spreading(self):
         
-        origin_last_fft : List[float] = self.fft_outputs[self.fft_outputs.position - 1]
+        origin_last_fft : np.ndarray = self.fft_outputs[self.fft_outputs.position - 1]
         
-        spread_last_fft : List[float] = list(origin_last_fft)
+        # Perform frequency-domain spreading of peak values
         
-        for position in range(1025):
-            
-            # Perform frequency-domain spreading of peak values
-            
-            if position < 1023:
-            
-                spread_last_fft[position] = max(spread_last_fft[position:position + 3])
-            
-            # Perform time-domain spreading of peak values
+        spread_last_fft : np.ndarray = nparray(origin_last_fft)
+        spread_last_fft[:1023] = max_of_arrays([origin_last_fft[0:1023], origin_last_fft[1:1024], origin_last_fft[2:1025]])
+        
+        # Perform time-domain spreading of peak values, each former FFT
+        # taking the maximum of itself and of the more recent one
+        
+        max_value = spread_last_fft
+        
+        for former_fft_num in [-1, -3, -6]:
             
-            max_value = spread_last_fft[position]
+            former_fft_output = self.spread_ffts_output[(self.spread_ffts_output.position + former_fft_num) % self.spread_ffts_output.buffer_size]
             
-            for former_fft_num in [-1, -3, -6]:
-                
-                former_fft_output = self.spread_ffts_output[(self.spread_ffts_output.position + former_fft_num) % self.spread_ffts_output.buffer_size]
-                
-                former_fft_output[position] = max_value = max(former_fft_output[position], max_value)
+            max_value = maximum(former_fft_output, max_value, out = former_fft_output)
                 
         # Save output locally
         
         self.spread_ffts_output.append(spread_last_fft)
-        
-        pass
     
     def do_peak_recognition(self):
         
         fft_minus_46 = self.fft_outputs[(self.fft_outputs.position - 46) % self.fft_outputs.buffer_size]
         fft_minus_49 = self.spread_ffts_output[(self.spread_ffts_output.position - 49) % self.spread_ffts_output.buffer_size]
-        fft_minus_53 = self.spread_ffts_output[(self.spread_ffts_output.position - 53) % self.spread_ffts_output.buffer_size]
-        fft_minus_45 = self.spread_ffts_output[(self.spread_ffts_output.position - 45) % self.spread_ffts_output.buffer_size]
         
-        for bin_position in range(10, 1015):
+        magnitudes = fft_minus_46[10:1015]
+        
+        # Ensure that the bin is large enough to be a peak
+        
+        is_peak = (magnitudes >= 1 / 64) & (magnitudes >= fft_minus_49[9:1014])
+        
+        # Ensure that it is frequency-domain local minimum
+        
+        is_peak &= magnitudes > max_of_arrays([fft_minus_49[10 + offset:1015 + offset] for offset in PEAK_NEIGHBOR_OFFSETS])
+        
+        # Ensure that it is a time-domain local minimum
+        
+        is_peak &= magnitudes > max_of_arrays([
+            self.spread_ffts_output[(self.spread_ffts_output.position + other_offset) % self.spread_ffts_output.buffer_size][9:1014]
+            for other_offset in [-53, -45, *range(165, 201, 7), *range(214, 250, 7)]
+        ])
+        
+        # Store the peaks
+        
+        bin_position = np.nonzero(is_peak)[0] + 10
+        fft_number = np.full(len(bin_position), self.spread_ffts_output.num_written - 46)
+        add_peaks(self.next_signature, *describe_peaks(fft_number, bin_position, fft_minus_46[bin_position - 1],
+            fft_minus_46[bin_position], fft_minus_46[bin_position + 1]))
+
+
+"""
+    Vectorized counterpart of the per-hop processing above: every 2048-sample
+    window of a signature is framed at once with a strided view of the int16
+    input, and the FFT, peak spreading and peak recognition each run as a few
+    array operations over all the hops.
+"""
+
+PEAK_NEIGHBOR_OFFSETS = [*range(-10, -3, 3), -3, 1, *range(2, 9, 3)]
+
+# Spread FFTs compared with the FFT of a candidate peak, relative to its FFT number
+PEAK_OTHER_FFT_OFFSETS = [-7, 1, *range(-45, -9, 7), *range(4, 40, 7)]
+
+def max_of_arrays(arrays : Sequence[np.ndarray]) -> np.ndarray:
+    
+    """
+        Element-wise maximum of same-shaped arrays, without stacking them.
+    """
+    
+    result = np.array(arrays[0])
+    for other in arrays[1:]:
+        maximum(result, other, out = result)
+    return result
+
+def compute_fft_outputs(s16le_mono_samples : np.ndarray, preceding_samples : np.ndarray = None) -> np.ndarray:
+    
+    """
+        Power spectra of every 128-sample hop of a signature, as computed by
+        SignatureGenerator.do_fft(). The ring buffer starts with zeros, or
+        with the 1920 samples preceding the first hop when they are given.
+        Returns an array of shape (number of hops, 1025).
+    """
+    
+    if preceding_samples is None:
+        preceding_samples = np.zeros(2048 - 128)
+    
+    padded_samples = np.concatenate((np.asarray(preceding_samples, dtype = np.float64), s16le_mono_samples))
+    frames = np.lib.stride_tricks.sliding_window_view(padded_samples, 2048)[::128]
+    
+    fft_results = fft.rfft(HANNING_MATRIX * frames, axis = 1)
+    
+    fft_results = (fft_results.real ** 2 + fft_results.imag ** 2) / (1 << 17)
+    return maximum(fft_results, 0.0000000001)
+
+def spread_fft_outputs(fft_outputs : np.ndarray) -> np.ndarray:
+    
+    """
+        Final values of SignatureGenerator.spread_ffts_output for each FFT:
+        the maximum over three adjacent bins, then over the FFT and the six
+        following ones. Rows are shifted by 45 so that the FFTs of numbers
+        -45 to -1 (still zeros in the ring buffer) can be indexed too.
+    """
+    
+    spread_ffts = fft_outputs.copy()
+    spread_ffts[:, :1023] = max_of_arrays([fft_outputs[:, 0:1023], fft_outputs[:, 1:1024], fft_outputs[:, 2:1025]])
+    
+    padded_ffts = np.concatenate((np.zeros((45, 1025)), spread_ffts, np.zeros((6, 1025))))
+    
+    # Maximum over 7 FFTs as the maximum of two overlapping maxima over 4 FFTs
+    
+    max_of_2 = maximum(padded_ffts[:-1], padded_ffts[1:])
+    max_of_4 = maximum(max_of_2[:-2], max_of_2[2:])
+    return maximum(max_of_4[:-3], max_of_4[3:])
+
+def recognize_peaks(fft_outputs : np.ndarray, spread_ffts : np.ndarray, first_fft_number : int = 0) -> tuple:
+    
+    """
+        Peaks of the FFTs that SignatureGenerator.do_peak_recognition() can
+        see, i.e. FFT numbers up to the number of hops minus 46. FFTs before
+        "first_fft_number" only serve as history, and FFT numbers are
+        counted from it.
+        Returns arrays of the FFT numbers, magnitudes, corrected frequency
+        bins and frequency bands of the peaks, ordered by FFT number then bin.
+    """
+    
+    number_ffts = len(fft_outputs) - 45 - first_fft_number
+    if number_ffts <= 0:
+        return tuple(np.zeros(0, dtype = np.int64) for _ in range(4))
+    
+    fft_outputs = fft_outputs[first_fft_number:]
+    spread_ffts = spread_ffts[first_fft_number:]
+    
+    magnitudes = fft_outputs[:number_ffts, 10:1015]
+    
+    # Spread FFT of number minus 3, at the bin before and at the neighbor bins
+    
+    spread_minus_3 = spread_ffts[45 - 3:45 - 3 + number_ffts]
+    
+    max_neighbor = max_of_arrays([spread_minus_3[:, 10 + offset:1015 + offset] for offset in PEAK_NEIGHBOR_OFFSETS])
+    
+    is_peak = (magnitudes >= 1 / 64) & (magnitudes >= spread_minus_3[:, 9:1014]) & (magnitudes > max_neighbor)
+    
+    # Other spread FFTs, at the bin before
+    
+    max_other = max_of_arrays([spread_ffts[45 + offset:45 + offset + number_ffts, 9:1014] for offset in PEAK_OTHER_FFT_OFFSETS])
+    
+    is_peak &= magnitudes > max_other
+    
+    fft_number, bin_position = np.nonzero(is_peak)
+    bin_position += 10
+    
+    return describe_peaks(fft_number, bin_position, fft_outputs[fft_number, bin_position - 1],
+        fft_outputs[fft_number, bin_position], fft_outputs[fft_number, bin_position + 1])
+
+def describe_peaks(fft_number : np.ndarray, bin_position : np.ndarray, fft_before : np.ndarray,
+        fft_peak : np.ndarray, fft_after : np.ndarray) -> tuple:
+    
+    """
+        Magnitudes, corrected frequency bins and frequency bands of peaks
+        given by their FFT numbers, bins and FFT values at the bins before,
+        at and after the peak. Peaks outside of the 250 Hz - 5500 Hz bands
+        are dropped.
+    """
+    
+    peak_magnitude = log(maximum(1 / 64, fft_peak)) * 1477.3 + 6144
+    peak_magnitude_before = log(maximum(1 / 64, fft_before)) * 1477.3 + 6144
+    peak_magnitude_after = log(maximum(1 / 64, fft_after)) * 1477.3 + 6144
+    
+    peak_variation_1 = peak_magnitude * 2 - peak_magnitude_before - peak_magnitude_after
+    peak_variation_2 = (peak_magnitude_after - peak_magnitude_before) * 32 / peak_variation_1
+    
+    corrected_peak_frequency_bin = bin_position * 64 + peak_variation_2
+    
+    assert np.all(peak_variation_1 > 0)
+    
+    frequency_hz = corrected_peak_frequency_bin * (16000 / 2 / 1024 / 64)
+    
+    band = np.searchsorted([250, 520, 1450, 3500], frequency_hz, side = 'right') - 1
+    kept = (frequency_hz >= 250) & (frequency_hz <= 5500)
+    
+    return (fft_number[kept], peak_magnitude[kept].astype(np.int64),
+        corrected_peak_frequency_bin[kept].astype(np.int64), band[kept])
+
+def add_peaks(signature : DecodedMessage, fft_number : np.ndarray, peak_magnitude : np.ndarray,
+        corrected_peak_frequency_bin : np.ndarray, band : np.ndarray):
+    
+    """
+        Append peaks, as returned by describe_peaks(), to the per-band peaks
+        of a signature.
+    """
+    
+    for band_id in np.unique(band).tolist():
+        
+        in_band = band == band_id
+        
+        signature.frequency_band_to_sound_peaks.setdefault(FrequencyBand(band_id), FrequencyPeaks(16000)).extend(
+            fft_number[in_band], peak_magnitude[in_band], corrected_peak_frequency_bin[in_band]
+        )
+
+class VectorizedSignatureGenerator:
+    
+    """
+        Same interface and bit-identical signatures as SignatureGenerator,
+        with input kept as an int16 numpy array and all the hops of a
+        signature processed at once.
+    """
+    
+    def __init__(self):
+        
+        self.input_pending_processing : SampleBuffer = SampleBuffer() # Signed 16-bits, 16 KHz mono samples to be processed
+        
+        self.samples_processed : int = 0 # Number of samples processed out of "self.input_pending_processing"
+        
+        self.MAX_TIME_SECONDS = 3.1
+        self.MAX_PEAKS = 255
+    
+    def feed_input(self, s16le_mono_samples : Any):
+        
+        self.input_pending_processing.append(s16le_mono_samples)
+    
+    """
+        Process hops until the signature is long enough and has enough
+        peaks, as SignatureGenerator does. As the number of hops depends on
+        the peaks found, a first guess is processed and doubled if needed.
+    """
+    
+    def get_next_signature(self) -> Optional[DecodedMessage]:
+        
+        number_hops_available = (len(self.input_pending_processing) - self.samples_processed) // 128
+        
+        if number_hops_available < 1:
+            return None
+        
+        number_hops = min(number_hops_available, max(int(self.MAX_TIME_SECONDS * 16000 / 128), 0) + 128)
+        
+        while True:
             
-            # Ensure that the bin is large enough to be a peak
+            samples = self.input_pending_processing[self.samples_processed:self.samples_processed + number_hops * 128]
             
-            if (fft_minus_46[bin_position] >= 1 / 64 and
-                fft_minus_46[bin_position] >= fft_minus_49[bin_position - 1]):
-                
-                # Ensure that it is frequency-domain local minimum
-                
-                max_neighbor_in_fft_minus_49 = 0
-                
-                for neighbor_offset in [*range(-10, -3, 3), -3, 1, *range(2, 9, 3)]:
-                
-                    max_neighbor_in_fft_minus_49 = max(fft_minus_49[bin_position + neighbor_offset], max_neighbor_in_fft_minus_49)
-                
-                if fft_minus_46[bin_position] > max_neighbor_in_fft_minus_49:
-                    
-                    # Ensure that it is a time-domain local minimum
-                    
-                    max_neighbor_in_other_adjacent_ffts = max_neighbor_in_fft_minus_49
-                    
-                    for other_offset in [-53, -45, *range(165, 201, 7), *range(214, 250, 7)]:
-                    
-                        max_neighbor_in_other_adjacent_ffts = max(
-                            self.spread_ffts_output[(self.spread_ffts_output.position + other_offset) % self.spread_ffts_output.buffer_size][bin_position - 1],
-                            max_neighbor_in_other_adjacent_ffts
-                        )
-                    
-                    if fft_minus_46[bin_position] > max_neighbor_in_other_adjacent_ffts:
-                        
-                        # This is a peak, store the peak
-                        
-                        fft_number = self.spread_ffts_output.num_written - 46
-                        
-                        peak_magnitude = log(max(1 / 64, fft_minus_46[bin_position])) * 1477.3 + 6144
-                        peak_magnitude_before = log(max(1 / 64, fft_minus_46[bin_position - 1])) * 1477.3 + 6144
-                        peak_magnitude_after = log(max(1 / 64, fft_minus_46[bin_position + 1])) * 1477.3 + 6144
-                        
-                        peak_variation_1 = peak_magnitude * 2 - peak_magnitude_before - peak_magnitude_after
-                        peak_variation_2 = (peak_magnitude_after - peak_magnitude_before) * 32 / peak_variation_1
-                        
-                        corrected_peak_frequency_bin = bin_position * 64 + peak_variation_2
-                        
-                        assert peak_variation_1 > 0
-                        
-                        frequency_hz = corrected_peak_frequency_bin * (16000 / 2 / 1024 / 64)
-                        
-                        if frequency_hz < 250:
-                            continue
-                        elif frequency_hz < 520:
-                            band = FrequencyBand._250_520
-                        elif frequency_hz < 1450:
-                            band = FrequencyBand._520_1450
-                        elif frequency_hz < 3500:
-                            band = FrequencyBand._1450_3500
-                        elif frequency_hz <= 5500:
-                            band = FrequencyBand._3500_5500
-                        else:
-                            continue
-                        
-                        if band not in self.next_signature.frequency_band_to_sound_peaks:
-                            self.next_signature.frequency_band_to_sound_peaks[band] = []
-                        
-                        self.next_signature.frequency_band_to_sound_peaks[band].append(
-                            FrequencyPeak(fft_number, int(peak_magnitude), int(corrected_peak_frequency_bin), 16000)
-                        )
-                        
+            fft_outputs = compute_fft_outputs(samples)
+            fft_number, peak_magnitude, corrected_peak_frequency_bin, band = recognize_peaks(
+                fft_outputs, spread_fft_outputs(fft_outputs))
+            
+            # Peaks found after each hop: the FFT of number n is recognized at hop n + 46
+            peaks_after_hops = np.searchsorted(fft_number, np.arange(number_hops + 1) - 46, side = 'right')
+            
+            number_samples = np.arange(number_hops + 1) * 128
+            stops = np.nonzero((number_samples / 16000 >= self.MAX_TIME_SECONDS) & (peaks_after_hops >= self.MAX_PEAKS))[0]
+            
+            if len(stops):
+                signature_hops = stops[0]
+                break
+            if number_hops == number_hops_available:
+                signature_hops = number_hops
+                break
+            
+            number_hops = min(number_hops_available, number_hops * 2)
+        
+        signature = DecodedMessage()
+        signature.sample_rate_hz = 16000
+        signature.number_samples = signature_hops * 128
+        signature.frequency_band_to_sound_peaks = {}
+        
+        number_peaks = peaks_after_hops[signature_hops]
+        
+        add_peaks(signature, fft_number[:number_peaks], peak_magnitude[:number_peaks],
+            corrected_peak_frequency_bin[:number_peaks], band[:number_peaks])
+        
+        self.samples_processed += signature_hops * 128
+        
+        return signature
+    
+    """
+        Signature of the input from "offset_seconds" on, over "duration"
+        seconds (MAX_TIME_SECONDS by default), without processing the input
+        before it. The recognizer compares each FFT with the 45 previous
+        ones, so with "warm_up" these FFTs are computed from the preceding
+        input, as if the signature was cut from a continuous stream.
+        Without it, the ring buffers start with zeros, as for a signature
+        returned by get_next_signature() from that offset.
+        
+        Returns None if there is less than one hop of input at the offset.
+        "samples_processed" is left untouched.
+    """
+    
+    def signature_at(self, offset_seconds : float, duration : Optional[float] = None,
+            warm_up : bool = True) -> Optional[DecodedMessage]:
+        
+        if offset_seconds < 0:
+            raise ValueError('offset_seconds must be positive')
+        
+        start = int(round(offset_seconds * 16000))
+        duration = self.MAX_TIME_SECONDS if duration is None else duration
+        
+        number_hops = min(int(np.ceil(duration * 16000 / 128)), (len(self.input_pending_processing) - start) // 128)
+        
+        if number_hops < 1:
+            return None
+        
+        number_warm_up_ffts = 45 if warm_up else 0
+        first_sample = start - number_warm_up_ffts * 128
+        end = start + number_hops * 128
+        
+        # Zeros stand for the input before its beginning, as in a ring buffer starting with zeros
+        
+        samples = np.concatenate((np.zeros(max(-first_sample, 0)), self.input_pending_processing[max(first_sample, 0):end]))
+        
+        preceding_samples = None
+        if warm_up:
+            history = self.input_pending_processing[max(first_sample - (2048 - 128), 0):max(first_sample, 0)]
+            preceding_samples = np.concatenate((np.zeros(2048 - 128 - len(history)), history))
+        
+        fft_outputs = compute_fft_outputs(samples, preceding_samples)
+        
+        signature = DecodedMessage()
+        signature.sample_rate_hz = 16000
+        signature.number_samples = number_hops * 128
+        signature.frequency_band_to_sound_peaks = {}
+        
+        add_peaks(signature, *recognize_peaks(fft_outputs, spread_fft_outputs(fft_outputs), number_warm_up_ffts))
+        
+        return signature
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "technob", "shazam_recognitions.sqlite")
+
+
+def signature_key(signature):
+    """
+    Exact key of a signature: hash of its binary encoding.
+
+    Parameters:
+        signature (DecodedMessage): Signature.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    return hashlib.sha256(signature.encode_to_binary()).hexdigest()
+
+
+def coarse_signature_key(signature, n_peaks=32, time_resolution=16, frequency_resolution=256):
+    """
+    Coarse key of a signature, shared by near-duplicate signatures (e.g. the same window decoded twice, or with
+    slightly different gains): hash of its strongest peaks, on a coarse time and frequency grid.
+
+    Parameters:
+        signature (DecodedMessage): Signature.
+        n_peaks (int): Number of strongest peaks hashed. Default is 32.
+        time_resolution (int): Size of the time cells, in FFT passes. Default is 16 (128 ms).
+        frequency_resolution (int): Size of the frequency cells, in corrected peak frequency bins. Default is 256
+            (4 FFT bins, 31 Hz).
+
+    Returns:
+        str or None: SHA-256 hex digest, None for a signature without peaks.
+    """
+    peaks = [peaks.array for peaks in signature.frequency_band_to_sound_peaks.values() if len(peaks)]
+    if not peaks:
+        return None
+    peaks = np.concatenate(peaks)
+    strongest = peaks[np.argsort(-peaks["peak_magnitude"].astype(np.int64), kind="stable")[:n_peaks]]
+    cells = np.unique(np.stack([strongest["fft_pass_number"].astype(np.int64) // time_resolution,
+                                strongest["corrected_peak_frequency_bin"].astype(np.int64) // frequency_resolution]),
+                      axis=1)
+    return hashlib.sha256(np.ascontiguousarray(cells).tobytes()).hexdigest()
+
+
+class RecognitionCache:
+    """
+    Class Usage: Persistent cache of Shazam recognition responses, keyed by the content of the signature.
+
+    Responses are stored in an SQLite database, so identical windows of a set (or re-runs on the same set) are
+    answered without any API call. Lookups try the exact key of the signature first, then optionally its coarse
+    key (see `coarse_signature_key`) for near-duplicates. Entries expire `ttl` seconds after they were stored, and
+    the least recently used entries are evicted beyond `max_entries`. Hits, misses and evictions are counted in
+    `stats`.
+
+    The cache plugs in front of the requests of `Shazam` and `AsyncShazamClient` with their `cache` argument.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, ttl=30 * 24 * 3600, max_entries=100000, coarse=False,
+                 cache_unrecognized=False):
+        """
+        Initialize the RecognitionCache.
+
+        Parameters:
+            path (str): Path of the database, or ":memory:". Default is "~/.cache/technob/shazam_recognitions.sqlite".
+            ttl (float, optional): Lifetime of the entries, in seconds, None for no expiry. Default is 30 days.
+            max_entries (int, optional): Largest number of entries, None for no limit. Default is 100000.
+            coarse (bool): If True, a miss on the exact key falls back to the coarse key. Default is False.
+            cache_unrecognized (bool): If True, responses without a track are cached as well. Default is False,
+                so that transient failures are retried.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.coarse = coarse
+        self.cache_unrecognized = cache_unrecognized
+        self.stats = {"hits": 0, "coarse_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "stores": 0}
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The connection is shared by the threads of the caller, one statement at a time
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS recognitions (key TEXT PRIMARY KEY, coarse_key TEXT, "
+                                     "response TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS recognitions_coarse_key ON recognitions (coarse_key)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS recognitions_accessed ON recognitions (accessed)")
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM recognitions").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        self._connection.close()
+
+    @property
+    def hit_rate(self):
+        """Share of the lookups answered by the cache."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def get(self, signature):
+        """
+        Look up the response of a signature.
+
+        Parameters:
+            signature (DecodedMessage): Signature.
+
+        Returns:
+            dict or None: Cached JSON response, None on a miss.
+        """
+        now = time.time()
+        keys = [("key", signature_key(signature))]
+        if self.coarse:
+            keys.append(("coarse_key", coarse_signature_key(signature)))
+
+        with self._lock:
+            for column, key in keys:
+                if key is None:
+                    continue
+                row = self._connection.execute(f"SELECT key, response, created FROM recognitions WHERE {column} = ? "
+                                               "ORDER BY accessed DESC LIMIT 1", (key,)).fetchone()
+                if row is None:
+                    continue
+                if self.ttl is not None and now - row[2] > self.ttl:
+                    self._connection.execute("DELETE FROM recognitions WHERE key = ?", (row[0],))
+                    self.stats["expired"] += 1
+                    continue
+                self._connection.execute("UPDATE recognitions SET accessed = ? WHERE key = ?", (now, row[0]))
+                self.stats["hits"] += 1
+                self.stats["coarse_hits"] += column == "coarse_key"
+                return json.loads(row[1])
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, signature, response):
+        """
+        Store the response of a signature, evicting the least recently used entries beyond `max_entries`.
+
+        Parameters:
+            signature (DecodedMessage): Signature.
+            response (dict): JSON response of the API.
+
+        Returns:
+            bool: True if the response was stored.
+        """
+        if not self.cache_unrecognized and "track" not in response:
+            return False
+        now = time.time()
+        coarse_key = coarse_signature_key(signature) if self.coarse else None
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO recognitions VALUES (?, ?, ?, ?, ?)",
+                                     (signature_key(signature), coarse_key, json.dumps(response), now, now))
+            self.stats["stores"] += 1
+            if self.max_entries is not None:
+                excess = self._connection.execute("SELECT COUNT(*) FROM recognitions").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self._connection.execute("DELETE FROM recognitions WHERE key IN (SELECT key FROM recognitions "
+                                             "ORDER BY accessed LIMIT ?)", (excess,))
+                    self.stats["evictions"] += excess
+        return True
+
+    def purge_expired(self):
+        """
+        Delete the expired entries.
+
+        Returns:
+            int: Number of deleted entries.
+        """
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            deleted = self._connection.execute("DELETE FROM recognitions WHERE created < ?",
+                                               (time.time() - self.ttl,)).rowcount
+        self.stats["expired"] += deleted
+        return deleted
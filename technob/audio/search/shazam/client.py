@@ -0,0 +1,188 @@
+import asyncio
+import random
+import time
+import aiohttp
+from technob.audio.search.shazam.find import Shazam, recognition_request
+
+
+class TokenBucket:
+    """
+    Class Usage: Rate limiter of asynchronous requests. Tokens refill continuously at `rate` per second, up to
+    `capacity`, and each request takes one token, waiting for it if the bucket is empty.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Initialize the TokenBucket.
+
+        Parameters:
+            rate (float): Tokens added per second.
+            capacity (float, optional): Largest number of tokens, i.e. of requests sent in a burst. Default is
+                `rate`, at least 1.
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Take a token, waiting until one is available."""
+        # Waiters queue on the lock, so that tokens are handed out in order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncShazamClient:
+    """
+    Class Usage: Asynchronous client of the Shazam recognition API, to run dozens of recognitions concurrently.
+
+    All the requests go through one keep-alive aiohttp session. A bounded semaphore caps the requests in flight,
+    a token bucket caps the request rate, and each request has a timeout. Connection errors, timeouts, and 429 or
+    5xx responses are retried with exponential backoff and jitter (honoring Retry-After). With a `RecognitionCache`,
+    cached signatures are answered without any request.
+
+    Usage:
+        async with AsyncShazamClient(max_concurrency=16) as client:
+            responses = await client.recognize_many(signatures)
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_concurrency=16, requests_per_second=10.0, burst=None, max_retries=3, backoff=0.5,
+                 max_backoff=8.0, timeout=10.0, api_url=None, headers=None, cache=None):
+        """
+        Initialize the AsyncShazamClient.
+
+        Parameters:
+            max_concurrency (int): Largest number of requests in flight. Default is 16.
+            requests_per_second (float, optional): Largest request rate, None for no limit. Default is 10.
+            burst (float, optional): Number of requests that can be sent at once after an idle period.
+                Default is `requests_per_second`.
+            max_retries (int): Number of retries of a failed request. Default is 3.
+            backoff (float): Delay before the first retry, in seconds, doubled at each retry. Default is 0.5.
+            max_backoff (float): Largest delay between retries, in seconds. Default is 8.
+            timeout (float): Timeout of each request (attempt), in seconds. Default is 10.
+            api_url (str, optional): URL template of the API, see `recognition_request`. Default is `Shazam.API_URL`.
+            headers (dict, optional): Headers of the requests. Default is `Shazam.HEADERS`.
+            cache (RecognitionCache, optional): Cache of the responses. Default is None.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.api_url = api_url or Shazam.API_URL
+        self.headers = headers or Shazam.HEADERS
+        self.cache = cache
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        """Open the session, if it is not open yet. Called by the first request otherwise."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = asyncio.BoundedSemaphore(self.max_concurrency)
+
+    async def close(self):
+        """Close the session and its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def retry_delay(self, attempt, retry_after=None):
+        """
+        Delay before a retry.
+
+        Parameters:
+            attempt (int): Number of the failed attempt, from 0.
+            retry_after (str, optional): Retry-After header of the response, in seconds.
+
+        Returns:
+            float: Delay in seconds: exponential backoff with full jitter, or the Retry-After delay if longer.
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        try:
+            return max(delay, min(float(retry_after), self.max_backoff)) if retry_after else delay
+        except ValueError:
+            return delay
+
+    async def recognize(self, signature) -> dict:
+        """
+        Send a recognition request.
+
+        Parameters:
+            signature (DecodedMessage): Signature to recognize.
+
+        Returns:
+            dict: JSON response of the API, see `track_info`.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(signature)
+            if cached is not None:
+                return cached
+        await self.open()
+        url, data = recognition_request(signature, self.api_url)
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                if self.bucket is not None:
+                    await self.bucket.acquire()
+                self.stats["requests"] += 1
+                retry_after = None
+                try:
+                    async with self._session.post(url, json=data) as response:
+                        if response.status not in self.RETRY_STATUSES:
+                            response.raise_for_status()
+                            results = await response.json(content_type=None)
+                            if self.cache is not None:
+                                self.cache.put(signature, results)
+                            return results
+                        retry_after = response.headers.get("Retry-After")
+                        error = aiohttp.ClientResponseError(response.request_info, response.history,
+                                                            status=response.status, message=response.reason)
+                except aiohttp.ClientResponseError:
+                    # Other 4xx responses will not succeed on retry
+                    self.stats["failures"] += 1
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = e
+
+                if attempt == self.max_retries:
+                    self.stats["failures"] += 1
+                    raise error
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.retry_delay(attempt, retry_after))
+
+    async def recognize_many(self, signatures, return_exceptions=False) -> list:
+        """
+        Send recognition requests concurrently.
+
+        Parameters:
+            signatures (list): Signatures (DecodedMessage) to recognize.
+            return_exceptions (bool): If True, the errors of failed requests are returned in place of their
+                responses instead of being raised. Default is False.
+
+        Returns:
+            list: JSON response of each signature, in order.
+        """
+        return await asyncio.gather(*(self.recognize(signature) for signature in signatures),
+                                    return_exceptions=return_exceptions)
@@ -0,0 +1,129 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from technob.audio.search.shazam.algorithm import VectorizedSignatureGenerator
+from technob.audio.search.shazam.find import prepare_audio
+
+
+# Samples of the set in the worker processes, attached to the shared memory block of the parent
+_shared_samples = None
+
+
+def _attach_shared_samples(name, n_samples):
+    """Attach a worker process to the shared memory block holding the samples of the set."""
+    global _shared_samples
+    block = shared_memory.SharedMemory(name=name)
+    _shared_samples = (block, np.ndarray((n_samples,), dtype=np.int16, buffer=block.buf))
+
+
+def extract_signatures(samples, offsets, signature_seconds, warm_up=True):
+    """
+    Generate the signatures of windows of a set.
+
+    Parameters:
+        samples (np.ndarray): Signed 16-bit 16 kHz mono samples of the set. Default is the samples shared with the
+            worker process.
+        offsets (list): Start of each window, in seconds.
+        signature_seconds (float): Duration of each signature, in seconds.
+        warm_up (bool): See `VectorizedSignatureGenerator.signature_at`. Default is True.
+
+    Returns:
+        list: Signature (DecodedMessage) of each window, or None for windows starting after the end of the set.
+    """
+    generator = VectorizedSignatureGenerator()
+    generator.feed_input(_shared_samples[1] if samples is None else samples)
+    return [generator.signature_at(offset, signature_seconds, warm_up) for offset in offsets]
+
+
+class SignatureExtractor:
+    """
+    Class Usage: Generate the Shazam signatures of many windows of a DJ set on several cores.
+
+    The set is decoded once to 16-bit 16 kHz mono samples and copied into a shared memory block, which the worker
+    processes read without any pickling of audio. Each window is computed on its own with
+    `VectorizedSignatureGenerator.signature_at`, so windows can be spread across workers freely, and the signatures
+    come back ordered with their offsets. Sending them to the recognition service is left to the caller, and can be
+    scheduled independently of this CPU work.
+    """
+
+    def __init__(self, signature_seconds=8.0, hop_seconds=15.0, warm_up=True, n_workers=None, chunk_size=16):
+        """
+        Initialize the SignatureExtractor.
+
+        Parameters:
+            signature_seconds (float): Duration of each signature, in seconds. Default is 8, as sent by `Shazam`.
+            hop_seconds (float): Time between the starts of consecutive windows, in seconds. Default is 15.
+            warm_up (bool): If True, each signature is computed as if it was cut from a continuous stream,
+                see `VectorizedSignatureGenerator.signature_at`. Default is True.
+            n_workers (int, optional): Number of worker processes. Default is the number of cores.
+            chunk_size (int): Number of windows sent to a worker at once. Default is 16.
+        """
+        self.signature_seconds = signature_seconds
+        self.hop_seconds = hop_seconds
+        self.warm_up = warm_up
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def load_samples(audio):
+        """
+        Decode audio to the samples signatures are computed from.
+
+        Parameters:
+            audio (str, np.ndarray, bytes or AudioSegment): Audio file path, encoded file, or AudioSegment.
+                numpy arrays are taken as signed 16-bit 16 kHz mono samples already.
+
+        Returns:
+            np.ndarray: Signed 16-bit 16 kHz mono samples.
+        """
+        if isinstance(audio, np.ndarray):
+            return audio.astype(np.int16, copy=False)
+        return np.frombuffer(prepare_audio(audio).get_array_of_samples(), dtype=np.int16)
+
+    def window_offsets(self, duration):
+        """
+        Start of the windows covering a set.
+
+        Parameters:
+            duration (float): Duration of the set, in seconds.
+
+        Returns:
+            np.ndarray: Start of each window, in seconds, the last window ending before the end of the set.
+        """
+        return np.arange(0.0, max(duration - self.signature_seconds, 0.0) + 1e-9, self.hop_seconds)
+
+    def extract(self, audio, offsets=None):
+        """
+        Generate the signatures of windows of a set.
+
+        Parameters:
+            audio (str, np.ndarray, bytes or AudioSegment): Set to process, see `load_samples`.
+            offsets (list, optional): Start of each window, in seconds. Default is `window_offsets` of the set.
+
+        Returns:
+            list: (offset in seconds, DecodedMessage) for each window, ordered by offset. Windows starting after
+                the end of the set are left out.
+        """
+        samples = self.load_samples(audio)
+        offsets = self.window_offsets(len(samples) / 16000) if offsets is None else offsets
+        offsets = sorted(float(offset) for offset in offsets)
+        chunks = [offsets[i:i + self.chunk_size] for i in range(0, len(offsets), self.chunk_size)]
+
+        if self.n_workers <= 1 or len(chunks) <= 1:
+            signatures = extract_signatures(samples, offsets, self.signature_seconds, self.warm_up)
+        else:
+            block = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1))
+            try:
+                np.ndarray(samples.shape, dtype=np.int16, buffer=block.buf)[:] = samples
+                with ProcessPoolExecutor(max_workers=min(self.n_workers, len(chunks)),
+                                         initializer=_attach_shared_samples,
+                                         initargs=(block.name, len(samples))) as executor:
+                    results = executor.map(extract_signatures, [None] * len(chunks), chunks,
+                                           [self.signature_seconds] * len(chunks), [self.warm_up] * len(chunks))
+                    signatures = [signature for result in results for signature in result]
+            finally:
+                block.close()
+                block.unlink()
+
+        return [(offset, signature) for offset, signature in zip(offsets, signatures) if signature is not None]
@@ -10,11 +10,181 @@ import uuid
 import time
 import json
 import asyncio
+import warnings
 
-from technob.audio.search.shazam.algorithm import SignatureGenerator
+from technob.audio.search.shazam.algorithm import VectorizedSignatureGenerator
 from technob.audio.search.shazam.signature_format import DecodedMessage
 
 
+def prepare_audio(audio) -> AudioSegment:
+    """
+    Load and convert audio to the format of Shazam signatures: 16-bit 16 kHz mono.
+
+    Parameters:
+        audio (str, np.ndarray, bytes or AudioSegment): Audio file path, samples, encoded file, or AudioSegment.
+
+    Returns:
+        AudioSegment: Converted audio.
+    """
+    if isinstance(audio, str):
+        format_ = audio.split('.')[-1]
+        audio = AudioSegment.from_file(audio, format=format_)   
+    elif isinstance(audio, np.ndarray):
+        audio = AudioSegment(audio.tobytes(), )
+    elif isinstance(audio, bytes):
+        audio = AudioSegment.from_file(BytesIO(audio))
+    elif isinstance(audio, AudioSegment):
+        pass
+    else:
+        raise TypeError('audio must be str, np.ndarray, bytes or AudioSegment')
+    
+    audio = audio.set_sample_width(2)
+    audio = audio.set_frame_rate(16000)
+    audio = audio.set_channels(1)
+    return audio
+
+
+def recognition_request(signature, api_url):
+    """
+    Build a recognition request of the Shazam API.
+
+    Parameters:
+        signature (DecodedMessage): Signature to recognize.
+        api_url (str): URL template of the API, with two "%s" for the UUIDs of the request.
+
+    Returns:
+        tuple: URL and JSON payload of the request.
+    """
+    url = api_url % (str(uuid.uuid4()).upper(), str(uuid.uuid4()).upper())
+    data = {
+        'signature': {
+            'uri': signature.encode_to_uri(),
+            'samplems': int(signature.number_samples / signature.sample_rate_hz * 1000)
+            },
+        'timestamp': int(time.time() * 1000),
+        'context': {},
+        'geolocation': {}
+            }
+    return url, data
+
+
+def track_info(results):
+    """
+    Extract the recognized track from a response of the Shazam API.
+
+    Parameters:
+        results (dict): JSON response of the API.
+
+    Returns:
+        dict: "name", "artist" and "genres" of the track, or "error" if no track was recognized.
+    """
+    # Check if "track" key exists in results
+    if "track" in results:
+        return {
+            "name": results["track"]["title"],
+            "artist": results["track"]["subtitle"],
+            "genres": results["track"]["genres"], 
+            #"shazam_url": results["track"]["url"],
+            #"other_ionfo": results["track"]["hub"],
+            #results["track"]["relatedtracksurl"] # check for the "subject" to find the related tracks in this link
+        }
+    # Handle cases where "track" is absent. Log or yield a message, based on your preference.
+    return {"error": "Track not recognized or Shazam API response issue."}
+
+
+def running_event_loop():
+    """
+    Check if the caller runs inside an asyncio event loop, where `asyncio.run` cannot be called.
+
+    Returns:
+        bool: True if an event loop is running in the current thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def recognize_signatures(signatures, client, local_index=None):
+    """
+    Recognize signatures concurrently, checking a local library first.
+
+    Parameters:
+        signatures (list): Signatures (DecodedMessage) to recognize.
+        client (AsyncShazamClient): Client sending the requests of the signatures missing from the local library.
+        local_index (FingerprintIndex, optional): Local library. Default is None.
+
+    Returns:
+        list: Result of each signature, as yielded by `Shazam.attempt_recognition`. Requests that still fail after
+            the retries of the client give an "error" instead of raising.
+    """
+    infos = [local_index.recognize(signature) if local_index is not None else None for signature in signatures]
+    remote = [signature for signature, info in zip(signatures, infos) if not info]
+    responses = iter(await client.recognize_many(remote, return_exceptions=True))
+    for i, info in enumerate(infos):
+        if not info:
+            results = next(responses)
+            infos[i] = (track_info(results) if not isinstance(results, BaseException)
+                        else {"error": f"Recognition request failed: {results!r}"})
+    return infos
+
+
+class SongSelector:
+    """
+    Class Usage: Collect the songs of successive recognitions of a segment, and tell when to stop recognizing.
+
+    Recognition stops early on a result above the confidence threshold, or when the same song was recognized
+    `consecutive_matches` more times in a row.
+    """
+
+    def __init__(self, confidence_threshold=0.9, consecutive_matches=3):
+        """
+        Initialize the SongSelector.
+
+        Parameters:
+            confidence_threshold (float): Score of a result above which recognition stops. Default is 0.9.
+            consecutive_matches (int): Number of repeated recognitions of a song after which recognition stops.
+                Default is 3.
+        """
+        self.confidence_threshold = confidence_threshold
+        self.consecutive_matches = consecutive_matches
+        self.songs = {}
+        self.consecutive_song_counter = 0
+        self.last_song_name = ""
+
+    def add(self, n):
+        """
+        Add the result of a recognition.
+
+        Parameters:
+            n (dict): Result yielded by `Shazam.attempt_recognition`.
+
+        Returns:
+            bool: True if recognition can stop.
+        """
+        # Check if "name" key exists in n
+        if n and "name" in n:
+            if not n["name"] in self.songs:
+                self.songs[n["name"]] = n
+        else:
+            # Handle cases where "name" is absent. Log or continue based on your preference.
+            print((n or {}).get("error", "Unexpected error during recognition."))
+            return False
+
+        # Early Exit
+        if n.get("score", 0) > self.confidence_threshold:
+            return True
+        # Limit Unnecessary Recognitions
+        if n["name"] == self.last_song_name:
+            self.consecutive_song_counter += 1
+        else:
+            self.consecutive_song_counter = 0
+            self.last_song_name = n["name"]
+
+        return self.consecutive_song_counter >= self.consecutive_matches
+
+
 class Shazam:
     API_URL = 'https://amp.shazam.com/discovery/v5/en/RU/iphone/-/tag/%s/%s?sync=true&webv3=true&sampling=true&connected=&shazamapiversion=v3&sharehub=true&hubv5minorversion=v5.1&hidelb=true&video=v3'
     HEADERS = {
@@ -24,67 +194,114 @@ class Shazam:
         "Accept-Encoding": "gzip, deflate",
         "User-Agent": "Shazam/3685 CFNetwork/1197 Darwin/20.0.0"
     }
+    REQUEST_TIMEOUT = 10
+    _session = None
 
-    def __init__(self, audio):
+    def __init__(self, audio, local_index=None, cache=None):
         self.audio = self._prepare_audio(audio)
         self.MAX_TIME_SECONDS = 8
+        # Optional FingerprintIndex of a local library, checked before sending a request
+        self.local_index = local_index
+        # Optional RecognitionCache of the responses, checked before sending a request
+        self.cache = cache
 
     def _prepare_audio(self, audio):
-        if isinstance(audio, str):
-            format_ = audio.split('.')[-1]
-            audio = AudioSegment.from_file(audio, format=format_)   
-        elif isinstance(audio, np.ndarray):
-            audio = AudioSegment(audio.tobytes(), )
-        elif isinstance(audio, bytes):
-            audio = AudioSegment.from_file(BytesIO(audio))
-        elif isinstance(audio, AudioSegment):
-            pass
-        else:
-            raise TypeError('audio must be str, np.ndarray, bytes or AudioSegment')
-        
-        audio = audio.set_sample_width(2)
-        audio = audio.set_frame_rate(16000)
-        audio = audio.set_channels(1)
-        return audio
+        return prepare_audio(audio)
 
-    async def async_attempt_recognition(self):
-        """Asynchronous version of attempt_recognition."""
-        # Assuming there's an asynchronous method that fetches song data
-        return await self.fetch_song_data_async()
+    async def async_attempt_recognition(self, client=None, batch_size=None, n_signatures=None):
+        """
+        Asynchronous version of attempt_recognition: signatures are generated `batch_size` at a time, and the
+        requests of a batch are sent concurrently.
 
-    def get_songs(self, n_iterations=20, confidence_threshold=0.9, consecutive_matches=3) -> dict:
-        recognize_generator = self.attempt_recognition()
+        Parameters:
+            client (AsyncShazamClient, optional): Client sending the requests, left open for the caller to close.
+                Default is a new client with the cache of this instance, closed at the end.
+            batch_size (int, optional): Number of signatures sent at once. Default is the concurrency of the client.
+            n_signatures (int, optional): Largest number of signatures. Default is all the signatures of the audio.
 
-        songs = {}
-        consecutive_song_counter = 0
-        last_song_name = ""
+        Yields:
+            dict: Result of each signature, in order, as yielded by `attempt_recognition`. Requests that still fail
+                after the retries of the client yield an "error" instead of raising.
+        """
+        from technob.audio.search.shazam.client import AsyncShazamClient
+
+        own_client = client is None
+        client = AsyncShazamClient(cache=self.cache) if own_client else client
+        batch_size = batch_size or client.max_concurrency
+        signatureGenerator = self.createSignatureGenerator(self.audio)
+        n_left = float("inf") if n_signatures is None else n_signatures
+        try:
+            while n_left > 0:
+                signatures = []
+                while len(signatures) < min(batch_size, n_left):
+                    signature = signatureGenerator.get_next_signature()
+                    if not signature:
+                        break
+                    signatures.append(signature)
+                if not signatures:
+                    break
+                n_left -= len(signatures)
+
+                for info in await recognize_signatures(signatures, client, self.local_index):
+                    yield info
+        finally:
+            if own_client:
+                await client.close()
 
+    def get_songs(self, n_iterations=20, confidence_threshold=0.9, consecutive_matches=3, max_concurrency=1) -> dict:
+        if max_concurrency > 1 and running_event_loop():
+            # asyncio.run cannot nest in the loop of the caller (e.g. a notebook), which should await async_get_songs
+            warnings.warn("get_songs was called from a running event loop, so the recognitions run one at a time; "
+                          "await async_get_songs instead to run them concurrently.", RuntimeWarning, stacklevel=2)
+            max_concurrency = 1
+        if max_concurrency > 1:
+            from technob.audio.search.shazam.client import AsyncShazamClient
+
+            async def get_songs_concurrently():
+                async with AsyncShazamClient(max_concurrency=max_concurrency, cache=self.cache) as client:
+                    return await self.async_get_songs(n_iterations, confidence_threshold, consecutive_matches, client)
+
+            return asyncio.run(get_songs_concurrently())
+        recognize_generator = self.attempt_recognition()
+
+        selector = SongSelector(confidence_threshold, consecutive_matches)
         for _ in range(n_iterations):
-            n = next(recognize_generator, None)
-            
-            # Check if "name" key exists in n
-            if n and "name" in n:
-                if not n["name"] in songs:
-                    songs[n["name"]] = n
-            else:
-                # Handle cases where "name" is absent. Log or continue based on your preference.
-                print(n.get("error", "Unexpected error during recognition."))
-                continue
-
-            # Early Exit
-            if n.get("score", 0) > confidence_threshold:
-                break
-            # Limit Unnecessary Recognitions
-            if n["name"] == last_song_name:
-                consecutive_song_counter += 1
-            else:
-                consecutive_song_counter = 0
-                last_song_name = n["name"]
-
-            if consecutive_song_counter >= consecutive_matches:
+            if selector.add(next(recognize_generator, None)):
                 break
 
-        return songs
+        return selector.songs
+
+    async def async_get_songs(self, n_iterations=20, confidence_threshold=0.9, consecutive_matches=3,
+                              client=None) -> dict:
+        """
+        Asynchronous version of get_songs: up to `n_iterations` recognitions run concurrently, as many at once as
+        the client allows, and the results are selected in order as by `get_songs`.
+
+        Parameters:
+            n_iterations (int): Largest number of recognitions. Default is 20.
+            confidence_threshold (float): See `SongSelector`. Default is 0.9.
+            consecutive_matches (int): See `SongSelector`. Default is 3.
+            client (AsyncShazamClient, optional): Client sending the requests. Default is a new client with the cache
+                of this instance.
+
+        Returns:
+            dict: Recognized songs by name.
+        """
+        from technob.audio.search.shazam.client import AsyncShazamClient
+
+        own_client = client is None
+        client = AsyncShazamClient(cache=self.cache) if own_client else client
+        selector = SongSelector(confidence_threshold, consecutive_matches)
+        recognitions = self.async_attempt_recognition(client, n_signatures=n_iterations)
+        try:
+            async for n in recognitions:
+                if selector.add(n):
+                    break
+        finally:
+            await recognitions.aclose()
+            if own_client:
+                await client.close()
+        return selector.songs
     '''
     def get_songs(self, n_iterations=20) -> dict:
         recognize_generator = self.attempt_recognition()
@@ -124,46 +341,42 @@ class Shazam:
             if not signature:
                 break
             
+            if self.local_index is not None:
+                local_info = self.local_index.recognize(signature)
+                if local_info:
+                    yield local_info
+                    continue
+            
             results = self.sendRecognizeRequest(signature)
-
-            # Check if "track" key exists in results
-            if "track" in results:
-                audio_info = {
-                    "name": results["track"]["title"],
-                    "artist": results["track"]["subtitle"],
-                    "genres": results["track"]["genres"], 
-                    #"shazam_url": results["track"]["url"],
-                    #"other_ionfo": results["track"]["hub"],
-                    #results["track"]["relatedtracksurl"] # check for the "subject" to find the related tracks in this link
-                }
-                yield audio_info
-            else:
-                # Handle cases where "track" is absent. Log or yield a message, based on your preference.
-                yield {"error": "Track not recognized or Shazam API response issue."}
+            yield track_info(results)
         
     def sendRecognizeRequest(self, sig: DecodedMessage) -> dict:
-        data = {
-            'signature': {
-                'uri': sig.encode_to_uri(),
-                'samplems':int(sig.number_samples / sig.sample_rate_hz * 1000)
-                },
-            'timestamp': int(time.time() * 1000),
-            'context': {},
-            'geolocation': {}
-                }
-        r = requests.post(
-            self.API_URL % (str(uuid.uuid4()).upper(), str(uuid.uuid4()).upper()), 
+        if self.cache is not None:
+            cached = self.cache.get(sig)
+            if cached is not None:
+                return cached
+        url, data = recognition_request(sig, self.API_URL)
+        # Keep-alive session shared by all the instances, instead of a new connection per request
+        if Shazam._session is None:
+            Shazam._session = requests.Session()
+        r = Shazam._session.post(
+            url,
             headers=self.HEADERS,
-            json=data
+            json=data,
+            timeout=self.REQUEST_TIMEOUT
         )
-        return r.json()
+        results = r.json()
+        if self.cache is not None:
+            self.cache.put(sig, results)
+        return results
     
-    def createSignatureGenerator(self, audio: AudioSegment) -> SignatureGenerator:
-        signature_generator = SignatureGenerator()
+    def createSignatureGenerator(self, audio: AudioSegment) -> VectorizedSignatureGenerator:
+        signature_generator = VectorizedSignatureGenerator()
         signature_generator.feed_input(audio.get_array_of_samples())
         signature_generator.MAX_TIME_SECONDS = self.MAX_TIME_SECONDS
         if audio.duration_seconds > 12 * 3:
-            signature_generator.samples_processed += 16000 * (int(audio.duration_seconds / 16) - 6)
+            # Skip into the audio, but never before its start (the shift is negative below 96 seconds)
+            signature_generator.samples_processed += 16000 * max(int(audio.duration_seconds / 16) - 6, 0)
         return signature_generator
 
 
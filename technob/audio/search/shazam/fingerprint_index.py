@@ -0,0 +1,263 @@
+import json
+import os
+import numpy as np
+from technob.audio.search.shazam.algorithm import VectorizedSignatureGenerator
+from technob.audio.search.shazam.extraction import SignatureExtractor
+from technob.audio.search.shazam.signature_format import DecodedMessage
+
+
+def signature_peaks(signature):
+    """
+    Peaks of a signature, over all its frequency bands.
+
+    Parameters:
+        signature (DecodedMessage): Signature, e.g. from `SignatureGenerator`.
+
+    Returns:
+        tuple: FFT pass numbers and FFT bins (corrected frequency bins divided by 64) of the peaks, as int64 arrays
+            sorted by pass number then bin.
+    """
+    peaks = [peaks.array for peaks in signature.frequency_band_to_sound_peaks.values()]
+    peaks = np.concatenate(peaks) if peaks else np.zeros(0, dtype=[("fft_pass_number", "<u4"),
+                                                                     ("corrected_peak_frequency_bin", "<u2")])
+    times = peaks["fft_pass_number"].astype(np.int64)
+    bins = peaks["corrected_peak_frequency_bin"].astype(np.int64) >> 6
+    order = np.lexsort((bins, times))
+    return times[order], bins[order]
+
+
+def track_peaks(samples, block_hops=4096):
+    """
+    Peaks of a whole track, as a continuous stream of signatures would find them, computed block by block.
+
+    Parameters:
+        samples (np.ndarray): Signed 16-bit 16 kHz mono samples.
+        block_hops (int): Number of 128-sample hops per block. Default is 4096 (33 seconds).
+
+    Returns:
+        tuple: FFT pass numbers from the start of the track and FFT bins of the peaks, as int64 arrays.
+    """
+    generator = VectorizedSignatureGenerator()
+    generator.feed_input(samples)
+    times, bins = [], []
+    for first_hop in range(0, len(samples) // 128, block_hops):
+        # The recognizer lags 45 FFTs behind the input: extend each block so that it yields all of its own FFTs
+        signature = generator.signature_at(first_hop * 128 / 16000, (block_hops + 45) * 128 / 16000)
+        block_times, block_bins = signature_peaks(signature)
+        kept = block_times < block_hops
+        times.append(block_times[kept] + first_hop)
+        bins.append(block_bins[kept])
+    if not times:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(times), np.concatenate(bins)
+
+
+def peak_pair_hashes(times, bins, fan_out=5, max_delta=63):
+    """
+    Hash pairs of peaks: each peak (anchor) is paired with the next `fan_out` peaks that come 1 to `max_delta` FFT
+    passes after it. The hash packs the two FFT bins (10 bits each) and the time difference (7 bits).
+
+    Parameters:
+        times (np.ndarray): FFT pass numbers of the peaks, sorted.
+        bins (np.ndarray): FFT bins of the peaks.
+        fan_out (int): Number of peaks paired with each anchor. Default is 5.
+        max_delta (int): Largest time difference of a pair, in FFT passes (at most 127). Default is 63 (0.5 second).
+
+    Returns:
+        tuple: Hashes (uint32) and FFT pass numbers of their anchors (int64).
+    """
+    # Peaks sharing the FFT pass of the anchor are skipped: the pairs of an anchor are the peaks from the first
+    # one of a later pass on
+    first_later = np.searchsorted(times, times, side="right")
+    hashes, anchors = [], []
+    for distance in range(1, len(times)):
+        delta = times[distance:] - times[:-distance]
+        rank = np.arange(distance, len(times)) - first_later[:-distance]
+        paired = (rank >= 0) & (rank < fan_out) & (delta <= max_delta)
+        if paired.any():
+            hashes.append((bins[:-distance][paired] << 17) | (bins[distance:][paired] << 7) | delta[paired])
+            anchors.append(times[:-distance][paired])
+        elif np.all((rank >= fan_out) | (delta > max_delta)):
+            break
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int64)
+    return np.concatenate(hashes).astype(np.uint32), np.concatenate(anchors)
+
+
+class FingerprintIndex:
+    """
+    Class Usage: Offline recognizer of the tracks of a local library, with the peaks of Shazam signatures.
+
+    Each library track is turned into the peaks `SignatureGenerator` finds, and pairs of nearby peaks are hashed
+    (frequencies of both peaks and their time difference). The index is an inverted file of those hashes: one
+    sorted uint32 array of hashes, with the track and time of each occurrence, saved as an .npz archive.
+
+    A query signature is hashed the same way. Every occurrence of its hashes votes for a track and a time offset
+    (time in the track minus time in the query), and the track is recognized when one (track, offset) pair gets
+    enough votes. Results have the shape of the dicts yielded by `Shazam.attempt_recognition`, so callers can
+    check the local library first and only send a request to Shazam on a miss.
+    """
+
+    def __init__(self, fan_out=5, max_delta=63, min_votes=10, min_score=0.01):
+        """
+        Initialize the FingerprintIndex.
+
+        Parameters:
+            fan_out (int): Number of peaks paired with each anchor peak. Default is 5.
+            max_delta (int): Largest time difference of a pair of peaks, in FFT passes of 8 ms. Default is 63.
+            min_votes (int): Votes needed to recognize a track. Default is 10.
+            min_score (float): Share of the query hashes that must vote for the track. Default is 0.01.
+        """
+        self.fan_out = fan_out
+        self.max_delta = max_delta
+        self.min_votes = min_votes
+        self.min_score = min_score
+
+        self.ids = []
+        self.metadata = {}
+        self._rows = {}
+        self._pending = []
+        self._hashes = np.zeros(0, dtype=np.uint32)
+        self._tracks = np.zeros(0, dtype=np.uint32)
+        self._times = np.zeros(0, dtype=np.uint32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def n_hashes(self):
+        return len(self._hashes) + sum(len(hashes) for hashes, _, _ in self._pending)
+
+    def add(self, track_id, audio, metadata=None):
+        """
+        Add a track to the index.
+
+        Parameters:
+            track_id (str): Id of the track. Adding an existing id raises a ValueError.
+            audio (str, np.ndarray, bytes or AudioSegment): Track, see `SignatureExtractor.load_samples`.
+            metadata (dict, optional): "name", "artist", "genres" and other fields returned with the track.
+                Default is the file name of the track as "name".
+
+        Returns:
+            int: Number of hashes of the track.
+        """
+        if track_id in self._rows:
+            raise ValueError(f"Track {track_id} is already in the index.")
+        times, bins = track_peaks(SignatureExtractor.load_samples(audio))
+        hashes, anchors = peak_pair_hashes(times, bins, self.fan_out, self.max_delta)
+
+        row = len(self.ids)
+        self._rows[track_id] = row
+        self.ids.append(track_id)
+        self.metadata[track_id] = metadata or {"name": os.path.splitext(os.path.basename(str(track_id)))[0]}
+        self._pending.append((hashes, np.full(len(hashes), row, dtype=np.uint32), anchors.astype(np.uint32)))
+        return len(hashes)
+
+    def _build(self):
+        """Merge the tracks added since the last query into the sorted inverted file."""
+        if not self._pending:
+            return
+        hashes, tracks, times = (np.concatenate([stored] + [pending[i] for pending in self._pending])
+                                 for i, stored in enumerate((self._hashes, self._tracks, self._times)))
+        order = np.argsort(hashes, kind="stable")
+        self._hashes, self._tracks, self._times = hashes[order], tracks[order], times[order]
+        self._pending = []
+
+    def votes(self, signature):
+        """
+        Count the votes of a query for each (track, time offset) pair, including the votes for the offsets
+        one FFT pass before and after.
+
+        Parameters:
+            signature (DecodedMessage): Query signature.
+
+        Returns:
+            tuple: Track rows, time offsets in FFT passes and number of votes of each pair, sorted by decreasing
+                votes, and the number of query hashes.
+        """
+        self._build()
+        hashes, anchors = peak_pair_hashes(*signature_peaks(signature), self.fan_out, self.max_delta)
+        starts = np.searchsorted(self._hashes, hashes, side="left")
+        lengths = np.searchsorted(self._hashes, hashes, side="right") - starts
+
+        # Gather all the occurrences of all the query hashes at once
+        total = int(lengths.sum())
+        if total == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, len(hashes)
+        first_occurrence = np.cumsum(lengths) - lengths
+        occurrences = np.repeat(starts - first_occurrence, lengths) + np.arange(total)
+        offsets = self._times[occurrences].astype(np.int64) - np.repeat(anchors, lengths)
+        keys = (self._tracks[occurrences].astype(np.int64) << 32) | (offsets + (1 << 31))
+
+        keys, counts = np.unique(keys, return_counts=True)
+        # A query starting between two FFT passes of the track splits its votes between adjacent offsets
+        merged = counts.copy()
+        for neighbor in (keys - 1, keys + 1):
+            # Both neighbors are looked up in the unmerged counts
+            position = np.minimum(np.searchsorted(keys, neighbor), len(keys) - 1)
+            merged += np.where(keys[position] == neighbor, counts[position], 0)
+        counts = merged
+        order = np.argsort(-counts, kind="stable")
+        keys, counts = keys[order], counts[order]
+        return keys >> 32, (keys & 0xffffffff) - (1 << 31), counts, len(hashes)
+
+    def recognize(self, signature):
+        """
+        Recognize a signature against the library.
+
+        Parameters:
+            signature (DecodedMessage or str): Query signature, or its data URI.
+
+        Returns:
+            dict or None: Recognized track with the keys of `Shazam.attempt_recognition` ("name", "artist", "genres",
+                "shazam_url"), plus "track_id", "score" (share of the query hashes voting for the match), "votes" and
+                "offset" (time of the query in the track, in seconds). None if no track gets enough votes.
+        """
+        if isinstance(signature, str):
+            signature = DecodedMessage.decode_from_uri(signature)
+        rows, offsets, counts, n_hashes = self.votes(signature)
+        if len(counts) == 0 or counts[0] < self.min_votes or counts[0] < self.min_score * n_hashes:
+            return None
+
+        track_id = self.ids[int(rows[0])]
+        metadata = self.metadata[track_id]
+        result = {"name": metadata.get("name"), "artist": metadata.get("artist"), "genres": metadata.get("genres"),
+                  "shazam_url": None}
+        result.update(metadata)
+        result.update(track_id=track_id, score=float(counts[0] / n_hashes), votes=int(counts[0]),
+                      offset=float(offsets[0] * 128 / signature.sample_rate_hz))
+        return result
+
+    def save(self, file_name):
+        """
+        Save the index to an .npz archive.
+
+        Parameters:
+            file_name (str): Path of the archive.
+        """
+        self._build()
+        config = {"fan_out": self.fan_out, "max_delta": self.max_delta, "min_votes": self.min_votes,
+                  "min_score": self.min_score}
+        np.savez(file_name, config=np.array(json.dumps(config)), ids=np.array(self.ids, dtype=str),
+                 metadata=np.array(json.dumps([self.metadata[track_id] for track_id in self.ids])),
+                 hashes=self._hashes, tracks=self._tracks, times=self._times)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Load an index saved with `save`.
+
+        Parameters:
+            file_name (str): Path of the archive.
+
+        Returns:
+            FingerprintIndex: Loaded index, ready for queries and insertions.
+        """
+        with np.load(file_name) as archive:
+            index = cls(**json.loads(str(archive["config"])))
+            index.ids = [str(track_id) for track_id in archive["ids"]]
+            index.metadata = dict(zip(index.ids, json.loads(str(archive["metadata"]))))
+            index._rows = {track_id: row for row, track_id in enumerate(index.ids)}
+            index._hashes, index._tracks, index._times = archive["hashes"], archive["tracks"], archive["times"]
+        return index
@@ -10,6 +10,7 @@ from binascii import crc32
 from enum import IntEnum
 from io import BytesIO
 from ctypes import *
+import numpy as np
 
 DATA_URI_PREFIX = 'data:audio/vnd.shazam.sig;base64,'
 
@@ -86,12 +87,215 @@ class FrequencyPeak:
         
         
 
+# Compact storage of the peaks of a band, with the field sizes of the binary format
+# (the FFT pass number may be written in full on 4 bytes)
+
+PEAK_DTYPE = np.dtype([
+    ('fft_pass_number', '<u4'),
+    ('peak_magnitude', '<u2'),
+    ('corrected_peak_frequency_bin', '<u2')
+])
+
+class FrequencyPeaks:
+    
+    """
+        List of the FrequencyPeak of a band, stored as a structured numpy
+        array (8 bytes per peak) rather than as Python objects. Iterating or
+        indexing it creates FrequencyPeak objects on demand, so that it can
+        be used wherever a list of FrequencyPeak was expected.
+    """
+    
+    __slots__ = ('_peaks', '_length', 'sample_rate_hz')
+    
+    def __init__(self, sample_rate_hz : int = 16000, peaks : np.ndarray = None):
+        
+        self._peaks : np.ndarray = np.zeros(0, dtype = PEAK_DTYPE) if peaks is None else peaks.astype(PEAK_DTYPE, copy = False)
+        self._length : int = len(self._peaks)
+        self.sample_rate_hz : int = sample_rate_hz
+    
+    @classmethod
+    def from_arrays(cls, fft_pass_number : Sequence[int], peak_magnitude : Sequence[int],
+            corrected_peak_frequency_bin : Sequence[int], sample_rate_hz : int = 16000):
+        
+        self = cls(sample_rate_hz)
+        self.extend(fft_pass_number, peak_magnitude, corrected_peak_frequency_bin)
+        return self
+    
+    """
+        Structured array of the peaks, with the fields of PEAK_DTYPE.
+    """
+    
+    @property
+    def array(self) -> np.ndarray:
+        
+        return self._peaks[:self._length]
+    
+    def _reserve(self, length : int):
+        
+        if length > len(self._peaks):
+            peaks = np.zeros(max(length, 2 * len(self._peaks), 64), dtype = PEAK_DTYPE)
+            peaks[:self._length] = self.array
+            self._peaks = peaks
+    
+    def extend(self, fft_pass_number : Sequence[int], peak_magnitude : Sequence[int],
+            corrected_peak_frequency_bin : Sequence[int]):
+        
+        columns = [np.asarray(values, dtype = np.int64) for values in
+            (fft_pass_number, peak_magnitude, corrected_peak_frequency_bin)]
+        
+        for name, values in zip(PEAK_DTYPE.names, columns):
+            if len(values) and (values.min() < 0 or values.max() > np.iinfo(PEAK_DTYPE[name]).max):
+                raise OverflowError('%s out of range for the signature format' % name)
+        
+        self._reserve(self._length + len(columns[0]))
+        added = self._peaks[self._length:self._length + len(columns[0])]
+        for name, values in zip(PEAK_DTYPE.names, columns):
+            added[name] = values
+        self._length += len(columns[0])
+    
+    def append(self, frequency_peak : FrequencyPeak):
+        
+        self.extend([frequency_peak.fft_pass_number], [frequency_peak.peak_magnitude],
+            [frequency_peak.corrected_peak_frequency_bin])
+    
+    def __len__(self) -> int:
+        
+        return self._length
+    
+    def __getitem__(self, index):
+        
+        if isinstance(index, slice):
+            # Copy stepped slices, whose views are not contiguous
+            return FrequencyPeaks(self.sample_rate_hz, np.ascontiguousarray(self.array[index]))
+        
+        fft_pass_number, peak_magnitude, corrected_peak_frequency_bin = self.array[index].tolist()
+        return FrequencyPeak(fft_pass_number, peak_magnitude, corrected_peak_frequency_bin, self.sample_rate_hz)
+    
+    def __iter__(self):
+        
+        for fft_pass_number, peak_magnitude, corrected_peak_frequency_bin in self.array.tolist():
+            yield FrequencyPeak(fft_pass_number, peak_magnitude, corrected_peak_frequency_bin, self.sample_rate_hz)
+    
+    def __eq__(self, other : Any) -> bool:
+        
+        if not isinstance(other, FrequencyPeaks):
+            return NotImplemented
+        return self.sample_rate_hz == other.sample_rate_hz and np.array_equal(self.array, other.array)
+    
+    def __repr__(self) -> str:
+        
+        return 'FrequencyPeaks(%d peaks)' % self._length
+
+# Records of the peak lists are 5 bytes long: either a FFT pass number escape
+# (0xff, then the number on 4 bytes), or a peak (offset from the previous FFT
+# pass number on 1 byte, magnitude and corrected frequency bin on 2 bytes each).
+# The bytes of a PEAK_DTYPE item are those of an escape and a peak record
+# without their first byte.
+
+def encode_frequency_peaks(frequency_peaks : Sequence[FrequencyPeak]) -> bytes:
+    
+    """
+        Encode the peaks of a band to the payload of its TLV chunk. The peaks
+        must be sorted by FFT pass number, which is the responsability of the
+        caller.
+    """
+    
+    if not isinstance(frequency_peaks, FrequencyPeaks):
+        frequency_peaks = FrequencyPeaks.from_arrays(
+            [peak.fft_pass_number for peak in frequency_peaks],
+            [peak.peak_magnitude for peak in frequency_peaks],
+            [peak.corrected_peak_frequency_bin for peak in frequency_peaks]
+        )
+    
+    # The byte view needs packed items, whatever the layout of the array of the caller
+    peaks = np.ascontiguousarray(frequency_peaks.array)
+    peak_bytes = peaks.view(np.uint8).reshape(-1, 8)
+    
+    fft_pass_number = peaks['fft_pass_number'].astype(np.int64)
+    fft_pass_offset = fft_pass_number.copy()
+    fft_pass_offset[1:] -= fft_pass_number[:-1]
+    
+    assert (fft_pass_offset >= 0).all()
+    
+    # A peak further than 254 passes from the previous one is preceded by an escape
+    # with its full FFT pass number, and its offset becomes 0
+    
+    escaped = fft_pass_offset >= 255
+    
+    if not escaped.any():
+        records = np.empty((len(peaks), 5), dtype = np.uint8)
+        records[:, 0] = fft_pass_offset
+        records[:, 1:5] = peak_bytes[:, 4:8]
+        return records.tobytes()
+    
+    records = np.empty((len(peaks), 10), dtype = np.uint8)
+    records[:, 0] = 0xff
+    records[:, 1:5] = peak_bytes[:, 0:4]
+    records[:, 5] = np.where(escaped, 0, fft_pass_offset)
+    records[:, 6:10] = peak_bytes[:, 4:8]
+    
+    kept_bytes = np.ones((len(peaks), 10), dtype = bool)
+    kept_bytes[~escaped, :5] = False
+    
+    return records[kept_bytes].tobytes()
+
+def decode_frequency_peaks(payload : bytes, sample_rate_hz : int) -> FrequencyPeaks:
+    
+    """
+        Decode the payload of the TLV chunk of a band to its peaks.
+    """
+    
+    assert len(payload) % 5 == 0
+    
+    records = np.frombuffer(payload, dtype = np.uint8).reshape(-1, 5)
+    escaped = records[:, 0] == 0xff
+    
+    if not escaped.any():
+        
+        peaks = np.empty(len(records), dtype = PEAK_DTYPE)
+        peaks.view(np.uint8).reshape(-1, 8)[:, 4:8] = records[:, 1:5]
+        np.cumsum(records[:, 0], dtype = np.uint32, out = peaks['fft_pass_number']) # Cannot overflow below 16M peaks
+        
+        return FrequencyPeaks(sample_rate_hz, peaks)
+    
+    # Each FFT pass number is the number of the last escape, plus the offsets
+    # of the peaks since that escape
+    
+    escaped_fft_pass_number = records[:, 1:5].copy().view('<u4')[:, 0].astype(np.int64)
+    fft_pass_offset = np.where(escaped, 0, records[:, 0]).astype(np.int64)
+    
+    last_escape = np.maximum.accumulate(np.where(escaped, np.arange(len(records)), -1))
+    cumulated_offset = np.cumsum(fft_pass_offset)
+    
+    escape_fft_pass_number = np.where(last_escape >= 0, escaped_fft_pass_number[last_escape], 0)
+    cumulated_offset_at_escape = np.where(last_escape >= 0, cumulated_offset[last_escape], 0)
+    
+    fft_pass_number = escape_fft_pass_number + cumulated_offset - cumulated_offset_at_escape
+    
+    peaks = records[~escaped]
+    
+    return FrequencyPeaks.from_arrays(
+        fft_pass_number[~escaped],
+        peaks[:, 1].astype(np.uint16) | peaks[:, 2].astype(np.uint16) << 8,
+        peaks[:, 3].astype(np.uint16) | peaks[:, 4].astype(np.uint16) << 8,
+        sample_rate_hz
+    )
+
 class DecodedMessage:
     
     sample_rate_hz : int = None
     number_samples : int = None
     
-    frequency_band_to_sound_peaks : Dict[FrequencyBand, List[FrequencyPeak]] = None
+    frequency_band_to_sound_peaks : Dict[FrequencyBand, FrequencyPeaks] = None
+    
+    """
+        Total number of peaks over all the frequency bands.
+    """
+    
+    @property
+    def number_peaks(self) -> int:
+        
+        return sum(len(peaks) for peaks in self.frequency_band_to_sound_peaks.values())
     
     @classmethod
     def decode_from_binary(cls, data : bytes):
@@ -147,32 +351,8 @@ class DecodedMessage:
             
             frequency_band = FrequencyBand(frequency_band_id - 0x60030040)
             
-            fft_pass_number = 0
-            
-            self.frequency_band_to_sound_peaks[frequency_band] = []
-            
-            while True:
-                
-                raw_fft_pass : bytes = frequency_peaks_buf.read(1)
-                if not raw_fft_pass:
-                    break
-                
-                fft_pass_offset : int = raw_fft_pass[0]
-                if fft_pass_offset == 0xff:
-                    fft_pass_number = int.from_bytes(frequency_peaks_buf.read(4), 'little')
-                    continue
-                else:
-                    fft_pass_number += fft_pass_offset
-                
-                peak_magnitude = int.from_bytes(frequency_peaks_buf.read(2), 'little')
-                corrected_peak_frequency_bin = int.from_bytes(frequency_peaks_buf.read(2), 'little')
-                
-                self.frequency_band_to_sound_peaks[frequency_band].append(
-                    FrequencyPeak(fft_pass_number, peak_magnitude, corrected_peak_frequency_bin, self.sample_rate_hz)
-                )
-                
-                
-        
+            self.frequency_band_to_sound_peaks[frequency_band] = decode_frequency_peaks(
+                frequency_peaks_buf.getvalue(), self.sample_rate_hz)
         
         return self
     
@@ -224,32 +404,8 @@ class DecodedMessage:
         
         for frequency_band, frequency_peaks in sorted(self.frequency_band_to_sound_peaks.items()):
         
-            peaks_buf = BytesIO()
-        
-            fft_pass_number = 0
-                    
-            # NOTE: Correctly filtering and sorting the peaks within the members
-            # of "self.frequency_band_to_sound_peaks" is the responsability of the
-            # caller
-                    
-            for frequency_peak in frequency_peaks:
-                
-                assert frequency_peak.fft_pass_number >= fft_pass_number
-                
-                if frequency_peak.fft_pass_number - fft_pass_number >= 255:
-                    
-                    peaks_buf.write(b'\xff')
-                    peaks_buf.write((frequency_peak.fft_pass_number).to_bytes(4, 'little'))
-                    
-                    fft_pass_number = frequency_peak.fft_pass_number
-                
-                peaks_buf.write(bytes([frequency_peak.fft_pass_number - fft_pass_number]))
-                peaks_buf.write((frequency_peak.peak_magnitude).to_bytes(2, 'little'))
-                peaks_buf.write((frequency_peak.corrected_peak_frequency_bin).to_bytes(2, 'little'))
-                
-                fft_pass_number = frequency_peak.fft_pass_number
-                
-
+            peaks_buf = BytesIO(encode_frequency_peaks(frequency_peaks))
+            
             contents_buf.write((0x60030040 + int(frequency_band)).to_bytes(4, 'little'))
             contents_buf.write(len(peaks_buf.getvalue()).to_bytes(4, 'little'))
             contents_buf.write(peaks_buf.getvalue())
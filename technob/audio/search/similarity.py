@@ -0,0 +1,372 @@
+import json
+import numpy as np
+from scipy import sparse
+
+
+EMBEDDING_FEATURES = ("timbre_frames", "pitch_frames", "intensity_frames")
+
+
+def track_embedding(features, feature_names=EMBEDDING_FEATURES):
+    """
+    Build a fixed-length embedding of a track from its beat-synchronous feature frames.
+
+    Each feature matrix of shape (n_beats, n_features) is summarized by the mean and the standard deviation of
+    every feature over the beats. Each block is L2-normalized so that timbre, chroma and intensity weigh the same,
+    and the concatenation is L2-normalized so that the inner product of two embeddings is their cosine similarity.
+
+    Parameters:
+        features (dict or EncodedFeatures): Features as returned by `Extractor.extract`.
+        feature_names (tuple): Names of the feature matrices to use. Default is timbre, pitch and intensity frames.
+
+    Returns:
+        numpy.ndarray: Embedding as a 1D float32 array.
+    """
+    blocks = []
+    for name in feature_names:
+        frames = np.asarray(features[name], dtype=np.float64)
+        if frames.ndim == 1:
+            frames = frames[:, None]
+        block = np.concatenate([frames.mean(axis=0), frames.std(axis=0)])
+        norm = np.linalg.norm(block)
+        blocks.append(block / norm if norm > 0 else block)
+    embedding = np.concatenate(blocks)
+    norm = np.linalg.norm(embedding)
+    return (embedding / norm if norm > 0 else embedding).astype(np.float32)
+
+
+def kmeans(data, k, n_iter=20, seed=0, max_samples=None):
+    """
+    Vectorized Lloyd k-means.
+
+    Parameters:
+        data (numpy.ndarray): Data of shape (n_samples, dim).
+        k (int): Number of clusters.
+        n_iter (int): Number of iterations. Default is 20.
+        seed (int): Random seed of the initialization. Default is 0.
+        max_samples (int, optional): Train on a random subset of at most this many samples. Default is None (all).
+
+    Returns:
+        numpy.ndarray: Centroids of shape (k, dim).
+    """
+    rng = np.random.default_rng(seed)
+    if max_samples is not None and len(data) > max_samples:
+        data = data[rng.choice(len(data), max_samples, replace=False)]
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = (np.square(centroids).sum(axis=1)[None, :] - 2 * data @ centroids.T).argmin(axis=1)
+        # Per-cluster sums as a sparse one-hot matrix product
+        one_hot = sparse.csr_matrix((np.ones(len(data)), (labels, np.arange(len(data)))), shape=(k, len(data)))
+        sums = one_hot @ data
+        counts = np.bincount(labels, minlength=k)
+        # Empty clusters keep their previous centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class SimilarityIndex:
+    """
+    Class Usage: Persistent nearest-neighbour index over track embeddings.
+
+    Two search modes are supported:
+        - "exact": brute-force inner product of the query with every stored vector (a single BLAS matrix-vector
+          product, a few milliseconds for 20k tracks).
+        - "ivf": inverted file index. The vectors are clustered into `n_lists` cells with k-means, and only the
+          `n_probe` cells closest to the query are scanned. With `pq_subvectors` set, the scanned vectors are
+          scored with product quantization codes (uint8 per subvector) and the best candidates are re-ranked
+          with the exact vectors.
+
+    Tracks can be added at any time. In "ivf" mode, tracks added after `train` are assigned to their closest cell,
+    and the index searches exhaustively until it has been trained.
+    """
+
+    def __init__(self, dim, mode="exact", n_lists=64, n_probe=8, pq_subvectors=None, rerank=100):
+        """
+        Initialize the SimilarityIndex.
+
+        Parameters:
+            dim (int): Dimension of the embeddings.
+            mode (str): "exact" or "ivf". Default is "exact".
+            n_lists (int): Number of inverted lists (k-means cells) in "ivf" mode. Default is 64.
+            n_probe (int): Number of cells scanned per query in "ivf" mode. Default is 8.
+            pq_subvectors (int, optional): Number of product quantization subvectors in "ivf" mode. Must divide `dim`.
+                Default is None (no product quantization).
+            rerank (int): Number of product quantization candidates re-ranked with exact scores. Default is 100.
+        """
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown index mode: {mode}")
+        if pq_subvectors is not None and dim % pq_subvectors:
+            raise ValueError("pq_subvectors must divide the embedding dimension.")
+        self.dim = dim
+        self.mode = mode
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.pq_subvectors = pq_subvectors
+        self.rerank = rerank
+
+        self.ids = []
+        self._rows = {}
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+
+        self.centroids = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists = []
+        self._list_sizes = np.zeros(0, dtype=np.int64)
+        self.codebooks = None
+        self._codes = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._size]
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _reserve(self, n_new):
+        """Grow the vector storage geometrically so that incremental insertions are amortized O(1)."""
+        needed = self._size + n_new
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors), 1024)
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            vectors[:self._size] = self.vectors
+            self._vectors = vectors
+            if self._codes is not None:
+                codes = np.zeros((capacity, self.pq_subvectors), dtype=np.uint8)
+                codes[:self._size] = self._codes[:self._size]
+                self._codes = codes
+            assignments = np.zeros(capacity, dtype=np.int32)
+            assignments[:self._size] = self._assignments[:self._size]
+            self._assignments = assignments
+
+    def add(self, track_ids, embeddings):
+        """
+        Add tracks to the index. Adding an existing track id replaces its embedding.
+
+        Parameters:
+            track_ids (str or list): Track id, or list of track ids.
+            embeddings (numpy.ndarray): Embedding of shape (dim,), or embeddings of shape (n_tracks, dim).
+        """
+        if isinstance(track_ids, str):
+            track_ids = [track_ids]
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if embeddings.shape != (len(track_ids), self.dim):
+            raise ValueError(f"Expected embeddings of shape ({len(track_ids)}, {self.dim}), got {embeddings.shape}.")
+
+        self._reserve(len(track_ids))
+        previous_size = self._size
+        rows = []
+        for track_id in track_ids:
+            if track_id not in self._rows:
+                self._rows[track_id] = self._size
+                self.ids.append(track_id)
+                self._size += 1
+            rows.append(self._rows[track_id])
+        rows = np.array(rows, dtype=np.int64)
+        self._vectors[rows] = embeddings
+
+        if self.is_trained:
+            # Only the rows of the added tracks move: replaced rows leave their old cell, then join their new one
+            updated = np.unique(rows)
+            for row in updated[updated < previous_size]:
+                self._remove_from_list(row, self._assignments[row])
+            self._assignments[rows] = self._assign(embeddings)
+            if self.codebooks is not None:
+                self._codes[rows] = self._pq_encode(embeddings)
+            for row in updated:
+                self._append_to_list(row, self._assignments[row])
+
+    def train(self, n_iter=20, seed=0):
+        """
+        Train the k-means cells (and the product quantization codebooks) of the "ivf" mode on the stored vectors.
+
+        Parameters:
+            n_iter (int): Number of k-means iterations. Default is 20.
+            seed (int): Random seed of the k-means initialization. Default is 0.
+        """
+        if self.mode != "ivf":
+            return
+        vectors = self.vectors.astype(np.float64)
+        n_lists = min(self.n_lists, len(vectors))
+        self.centroids = kmeans(vectors, n_lists, n_iter, seed, max_samples=256 * n_lists).astype(np.float32)
+        self._assignments[:self._size] = self._assign(self.vectors)
+
+        if self.pq_subvectors is not None:
+            sub_dim = self.dim // self.pq_subvectors
+            n_codes = min(256, len(vectors))
+            residuals = vectors - self.centroids[self._assignments[:self._size]]
+            self.codebooks = np.stack([
+                kmeans(residuals[:, j * sub_dim:(j + 1) * sub_dim], n_codes, n_iter, seed, max_samples=64 * n_codes)
+                for j in range(self.pq_subvectors)
+            ]).astype(np.float32)
+            self._codes = np.zeros((len(self._vectors), self.pq_subvectors), dtype=np.uint8)
+            self._codes[:self._size] = self._pq_encode(self.vectors)
+        self._build_lists()
+
+    def _assign(self, embeddings):
+        """Index of the closest k-means cell of every embedding."""
+        distances = (np.square(self.centroids).sum(axis=1)[None, :] - 2 * embeddings @ self.centroids.T)
+        return distances.argmin(axis=1).astype(np.int32)
+
+    def _pq_encode(self, embeddings):
+        """Product quantization codes of the residuals of the embeddings to their cells."""
+        residuals = embeddings - self.centroids[self._assign(embeddings)]
+        sub_dim = self.dim // self.pq_subvectors
+        codes = np.empty((len(embeddings), self.pq_subvectors), dtype=np.uint8)
+        for j, codebook in enumerate(self.codebooks):
+            sub = residuals[:, j * sub_dim:(j + 1) * sub_dim]
+            distances = np.square(codebook).sum(axis=1)[None, :] - 2 * sub @ codebook.T
+            codes[:, j] = distances.argmin(axis=1)
+        return codes
+
+    def _build_lists(self):
+        """Group the stored vectors by cell."""
+        assignments = self._assignments[:self._size]
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]].copy() for c in range(len(self.centroids))]
+        self._list_sizes = np.diff(bounds)
+
+    def _cell_rows(self, cell):
+        """Rows of the vectors stored in a cell."""
+        return self._lists[cell][:self._list_sizes[cell]]
+
+    def _append_to_list(self, row, cell):
+        """Add a row to the list of a cell, growing the list geometrically (amortized O(1))."""
+        size = self._list_sizes[cell]
+        if size == len(self._lists[cell]):
+            grown = np.zeros(max(2 * size, 16), dtype=np.int64)
+            grown[:size] = self._lists[cell]
+            self._lists[cell] = grown
+        self._lists[cell][size] = row
+        self._list_sizes[cell] += 1
+
+    def _remove_from_list(self, row, cell):
+        """Remove a row from the list of a cell, moving the last row of the list in its place."""
+        rows = self._cell_rows(cell)
+        position = np.flatnonzero(rows == row)[0]
+        rows[position] = rows[-1]
+        self._list_sizes[cell] -= 1
+
+    @staticmethod
+    def _top_k(scores, k):
+        """Indices of the k largest scores, sorted by decreasing score."""
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _candidates(self, query):
+        """Rows of the vectors stored in the `n_probe` cells closest to the query."""
+        cell_scores = self.centroids @ query
+        cells = self._top_k(cell_scores, self.n_probe)
+        return np.concatenate([self._cell_rows(c) for c in cells]), cells
+
+    def search(self, query, k=10):
+        """
+        Find the tracks most similar to the query.
+
+        Parameters:
+            query (numpy.ndarray): Query embedding of shape (dim,).
+            k (int): Number of results. Default is 10.
+
+        Returns:
+            list: List of (track_id, score) tuples sorted by decreasing cosine similarity.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if self._size == 0:
+            return []
+        if self.mode == "exact" or not self.is_trained:
+            scores = self.vectors @ query
+            rows = self._top_k(scores, k)
+            return [(self.ids[row], float(scores[row])) for row in rows]
+
+        candidates, cells = self._candidates(query)
+        if self.codebooks is None:
+            scores = self._vectors[candidates] @ query
+            top = self._top_k(scores, k)
+            return [(self.ids[candidates[i]], float(scores[i])) for i in top]
+
+        # Asymmetric distance computation: score = <q, centroid> + sum_j <q_j, codebook_j[code_j]>
+        sub_dim = self.dim // self.pq_subvectors
+        tables = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(self.pq_subvectors, sub_dim))
+        codes = self._codes[candidates]
+        approximate = (self.centroids[self._assignments[candidates]] @ query
+                       + tables[np.arange(self.pq_subvectors)[None, :], codes].sum(axis=1))
+        shortlist = candidates[self._top_k(approximate, max(k, self.rerank))]
+        scores = self._vectors[shortlist] @ query
+        top = self._top_k(scores, k)
+        return [(self.ids[shortlist[i]], float(scores[i])) for i in top]
+
+    def search_features(self, features, k=10):
+        """
+        Find the tracks most similar to a track given by its features.
+
+        Parameters:
+            features (dict or EncodedFeatures): Features as returned by `Extractor.extract`.
+            k (int): Number of results. Default is 10.
+
+        Returns:
+            list: List of (track_id, score) tuples sorted by decreasing cosine similarity.
+        """
+        return self.search(track_embedding(features), k)
+
+    def save(self, file_name):
+        """
+        Save the index to an .npz archive.
+
+        Parameters:
+            file_name (str): Path of the archive.
+        """
+        config = {
+            "dim": self.dim, "mode": self.mode, "n_lists": self.n_lists, "n_probe": self.n_probe,
+            "pq_subvectors": self.pq_subvectors, "rerank": self.rerank,
+        }
+        arrays = {
+            "config": np.array(json.dumps(config)),
+            "ids": np.array(self.ids, dtype=str),
+            "vectors": self.vectors,
+        }
+        if self.is_trained:
+            arrays["centroids"] = self.centroids
+            arrays["assignments"] = self._assignments[:self._size]
+        if self.codebooks is not None:
+            arrays["codebooks"] = self.codebooks
+            arrays["codes"] = self._codes[:self._size]
+        np.savez(file_name, **arrays)
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Load an index saved with `save`.
+
+        Parameters:
+            file_name (str): Path of the archive.
+
+        Returns:
+            SimilarityIndex: Loaded index, ready for searches and insertions.
+        """
+        with np.load(file_name) as archive:
+            index = cls(**json.loads(str(archive["config"])))
+            ids = [str(track_id) for track_id in archive["ids"]]
+            vectors = archive["vectors"]
+            index._reserve(len(ids))
+            index.ids = ids
+            index._rows = {track_id: row for row, track_id in enumerate(ids)}
+            index._size = len(ids)
+            index._vectors[:index._size] = vectors
+            if "centroids" in archive.files:
+                index.centroids = archive["centroids"]
+                index._assignments[:index._size] = archive["assignments"]
+            if "codebooks" in archive.files:
+                index.codebooks = archive["codebooks"]
+                index._codes = np.zeros((len(index._vectors), index.pq_subvectors), dtype=np.uint8)
+                index._codes[:index._size] = archive["codes"]
+            if index.is_trained:
+                index._build_lists()
+        return index
@@ -0,0 +1,349 @@
+from fractions import Fraction
+from math import ceil
+import numpy as np
+import soundfile as sf
+from scipy.signal import correlate, get_window, resample_poly
+
+
+STRETCH_METHODS = ("phase_vocoder", "wsola")
+
+
+def varispeed(audio_data, speed, max_denominator=1000):
+    """
+    Play the audio `speed` times faster, changing tempo and pitch together like the pitch fader of a turntable,
+    by polyphase resampling.
+
+    Parameters:
+        audio_data (np.ndarray): Audio data of shape (n_samples,) or (n_samples, n_channels).
+        speed (float): Speed factor, e.g. 128 / 125 to bring a 125 BPM track to 128 BPM.
+        max_denominator (int): Largest denominator of the rational approximation of the speed. Default is 1000.
+
+    Returns:
+        tuple: Resampled float32 audio and the exact speed that was applied.
+    """
+    fraction = Fraction(speed).limit_denominator(max_denominator)
+    audio_data = np.asarray(audio_data, dtype=np.float32)
+    if fraction == 1:
+        return audio_data.copy(), 1.0
+    # Output length is n * up / down = n / speed
+    resampled = resample_poly(audio_data, fraction.denominator, fraction.numerator, axis=0)
+    return resampled.astype(np.float32, copy=False), float(fraction)
+
+
+class VarispeedFile:
+    """
+    Class Usage: Read an audio file played `speed` times faster, like `varispeed`, without loading it at once.
+
+    The file is read with the same interface as a `soundfile.SoundFile` (`frames`, `samplerate`, `channels`,
+    `seek`, `read`), in samples of the resampled audio. Every read resamples the part of the file it needs,
+    with a margin of the length of the resampling filter, starting on a multiple of the downsampling factor so
+    that the polyphase filter stays aligned: the samples are those of `varispeed` on the whole file.
+    """
+
+    def __init__(self, file_name, speed=1.0, max_denominator=1000):
+        """
+        Open the audio file.
+
+        Parameters:
+            file_name (str): Path of the audio file.
+            speed (float): Speed factor, e.g. 128 / 125 to bring a 125 BPM track to 128 BPM. Default is 1.
+            max_denominator (int): Largest denominator of the rational approximation of the speed. Default is 1000.
+        """
+        fraction = Fraction(speed).limit_denominator(max_denominator)
+        self.up, self.down = fraction.denominator, fraction.numerator
+        self.speed = float(fraction)
+        self.file = sf.SoundFile(file_name)
+        self.samplerate = self.file.samplerate
+        self.channels = self.file.channels
+        self.frames = ceil(self.file.frames * self.up / self.down)
+        # Half length of the filter of `resample_poly`, in input samples
+        self.margin = ceil(10 * max(self.up, self.down) / self.up) + 2
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the audio file."""
+        self.file.close()
+
+    def seek(self, frames):
+        """
+        Move to a position of the resampled audio.
+
+        Parameters:
+            frames (int): Position in samples of the resampled audio.
+
+        Returns:
+            int: The new position.
+        """
+        self.position = min(max(0, int(frames)), self.frames)
+        return self.position
+
+    def tell(self):
+        """Return the current position in samples of the resampled audio."""
+        return self.position
+
+    def read(self, frames=-1, always_2d=False):
+        """
+        Read resampled audio from the current position.
+
+        Parameters:
+            frames (int): Number of samples to read. Default is -1, up to the end of the file.
+            always_2d (bool): Return a 2-D array even for mono files. Default is False.
+
+        Returns:
+            np.ndarray: float32 audio of shape (frames,) or (frames, channels).
+        """
+        start = self.position
+        stop = self.frames if frames < 0 else min(self.frames, start + frames)
+        if self.up == self.down:
+            self.file.seek(start)
+            audio_data = self.file.read(stop - start, dtype="float32", always_2d=True)
+        else:
+            first = max(0, start * self.down // self.up - self.margin) // self.down * self.down
+            last = min(self.file.frames, stop * self.down // self.up + self.margin + 1)
+            self.file.seek(first)
+            block = self.file.read(last - first, dtype="float32", always_2d=True)
+            offset = first * self.up // self.down
+            audio_data = resample_poly(block, self.up, self.down, axis=0)[start - offset:stop - offset]
+            audio_data = audio_data.astype(np.float32, copy=False)
+        self.position = stop
+        return audio_data if always_2d or self.channels > 1 else audio_data[:, 0]
+
+
+class TimeStretcher:
+    """
+    Class Usage: In-process time stretching along a time map, without temporary files or subprocesses.
+
+    The time map has the same format as for `pyrubberband.timemap_stretch`: a list of (input sample, output sample)
+    pairs, whose last pair maps the end of the input to the end of the output. Every output frame is centred at
+    a multiple of the synthesis hop, and reads the input around the position given by interpolating the time map,
+    so the beats of the map land where they should without any accumulated drift.
+
+    Two methods are available:
+        - "phase_vocoder": phase vocoder with identity phase locking (Laroche & Dolson), for tonal material.
+        - "wsola": waveform-similarity overlap-add, which keeps transients sharp, for percussive material.
+
+    The output is produced in float32 chunks by `stream`, or at once by `stretch`.
+    """
+
+    def __init__(self, method="phase_vocoder", frame_length=None, hop_length=None, tolerance=None,
+                 chunk_size=65536):
+        """
+        Initialize the TimeStretcher.
+
+        Parameters:
+            method (str): "phase_vocoder" or "wsola". Default is "phase_vocoder".
+            frame_length (int, optional): Frame length in samples. Default is 2048 for the phase vocoder and
+                1024 for WSOLA.
+            hop_length (int, optional): Synthesis hop in samples, a divisor of the frame length.
+                Default is a quarter of the frame length for the phase vocoder and half of it for WSOLA.
+            tolerance (int, optional): Largest shift of a WSOLA frame from its nominal input position, in samples.
+                Default is an eighth of the frame length.
+            chunk_size (int): Number of output samples produced per chunk. Default is 65536.
+        """
+        if method not in STRETCH_METHODS:
+            raise ValueError(f"method must be one of {STRETCH_METHODS}, got {method}.")
+        self.method = method
+        self.frame_length = frame_length or (2048 if method == "phase_vocoder" else 1024)
+        self.hop_length = hop_length or self.frame_length // (4 if method == "phase_vocoder" else 2)
+        if self.frame_length % self.hop_length:
+            raise ValueError("hop_length must divide frame_length.")
+        self.tolerance = tolerance if tolerance is not None else self.frame_length // 8
+        self.frames_per_chunk = max(1, chunk_size // self.hop_length)
+        self.window = get_window("hann", self.frame_length).astype(np.float32)
+
+    @staticmethod
+    def _validate_time_map(time_map):
+        """Return the input and output positions of a time map as float arrays."""
+        time_map = np.asarray(time_map, dtype=np.float64)
+        if time_map.ndim != 2 or time_map.shape[1] != 2 or len(time_map) < 1:
+            raise ValueError("time_map must be a sequence of (input sample, output sample) pairs.")
+        input_points, output_points = time_map[:, 0], time_map[:, 1]
+        if np.any(np.diff(output_points) < 0) or np.any(np.diff(input_points) < 0):
+            raise ValueError("time_map positions must be non-decreasing.")
+        return input_points, output_points
+
+    @staticmethod
+    def input_positions(output_positions, input_points, output_points):
+        """
+        Map output sample positions to input sample positions along the time map.
+
+        Positions before the first or after the last pair of the map are extrapolated at the original speed.
+
+        Parameters:
+            output_positions (np.ndarray): Output positions in samples.
+            input_points (np.ndarray): Input positions of the time map.
+            output_points (np.ndarray): Output positions of the time map.
+
+        Returns:
+            np.ndarray: Input positions in samples.
+        """
+        positions = np.interp(output_positions, output_points, input_points)
+        before = output_positions < output_points[0]
+        after = output_positions > output_points[-1]
+        positions[before] = input_points[0] - (output_points[0] - output_positions[before])
+        positions[after] = input_points[-1] + (output_positions[after] - output_points[-1])
+        return positions
+
+    def stretch(self, audio_data, time_map, output_length=None):
+        """
+        Stretch the audio along the time map.
+
+        Parameters:
+            audio_data (np.ndarray): Audio data of shape (n_samples,) or (n_samples, n_channels).
+            time_map (list): Time map as a list of (input sample, output sample) pairs.
+            output_length (int, optional): Length of the output. Default is the output position of the last pair.
+
+        Returns:
+            np.ndarray: Stretched float32 audio, with the same channel layout as the input.
+        """
+        chunks = list(self.stream(audio_data, time_map, output_length))
+        if not chunks:
+            return np.zeros((0,) + np.shape(audio_data)[1:], dtype=np.float32)
+        return np.concatenate(chunks)
+
+    def stream(self, audio_data, time_map, output_length=None):
+        """
+        Stretch the audio along the time map, yielding the output in chunks.
+
+        Parameters:
+            audio_data (np.ndarray): Audio data of shape (n_samples,) or (n_samples, n_channels).
+            time_map (list): Time map as a list of (input sample, output sample) pairs.
+            output_length (int, optional): Length of the output. Default is the output position of the last pair.
+
+        Yields:
+            np.ndarray: Consecutive float32 chunks of the stretched audio.
+        """
+        audio_data = np.asarray(audio_data, dtype=np.float32)
+        mono = audio_data.ndim == 1
+        audio = audio_data[:, None] if mono else audio_data
+        input_points, output_points = self._validate_time_map(time_map)
+        if output_length is None:
+            output_length = int(round(output_points[-1]))
+
+        n, hop = self.frame_length, self.hop_length
+        half = n // 2
+        # Pad so that every frame (and every WSOLA search region) stays inside the buffer
+        pad = n + self.tolerance
+        padded = np.zeros((len(audio) + 2 * pad, audio.shape[1]), dtype=np.float32)
+        padded[pad:pad + len(audio)] = audio
+
+        n_frames = int(np.ceil((output_length + half) / hop)) + 1
+        nominal = self.input_positions(np.arange(n_frames) * float(hop), input_points, output_points)
+        nominal = np.clip(np.round(nominal).astype(np.int64), -half, len(audio) + half) + pad
+
+        frame_method = self._phase_vocoder_frames if self.method == "phase_vocoder" else self._wsola_frames
+        state = {}
+        overlap = n // hop
+        carry = np.zeros((n - hop, audio.shape[1]), dtype=np.float32)
+        carry_norm = np.zeros(n - hop, dtype=np.float32)
+        # The first frame is centred at output 0, so the first half frame is discarded
+        skip, emitted = half, 0
+        for start in range(0, n_frames, self.frames_per_chunk):
+            centres = nominal[start:start + self.frames_per_chunk]
+            frames, weight = frame_method(padded, centres, state)
+            n_batch = len(frames)
+
+            # Overlap-add the batch: each frame is split into `overlap` hop-long segments
+            block = np.zeros(((n_batch - 1 + overlap) * hop, audio.shape[1]), dtype=np.float32)
+            norm = np.zeros(len(block), dtype=np.float32)
+            for segment in range(overlap):
+                rows = slice(segment * hop, (segment + n_batch) * hop)
+                block[rows] += frames[:, segment * hop:(segment + 1) * hop].reshape(-1, audio.shape[1])
+                norm[rows] += np.tile(weight[segment * hop:(segment + 1) * hop], n_batch)
+            block[:n - hop] += carry
+            norm[:n - hop] += carry_norm
+            done = n_batch * hop
+            carry, carry_norm = block[done:].copy(), norm[done:].copy()
+
+            output = block[:done] / np.maximum(norm[:done], 1e-3)[:, None]
+            output = output[skip:output_length - emitted + skip]
+            skip = max(0, skip - done)
+            emitted += len(output)
+            if len(output):
+                yield output[:, 0] if mono else output
+            if emitted >= output_length:
+                break
+
+    def _frames(self, padded, centres):
+        """Read the frames of length `frame_length` centred at the given positions, shaped (frames, n, channels)."""
+        offsets = np.arange(self.frame_length) - self.frame_length // 2
+        return padded[centres[:, None] + offsets[None, :]]
+
+    def _phase_vocoder_frames(self, padded, centres, state):
+        """
+        Synthesis frames of the phase vocoder with identity phase locking.
+
+        The phase of every spectral peak advances with its instantaneous frequency over the synthesis hop, and
+        the bins around a peak keep their phase relation to it, which preserves the vertical phase coherence
+        of partials and avoids the "phasiness" of a plain phase vocoder.
+        """
+        n, hop = self.frame_length, self.hop_length
+        frames = self._frames(padded, centres) * self.window[None, :, None]
+        spectrum = np.fft.rfft(frames, axis=1)
+        magnitude = np.abs(spectrum)
+        phase = np.angle(spectrum)
+
+        previous_centre = state.get("centre", centres[0] - hop)
+        previous_phase = state.get("phase", phase[0] - 2 * np.pi * np.arange(phase.shape[1])[:, None] * hop / n)
+        analysis_hop = np.diff(np.concatenate([[previous_centre], centres])).astype(np.float64)[:, None, None]
+        phase_delta = np.diff(np.concatenate([previous_phase[None], phase]), axis=0)
+
+        # Instantaneous frequency of every bin, from the phase difference over the analysis hop
+        bin_frequency = 2 * np.pi * np.arange(phase.shape[1])[None, :, None] / n
+        deviation = np.mod(phase_delta - bin_frequency * analysis_hop + np.pi, 2 * np.pi) - np.pi
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frequency = np.where(analysis_hop > 0, bin_frequency + deviation / analysis_hop, bin_frequency)
+        synthesis_phase = state.get("synthesis_phase", phase[0] - frequency[0] * hop) + np.cumsum(frequency * hop, axis=0)
+
+        # Identity phase locking: every bin follows the phase of its nearest spectral peak
+        padded_magnitude = np.pad(magnitude, ((0, 0), (2, 2), (0, 0)))
+        peaks = np.ones(magnitude.shape, dtype=bool)
+        for shift in (1, 2):
+            peaks &= magnitude > padded_magnitude[:, 2 - shift:2 - shift + magnitude.shape[1]]
+            peaks &= magnitude >= padded_magnitude[:, 2 + shift:2 + shift + magnitude.shape[1]]
+        bins = np.arange(magnitude.shape[1])[None, :, None]
+        previous_peak = np.maximum.accumulate(np.where(peaks, bins, -1), axis=1)
+        next_peak = np.flip(np.minimum.accumulate(np.flip(np.where(peaks, bins, magnitude.shape[1]), axis=1), axis=1), axis=1)
+        nearest = np.where(
+            (previous_peak >= 0) & ((next_peak >= magnitude.shape[1]) | (bins - previous_peak <= next_peak - bins)),
+            previous_peak, next_peak)
+        nearest = np.where((nearest < 0) | (nearest >= magnitude.shape[1]), bins, nearest)
+        locked_phase = (np.take_along_axis(synthesis_phase, nearest, axis=1)
+                        + phase - np.take_along_axis(phase, nearest, axis=1))
+
+        state["centre"] = centres[-1]
+        state["phase"] = phase[-1]
+        state["synthesis_phase"] = synthesis_phase[-1]
+        output = np.fft.irfft(magnitude * np.exp(1j * locked_phase), n=n, axis=1).astype(np.float32)
+        return output * self.window[None, :, None], self.window ** 2
+
+    def _wsola_frames(self, padded, centres, state):
+        """
+        Synthesis frames of WSOLA.
+
+        Every frame is taken within `tolerance` samples of its nominal input position, at the shift whose
+        waveform best continues the previous frame, so that consecutive frames overlap in phase.
+        """
+        n, hop, tolerance = self.frame_length, self.hop_length, self.tolerance
+        half = n // 2
+        mix = padded.mean(axis=1)
+        chosen = np.empty(len(centres), dtype=np.int64)
+        previous = state.get("centre")
+        for index, centre in enumerate(centres):
+            if previous is None:
+                chosen[index] = centre
+            else:
+                # Natural continuation of the previous frame, compared to the candidates around the nominal position
+                natural = mix[previous + hop - half:previous + hop + half]
+                region = mix[centre - tolerance - half:centre + tolerance + half]
+                similarity = correlate(region, natural, mode="valid", method="fft")
+                chosen[index] = centre - tolerance + int(np.argmax(similarity))
+            previous = chosen[index]
+        state["centre"] = previous
+        return self._frames(padded, chosen) * self.window[None, :, None], self.window
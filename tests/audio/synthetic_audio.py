@@ -0,0 +1,12 @@
+import numpy as np
+
+
+def synthetic_track(seconds, seed=0):
+    """Int16 16 kHz clip of random tone bursts over noise, with enough peaks for full Shazam signatures."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * 16000)) / 16000
+    clip = 0.02 * rng.normal(size=len(t))
+    for _ in range(int(4 * seconds)):
+        start, duration = rng.uniform(0, seconds), rng.uniform(0.1, 1.5)
+        clip += rng.uniform(0.05, 0.3) * np.sin(2 * np.pi * rng.uniform(200, 6000) * t) * ((t > start) & (t < start + duration))
+    return np.clip(clip * 8000, -32768, 32767).astype(np.int16)
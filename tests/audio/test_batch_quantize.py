@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import librosa
+import numpy as np
+import soundfile as sf
+from technob.audio.batch import BatchQuantizer
+
+
+class TestBatchQuantizer(unittest.TestCase):
+    def test_batch_quantize_with_cache_and_skip(self):
+        sample_rate = 22050
+        with tempfile.TemporaryDirectory() as directory:
+            pack = os.path.join(directory, "pack")
+            os.makedirs(pack)
+            t = np.arange(8 * sample_rate) / sample_rate
+            for index, bpm in enumerate((124, 131)):
+                audio = librosa.clicks(times=np.arange(0.05, 8, 60 / bpm), sr=sample_rate, length=len(t),
+                                       click_freq=80, click_duration=0.08) + 0.2 * np.sin(2 * np.pi * 220 * t)
+                sf.write(os.path.join(pack, f"loop{index}.wav"), np.stack([audio, audio], axis=1), sample_rate)
+            with open(os.path.join(pack, "broken.wav"), "w") as f:
+                f.write("not audio")
+
+            output_dir = os.path.join(directory, "out")
+            job = BatchQuantizer(128, output_dir, beat_tracker="grid", n_workers=1, verbose=False)
+            summary = job.run(pack)
+            self.assertEqual((summary["rendered"], summary["skipped"], summary["failed"]), (2, 0, 1))
+            self.assertIn(os.path.join(pack, "broken.wav"), summary["errors"])
+            self.assertGreater(summary["realtime_factor"], 0)
+            names = sorted(name for name in os.listdir(output_dir) if name.endswith(".wav"))
+            self.assertEqual(names, ["loop0 - Key A minor - BPM Original 124 - BPM 128.wav",
+                                     "loop1 - Key A minor - BPM Original 131 - BPM 128.wav"])
+            rendered, _ = sf.read(os.path.join(output_dir, names[0]))
+            self.assertEqual(rendered.shape[1], 2)
+            self.assertEqual(len(os.listdir(job.cache_dir)), 2)
+
+            # Rendered tracks are skipped from their cached analysis, without decoding them again
+            summary = job.run(pack)
+            self.assertEqual((summary["rendered"], summary["skipped"], summary["failed"]), (0, 2, 1))
+
+            # A track replaced by other audio of the same length is analyzed and rendered again
+            path = os.path.join(pack, "loop0.wav")
+            audio, _ = sf.read(path)
+            sf.write(path, np.roll(audio, sample_rate // 4, axis=0), sample_rate)
+            os.utime(path, (0, 0))
+            summary = job.run(pack)
+            self.assertEqual((summary["rendered"], summary["skipped"], summary["failed"]), (1, 1, 1))
+
+
+    def test_same_names_in_subdirectories_and_extensions(self):
+        sample_rate = 22050
+        with tempfile.TemporaryDirectory() as directory:
+            library = os.path.join(directory, "library")
+            t = np.arange(6 * sample_rate) / sample_rate
+            tracks = {os.path.join("a", "intro.wav"): 124, os.path.join("b", "intro.wav"): 131,
+                      "x.wav": 120, "x.flac": 136}
+            for relative_path, bpm in tracks.items():
+                os.makedirs(os.path.dirname(os.path.join(library, relative_path)), exist_ok=True)
+                audio = librosa.clicks(times=np.arange(0.05, 6, 60 / bpm), sr=sample_rate, length=len(t),
+                                       click_freq=80, click_duration=0.08) + 0.2 * np.sin(2 * np.pi * 220 * t)
+                sf.write(os.path.join(library, relative_path), audio, sample_rate)
+
+            output_dir = os.path.join(directory, "out")
+            job = BatchQuantizer(128, output_dir, beat_tracker="grid", n_workers=1, verbose=False)
+            summary = job.run(library)
+            self.assertEqual((summary["rendered"], summary["skipped"], summary["failed"]), (4, 0, 0))
+            # Each track has its own analysis and output, in the subdirectory of the track
+            outputs = {os.path.relpath(result["input"], library): os.path.relpath(result["output"], output_dir)
+                       for result in summary["results"]}
+            self.assertEqual(len(set(outputs.values())), 4)
+            self.assertTrue(outputs[os.path.join("a", "intro.wav")].startswith(os.path.join("a", "intro - ")))
+            self.assertTrue(outputs[os.path.join("b", "intro.wav")].startswith(os.path.join("b", "intro - ")))
+            self.assertTrue(outputs["x.wav"].startswith("x (wav) - "))
+            self.assertTrue(outputs["x.flac"].startswith("x (flac) - "))
+            tempi = {os.path.relpath(result["input"], library): result["tempo"] for result in summary["results"]}
+            for relative_path, bpm in tracks.items():
+                self.assertAlmostEqual(tempi[relative_path], bpm, delta=1)
+                self.assertTrue(os.path.exists(os.path.join(job.cache_dir, relative_path + ".json")))
+
+    def test_outputs_inside_the_library_and_failed_renders(self):
+        sample_rate = 22050
+        with tempfile.TemporaryDirectory() as library:
+            t = np.arange(6 * sample_rate) / sample_rate
+            for index, bpm in enumerate((124, 131)):
+                audio = librosa.clicks(times=np.arange(0.05, 6, 60 / bpm), sr=sample_rate, length=len(t),
+                                       click_freq=80, click_duration=0.08) + 0.2 * np.sin(2 * np.pi * 220 * t)
+                sf.write(os.path.join(library, f"loop{index}.wav"), audio, sample_rate)
+
+            output_dir = os.path.join(library, "quantized")
+            job = BatchQuantizer(128, output_dir, beat_tracker="grid", n_workers=1, verbose=False)
+            def interrupted_write(file, *args, **kwargs):
+                with open(file, "wb") as f:
+                    f.write(b"RIFF")
+                raise OSError("No space left on device")
+
+            with mock.patch("technob.audio.batch.sf.write", interrupted_write):
+                summary = job.run(library)
+            self.assertEqual((summary["rendered"], summary["failed"]), (0, 2))
+            self.assertEqual([name for name in os.listdir(output_dir) if name.endswith(".wav")], [])
+            self.assertFalse(any(name.endswith(".partial") for name in os.listdir(output_dir)))
+
+            self.assertEqual(job.run(library)["rendered"], 2)
+            # The outputs are not picked up as tracks of the library
+            summary = job.run(library)
+            self.assertEqual((summary["n_tracks"], summary["skipped"]), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import librosa
+import numpy as np
+from technob.audio.beat_grid import BeatGridEstimator
+
+
+class TestBeatGridEstimator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample_rate = 22050
+        duration, cls.bpm, offset = 60, 128.0, 0.23
+        cls.beat_times = np.arange(offset, duration, 60 / cls.bpm)
+        length = cls.sample_rate * duration
+        rng = np.random.default_rng(0)
+        t = np.arange(length) / cls.sample_rate
+        # Kick on the beats, hats on the off-beats, a sustained tone and noise
+        audio = 0.8 * librosa.clicks(times=cls.beat_times, sr=cls.sample_rate, length=length,
+                                     click_freq=80, click_duration=0.08)
+        audio += 0.3 * librosa.clicks(times=cls.beat_times + 30 / cls.bpm, sr=cls.sample_rate, length=length,
+                                      click_freq=8000, click_duration=0.02)
+        audio += 0.2 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.normal(size=length)
+        cls.audio = audio
+        cls.noise = 0.1 * rng.normal(size=length)
+
+    def test_tempo_and_alignment(self):
+        grid = BeatGridEstimator().estimate(self.audio, self.sample_rate)
+        self.assertAlmostEqual(grid.tempo, self.bpm, delta=0.05)
+        self.assertGreaterEqual(grid.confidence, 0.5)
+        n_beats = min(len(grid.beat_times), len(self.beat_times))
+        # Locked on the kicks (not the hats) for the whole track, within the onset envelope latency
+        self.assertLess(np.abs(grid.beat_times[:n_beats] - self.beat_times[:n_beats]).max(), 0.05)
+
+    def test_low_confidence_on_noise(self):
+        estimator = BeatGridEstimator()
+        grid = estimator.estimate(self.noise, self.sample_rate)
+        self.assertLess(grid.confidence, estimator.min_confidence)
+
+
+if __name__ == '__main__':
+    unittest.main()
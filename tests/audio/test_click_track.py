@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+import librosa
+import numpy as np
+import soundfile as sf
+from technob.audio.quantize import QuantizeAnalysis, QuantizeRenderer, click_track, write_click_track
+
+
+class TestClickTrack(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 22050
+        self.length = 30 * self.sample_rate
+        self.beat_frames = np.arange(1000, self.length, int(self.sample_rate * 60 / 128))
+
+    def test_matches_librosa_clicks(self):
+        expected = librosa.clicks(frames=self.beat_frames, sr=self.sample_rate, hop_length=1, length=self.length)
+        clicks = click_track(self.beat_frames, self.length, self.sample_rate, accents=(1.0,))
+        np.testing.assert_allclose(clicks, expected, atol=1e-6)
+
+    def test_accents_per_bar(self):
+        clicks = click_track(self.beat_frames, self.length, self.sample_rate, accents=(1.0, 0.25, 0.5, 0.25),
+                             bar_offset=1)
+        peaks = np.array([np.abs(clicks[frame:frame + 100]).max() for frame in self.beat_frames[:8]])
+        np.testing.assert_allclose(peaks / peaks.max(), [0.25, 0.5, 0.25, 1.0] * 2, rtol=1e-5)
+
+    def test_rendered_accents_with_a_beat_on_the_first_sample(self):
+        # The time map drops the beat on sample 0, the click track keeps it as the first downbeat
+        beat_frames = np.arange(0, self.length, self.sample_rate // 2)
+        analysis = QuantizeAnalysis(self.sample_rate, self.length, 120.0, beat_frames)
+        with tempfile.TemporaryDirectory() as directory:
+            path = QuantizeRenderer().render_click_track(analysis, 120, os.path.join(directory, "clicks.wav"))
+            clicks, _ = sf.read(path)
+        peaks = np.array([np.abs(clicks[frame:frame + 100]).max() for frame in beat_frames[:8]])
+        np.testing.assert_allclose(peaks / peaks.max(), [1.0, 0.5, 0.5, 0.5] * 2, rtol=1e-3)
+
+    def test_overlapping_clicks_and_block_writes(self):
+        dense = np.arange(0, self.sample_rate, 100)
+        single = click_track(dense[:1], self.sample_rate, self.sample_rate, accents=(1.0,))
+        expected = sum(np.concatenate([np.zeros(frame), single[:len(single) - frame]]) for frame in dense)
+        np.testing.assert_allclose(click_track(dense, self.sample_rate, self.sample_rate, accents=(1.0,)), expected,
+                                   atol=1e-5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = write_click_track(os.path.join(directory, "click.wav"), self.beat_frames, self.length,
+                                     self.sample_rate, block_size=10000)
+            written, _ = sf.read(path, dtype="float32")
+        np.testing.assert_allclose(written, click_track(self.beat_frames, self.length, self.sample_rate), atol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import librosa
+import numpy as np
+from technob.audio.features.encoding import EncodedFeature, EncodedFeatures
+from technob.audio.features.librosa_features import LibrosaFeaturesExtractor
+
+
+class TestFeatureEncoding(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        sample_rate = 22050
+        t = np.arange(8 * sample_rate) / sample_rate
+        audio = 0.4 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 330 * t * (1 + 0.01 * t))
+        audio += librosa.clicks(times=np.arange(0, 8, 0.5), sr=sample_rate, length=len(t))
+        beats = np.arange(0, librosa.time_to_frames(8, sr=sample_rate), 2)
+        # Feature matrices are stored as (frames, features), as in Extractor.extract
+        cls.features = {
+            "intensity_frames": LibrosaFeaturesExtractor.get_intensity(audio, sample_rate, beats).T,
+            "timbre_frames": LibrosaFeaturesExtractor.get_timbre(audio, sample_rate, beats).T,
+            "pitch_frames": LibrosaFeaturesExtractor.get_pitch(audio, sample_rate, beats).T,
+            "volume": librosa.feature.rms(y=audio)[0],
+        }
+
+    def test_error_budget_per_feature_type(self):
+        # Error budget relative to the range of each feature: half a quantization step for int8, 2 ** -11 for float16
+        budgets = {"int8": 0.5 / 127, "float16": 2.0 ** -11}
+        for dtype, budget in budgets.items():
+            for name, values in self.features.items():
+                with self.subTest(dtype=dtype, feature=name):
+                    encoded = EncodedFeature.encode(values, dtype)
+                    error = np.abs(encoded.decode(np.float64) - values).max(axis=0)
+                    half_range = (values.max(axis=0) - values.min(axis=0)) / 2
+                    magnitude = np.abs(values).max(axis=0)
+                    self.assertTrue(np.all(error <= encoded.max_error() + 1e-12))
+                    self.assertTrue(np.all(encoded.max_error() <= budget * half_range + 1e-6 * magnitude + 1e-12))
+
+    def test_storage_reduction(self):
+        int8 = EncodedFeatures.from_features(self.features, dtype="int8")
+        float16 = EncodedFeatures.from_features(self.features, dtype="float16")
+        original = sum(np.asarray(values, dtype=np.float64).nbytes for values in self.features.values())
+        self.assertGreaterEqual(original / int8.nbytes, 4)
+        self.assertGreaterEqual(original / float16.nbytes, 3)
+
+    def test_one_dimensional_features_shrink(self):
+        values = np.random.default_rng(0).random(1000)
+        for dtype in ("int8", "float16"):
+            with self.subTest(dtype=dtype):
+                encoded = EncodedFeature.encode(values, dtype)
+                self.assertEqual(encoded.scale.shape, ())
+                self.assertLess(encoded.nbytes, values.nbytes / 3)
+                self.assertLessEqual(np.abs(encoded.decode(np.float64) - values).max(), encoded.max_error())
+        self.assertLess(EncodedFeature.encode(self.features["volume"]).nbytes, self.features["volume"].nbytes)
+
+    def test_integer_features_are_lossless(self):
+        labels = np.array([0, 1, 2, 3, 1, 0])
+        encoded = EncodedFeatures.from_features({"segments_labels": labels}, dtype="int8")
+        self.assertTrue(encoded.encoded["segments_labels"].lossless)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "track.npz")
+            encoded.save(path)
+            decoded = EncodedFeatures.load(path)["segments_labels"]
+        self.assertEqual(decoded.dtype, labels.dtype)
+        np.testing.assert_array_equal(decoded, labels)
+
+    def test_save_and_lazy_load(self):
+        features = dict(self.features, tempo=128.0, key="A4")
+        encoded = EncodedFeatures.from_features(features, dtypes={"pitch_frames": "float16"})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "track.npz")
+            encoded.save(path)
+            loaded = EncodedFeatures.load(path)
+        self.assertEqual(loaded["tempo"], 128.0)
+        self.assertEqual(loaded["key"], "A4")
+        self.assertEqual(loaded.encoded["pitch_frames"].dtype, "float16")
+        self.assertEqual(loaded._decoded, {})
+        np.testing.assert_array_equal(loaded["timbre_frames"], encoded["timbre_frames"])
+
+
+if __name__ == '__main__':
+    unittest.main()
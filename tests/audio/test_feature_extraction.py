@@ -0,0 +1,35 @@
+import unittest
+import librosa
+import numpy as np
+from technob.audio.features.extract import Extractor
+
+
+class TestExtractorWorkers(unittest.TestCase):
+    def test_threaded_features_match_serial(self):
+        sample_rate = 22050
+        t = np.arange(10 * sample_rate) / sample_rate
+        audio = (librosa.clicks(times=np.arange(0.1, 10, 60 / 128), sr=sample_rate, length=len(t), click_freq=80)
+                 + 0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        y_harmonic, _ = librosa.effects.hpss(audio)
+        beats = np.arange(10, 420, 20)
+
+        serial = Extractor(audio, sample_rate=sample_rate, verbose=False, n_workers=1)
+        threaded = Extractor(audio, sample_rate=sample_rate, verbose=False, n_workers=4)
+        expected = serial.extract_beat_synchronous(y_harmonic, beats)
+        results = threaded.extract_beat_synchronous(y_harmonic, beats)
+
+        self.assertEqual(list(results), ["intensity", "timbre", "pitch", "loudness"])
+        self.assertEqual(list(results), list(expected))
+        for name in ("intensity", "timbre", "pitch"):
+            np.testing.assert_array_equal(results[name], expected[name])
+        self.assertEqual(results["loudness"].keys(), expected["loudness"].keys())
+        for key, value in expected["loudness"].items():
+            np.testing.assert_array_equal(results["loudness"][key], value)
+
+        for extractor in (serial, threaded):
+            self.assertEqual(set(extractor.timings), {"intensity", "timbre", "pitch", "loudness"})
+            self.assertTrue(all(elapsed > 0 for elapsed in extractor.timings.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import asyncio
+import socket
+import unittest
+import numpy as np
+from technob.audio.search.find_set_songs import identify_set_async
+from technob.audio.search.shazam.client import AsyncShazamClient
+from technob.audio.search.shazam.fingerprint_index import FingerprintIndex
+from synthetic_audio import synthetic_track
+
+
+def unreachable_api_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/tag/%s/%s"
+
+
+class TestIdentifySet(unittest.TestCase):
+    def test_tracklist_and_transitions(self):
+        durations = [50, 35, 45]
+        tracks = [synthetic_track(seconds, seed) for seed, seconds in enumerate(durations)]
+        index = FingerprintIndex()
+        for i, samples in enumerate(tracks):
+            index.add(f"track-{i}", samples, {"name": f"Track {i}", "artist": "Artist"})
+        samples = np.concatenate(tracks)
+
+        async def identify():
+            # Windows missing from the local library fail right away instead of reaching the network
+            async with AsyncShazamClient(max_retries=0, api_url=unreachable_api_url()) as client:
+                return await identify_set_async(samples, client, hop_seconds=10.0, signature_seconds=8.0,
+                                                bisection_steps=4, local_index=index, n_workers=1)
+
+        tracklist = asyncio.run(identify())
+        self.assertEqual([track["name"] for track in tracklist], ["Track 0", "Track 1", "Track 2"])
+        self.assertEqual(tracklist[0]["start"], 0.0)
+        # The bisection pins the transitions down to 10 / 2 ** 4 seconds, plus the blur of windows spanning both
+        for track, start in zip(tracklist[1:], np.cumsum(durations)[:-1]):
+            self.assertAlmostEqual(track["start"], start, delta=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
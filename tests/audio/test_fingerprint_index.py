@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+import numpy as np
+from pydub import AudioSegment
+from technob.audio.search.shazam.algorithm import VectorizedSignatureGenerator
+from technob.audio.search.shazam.find import Shazam
+from technob.audio.search.shazam.fingerprint_index import FingerprintIndex, peak_pair_hashes, signature_peaks
+from synthetic_audio import synthetic_track
+
+
+def query(samples, offset_seconds, noise=0.0, seconds=8):
+    excerpt = samples[int(offset_seconds * 16000):].astype(np.float64)
+    excerpt += np.random.default_rng(1).normal(0, noise, len(excerpt)) if noise else 0
+    generator = VectorizedSignatureGenerator()
+    generator.feed_input(np.clip(excerpt, -32768, 32767).astype(np.int16))
+    generator.MAX_TIME_SECONDS = seconds
+    return generator.get_next_signature()
+
+
+class TestFingerprintIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tracks = {f"track-{i}": synthetic_track(30, i) for i in range(3)}
+        cls.index = FingerprintIndex()
+        for track_id, samples in cls.tracks.items():
+            cls.index.add(track_id, samples, {"name": track_id.title(), "artist": "Artist"})
+
+    def test_peak_pair_hashes(self):
+        times = np.array([0, 0, 1, 3, 3, 70])
+        bins = np.array([10, 20, 30, 40, 50, 60])
+        hashes, anchors = peak_pair_hashes(times, bins, fan_out=2, max_delta=63)
+        pairs = sorted(zip(anchors.tolist(), (hashes >> 17).tolist(), ((hashes >> 7) & 1023).tolist(),
+                           (hashes & 127).tolist()))
+        # Peaks of the anchor's own FFT pass are skipped, and pairs more than 63 passes apart are dropped
+        self.assertEqual(pairs, [(0, 10, 30, 1), (0, 10, 40, 3), (0, 20, 30, 1), (0, 20, 40, 3),
+                                 (1, 30, 40, 2), (1, 30, 50, 2)])
+
+    def test_votes(self):
+        signature = query(self.tracks["track-1"], 3.2, noise=50)
+        rows, offsets, counts, n_hashes = self.index.votes(signature)
+
+        # Brute force: every occurrence of every query hash votes for its (track, offset), merged with the
+        # neighbor offsets
+        hashes, anchors = peak_pair_hashes(*signature_peaks(signature))
+        histogram = Counter()
+        for hash_, anchor in zip(hashes.tolist(), anchors.tolist()):
+            for i in np.nonzero(self.index._hashes == hash_)[0]:
+                histogram[int(self.index._tracks[i]), int(self.index._times[i]) - anchor] += 1
+        expected = {(row, offset): sum(histogram[row, offset + shift] for shift in (-1, 0, 1))
+                    for row, offset in histogram}
+
+        self.assertEqual(n_hashes, len(hashes))
+        self.assertEqual(dict(zip(zip(rows.tolist(), offsets.tolist()), counts.tolist())), expected)
+        self.assertTrue(np.all(np.diff(counts) <= 0))
+        self.assertLessEqual(self.index.recognize(signature)["score"], 1.0)
+
+    def test_recognize(self):
+        for track_id, offset_seconds, noise in (("track-1", 12.0, 0), ("track-2", 7.33, 100), ("track-0", 0.51, 50)):
+            with self.subTest(track_id=track_id, offset_seconds=offset_seconds):
+                result = self.index.recognize(query(self.tracks[track_id], offset_seconds, noise))
+                self.assertEqual(result["track_id"], track_id)
+                self.assertEqual(result["name"], track_id.title())
+                self.assertIn("shazam_url", result)
+                self.assertAlmostEqual(result["offset"], offset_seconds, delta=0.01)
+        self.assertIsNone(self.index.recognize(query(synthetic_track(10, 99), 0)))
+
+    def test_persistence_and_shazam_fallback(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "library.npz")
+            self.index.save(path)
+            loaded = FingerprintIndex.load(path)
+        signature = query(self.tracks["track-2"], 20.0)
+        self.assertEqual(loaded.recognize(signature.encode_to_uri()), self.index.recognize(signature))
+        self.assertEqual(loaded.n_hashes, self.index.n_hashes)
+
+        # Local hits never reach the network
+        segment = AudioSegment(self.tracks["track-1"][5 * 16000:20 * 16000].tobytes(), frame_rate=16000,
+                               sample_width=2, channels=1)
+        result = next(Shazam(segment, local_index=loaded).attempt_recognition())
+        self.assertEqual(result["track_id"], "track-1")
+
+
+if __name__ == '__main__':
+    unittest.main()
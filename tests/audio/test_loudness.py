@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from technob.audio.features.loudness import LoudnessAnalyzer
+
+
+class TestLoudnessAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 48000
+        t = np.arange(5 * self.sample_rate) / self.sample_rate
+        self.sine = np.sin(2 * np.pi * 997 * t)
+
+    def test_full_scale_sine_reference(self):
+        # BS.1770: a 0 dBFS 997 Hz sine in a single channel reads -3.01 LUFS
+        result = LoudnessAnalyzer(self.sample_rate).analyze(self.sine)
+        self.assertAlmostEqual(result["integrated_lufs"], -3.01, delta=0.05)
+        self.assertAlmostEqual(result["avg_rms"], 1 / np.sqrt(2), delta=1e-3)
+        self.assertGreaterEqual(result["true_peak"], result["sample_peak"] - 1e-3)
+
+    def test_block_size_does_not_change_result(self):
+        audio = self.sine * np.linspace(0, 1, len(self.sine))
+        reference = LoudnessAnalyzer(self.sample_rate, block_size=len(audio)).analyze(audio)
+        streamed = LoudnessAnalyzer(self.sample_rate, block_size=1234).analyze(audio)
+        np.testing.assert_allclose(streamed["rms"], reference["rms"], rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(streamed["short_term_lufs"], reference["short_term_lufs"], atol=1e-9)
+        self.assertAlmostEqual(streamed["integrated_lufs"], reference["integrated_lufs"], places=9)
+        self.assertAlmostEqual(streamed["true_peak"], reference["true_peak"], places=9)
+
+    def test_silence_bounds(self):
+        audio = np.concatenate([np.zeros(1000), self.sine[:4800], np.zeros(2000)])
+        result = LoudnessAnalyzer(self.sample_rate, block_size=777).analyze(audio)
+        self.assertLessEqual(abs(result["silence_start"] - 1000), 1)
+        self.assertLessEqual(abs(result["silence_end"] - 5800), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
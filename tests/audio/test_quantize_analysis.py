@@ -0,0 +1,161 @@
+import os
+import tempfile
+import unittest
+import librosa
+import numpy as np
+import soundfile as sf
+from technob.audio.quantize import QuantizeAnalysis, QuantizeRenderer, Quantizer, audio_hash
+from technob.audio.stretch import varispeed
+
+
+class TestQuantizeAnalysis(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample_rate = 22050
+        beat_times = np.arange(0.1, 20, 60 / 125)
+        cls.audio = librosa.clicks(times=beat_times, sr=cls.sample_rate, length=20 * cls.sample_rate,
+                                   click_freq=80, click_duration=0.08).astype(np.float32)
+        cls.analysis = QuantizeAnalysis.from_audio(cls.audio, cls.sample_rate, beat_tracker="grid")
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "analysis.json")
+            self.analysis.save(path)
+            loaded = QuantizeAnalysis.load(path)
+        self.assertEqual(loaded.to_dict(), self.analysis.to_dict())
+        self.assertAlmostEqual(loaded.tempo, 125, delta=0.5)
+
+    def test_cache_file_is_reused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "analysis.json")
+            cached = QuantizeAnalysis(self.sample_rate, len(self.audio), 100.0, [0, 1000], beat_tracker="grid",
+                                      audio_hash=audio_hash(self.audio))
+            cached.save(path)
+            self.assertEqual(QuantizeAnalysis.from_audio(self.audio, self.sample_rate, "grid", path).tempo, 100.0)
+            # Other audio of the same length does not reuse the cache
+            analysis = QuantizeAnalysis.from_audio(np.roll(self.audio, 1000), self.sample_rate, "grid", path)
+            self.assertAlmostEqual(analysis.tempo, 125, delta=0.5)
+            self.assertEqual(QuantizeAnalysis.load(path).audio_hash, audio_hash(np.roll(self.audio, 1000)))
+            # A cache written for other audio is replaced by a new analysis
+            analysis = QuantizeAnalysis.from_audio(self.audio[:-1], self.sample_rate, "grid", path)
+            self.assertAlmostEqual(analysis.tempo, 125, delta=0.5)
+            self.assertEqual(QuantizeAnalysis.load(path).n_samples, len(self.audio) - 1)
+
+    def test_stereo_analysis(self):
+        stereo = np.stack([self.audio, 0.5 * self.audio])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "analysis.json")
+            analysis = QuantizeAnalysis.from_audio(stereo, self.sample_rate, "grid", path)
+            self.assertEqual(analysis.n_samples, len(self.audio))
+            self.assertAlmostEqual(analysis.tempo, self.analysis.tempo, delta=0.5)
+            # The cached analysis is reused for the same stereo audio
+            analysis.tempo = 100.0
+            analysis.save(path)
+            self.assertEqual(QuantizeAnalysis.from_audio(stereo, self.sample_rate, "grid", path).tempo, 100.0)
+        self.assertEqual(analysis.rescaled(2 * len(self.audio)).n_samples, 2 * len(self.audio))
+
+    def test_rescaled_matches_tracking_after_varispeed(self):
+        shifted, speed = varispeed(self.audio, 128 / self.analysis.tempo)
+        rescaled = self.analysis.rescaled(len(shifted))
+        self.assertAlmostEqual(rescaled.tempo, self.analysis.tempo * speed, places=2)
+        tracked = QuantizeAnalysis.from_audio(shifted, self.sample_rate, beat_tracker="grid")
+        n_beats = min(len(tracked.beat_frames), len(rescaled.beat_frames))
+        self.assertLess(np.abs(tracked.beat_frames[:n_beats] - rescaled.beat_frames[:n_beats]).max(),
+                        0.01 * self.sample_rate)
+
+    def test_renderer_pitch_shift(self):
+        renderer = QuantizeRenderer("phase_vocoder")
+        np.testing.assert_array_equal(renderer.pitch_shift(self.audio, self.sample_rate, 125, 128),
+                                      varispeed(self.audio, 128 / 125)[0])
+        for semitones in (0.0, 2.0):
+            shifted = renderer.pitch_shift(self.audio, self.sample_rate, 125, 128, "quality", semitones)
+            self.assertAlmostEqual(len(shifted) / len(self.audio), 125 / 128, places=3)
+        with self.assertRaises(ValueError):
+            renderer.pitch_shift(self.audio, self.sample_rate, 125, 128, "turntable")
+
+    def test_render_ladder(self):
+        renderer = QuantizeRenderer()
+        bpms = [128, 130]
+        in_memory = renderer.render_ladder(self.audio, self.analysis, bpms)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = renderer.render_ladder(self.audio, self.analysis, bpms, output_dir=directory, name="loop")
+            for bpm in bpms:
+                self.assertEqual(os.path.basename(paths[bpm]), f"loop - BPM {bpm}.wav")
+                written, sample_rate = sf.read(paths[bpm], dtype="float32")
+                self.assertEqual(sample_rate, self.sample_rate)
+                self.assertEqual(len(written), len(in_memory[bpm]))
+                self.assertEqual(len(in_memory[bpm]), renderer.time_map(self.analysis, bpm)[-1][1])
+
+    def test_render_stems_in_parallel(self):
+        renderer = QuantizeRenderer()
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as directory:
+            stem_paths = []
+            for stem in ("drums", "bass", "other"):
+                path = os.path.join(directory, f"{stem}.wav")
+                sf.write(path, np.stack([self.audio, 0.1 * rng.normal(size=len(self.audio))], axis=1), self.sample_rate)
+                stem_paths.append(path)
+            serial = renderer.render_stems(stem_paths, self.analysis, 128, directory, name="serial", n_workers=1)
+            parallel = renderer.render_stems(stem_paths, self.analysis, 128, directory, name="loop", n_workers=2)
+            self.assertEqual(os.path.basename(parallel[1]), "loop - Stem bass - BPM 128.wav")
+            expected_length = renderer.time_map(self.analysis, 128)[-1][1]
+            for serial_path, parallel_path in zip(serial, parallel):
+                written, _ = sf.read(parallel_path, dtype="float32")
+                self.assertEqual(written.shape, (expected_length, 2))
+                np.testing.assert_array_equal(written, sf.read(serial_path, dtype="float32")[0])
+
+    def test_stems_follow_pitch_shift_first(self):
+        quantizer = Quantizer(self.audio, self.sample_rate, target_bpm=128, pitch_shift_first=True, verbose=False,
+                              beat_tracker="grid", analysis=self.analysis)
+        with tempfile.TemporaryDirectory() as directory:
+            # A stem identical to the mix must be quantized exactly like the mix
+            stem_path = os.path.join(directory, "drums.wav")
+            sf.write(stem_path, self.audio, self.sample_rate, subtype="FLOAT")
+            paths = quantizer.process_stems(os.path.join(directory, "loop.wav"), directory, stem_paths=[stem_path],
+                                            n_workers=1)
+            self.assertEqual(os.path.basename(paths[0]), "loop - Stem drums - BPM 128.wav")
+            stem, _ = sf.read(paths[0], dtype="float32")
+        self.assertEqual(len(stem), len(quantizer.quantized_audio))
+        np.testing.assert_allclose(stem, quantizer.quantized_audio, atol=1e-4)
+
+    def test_stems_follow_quality_pitch_shift_first(self):
+        quantizer = Quantizer(self.audio, self.sample_rate, target_bpm=128, pitch_shift_first=True, verbose=False,
+                              beat_tracker="grid", analysis=self.analysis, pitch_shift_mode="quality")
+        with tempfile.TemporaryDirectory() as directory:
+            stem_path = os.path.join(directory, "drums.wav")
+            sf.write(stem_path, self.audio, self.sample_rate, subtype="FLOAT")
+            paths = quantizer.process_stems(os.path.join(directory, "loop.wav"), directory, stem_paths=[stem_path],
+                                            n_workers=1)
+            stem, _ = sf.read(paths[0], dtype="float32")
+        # The stem is stretched once instead of twice, so only its beats are compared with the mix
+        self.assertEqual(len(stem), len(quantizer.quantized_audio))
+        stem_onsets = librosa.onset.onset_detect(y=stem, sr=self.sample_rate, units="samples")
+        mix_onsets = librosa.onset.onset_detect(y=quantizer.quantized_audio, sr=self.sample_rate, units="samples")
+        self.assertEqual(len(stem_onsets), len(mix_onsets))
+        self.assertLessEqual(np.abs(stem_onsets - mix_onsets).max(), 1024)
+
+    def test_streaming_analysis_and_render(self):
+        renderer = QuantizeRenderer()
+        t = np.arange(len(self.audio)) / self.sample_rate
+        audio = (self.audio + 0.2 * np.sin(2 * np.pi * 110 * t)).astype(np.float32)
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, "set.wav")
+            sf.write(input_path, audio, self.sample_rate, subtype="FLOAT")
+            analysis = QuantizeAnalysis.from_file(input_path, block_duration=8, overlap_duration=2)
+            self.assertEqual(analysis.n_samples, len(audio))
+            self.assertAlmostEqual(analysis.tempo, 125, delta=0.5)
+            # Beats joined across the blocks are evenly spaced, without duplicates or gaps
+            intervals = np.diff(analysis.beat_frames) / self.sample_rate
+            self.assertLess(np.abs(intervals - 60 / 125).max(), 0.01)
+
+            output_path = renderer.render_file(input_path, os.path.join(directory, "out.wav"), analysis, 128,
+                                               block_beats=8)
+            streamed, _ = sf.read(output_path, dtype="float32")
+        full = renderer.render(audio, analysis, 128)
+        self.assertEqual(len(streamed), len(full))
+        # Crossfaded seams do not add discontinuities
+        self.assertLessEqual(np.abs(np.diff(streamed)).max(), 1.5 * np.abs(np.diff(full)).max())
+
+
+if __name__ == '__main__':
+    unittest.main()
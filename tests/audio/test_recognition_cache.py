@@ -0,0 +1,95 @@
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+from pydub import AudioSegment
+from technob.audio.search.shazam.algorithm import VectorizedSignatureGenerator
+from technob.audio.search.shazam.cache import RecognitionCache, coarse_signature_key, signature_key
+from technob.audio.search.shazam.find import Shazam
+from technob.audio.search.shazam.signature_format import DecodedMessage
+
+
+def signatures(n, seconds=3, seed=0):
+    generator = VectorizedSignatureGenerator()
+    generator.feed_input(np.random.default_rng(seed).normal(0, 3000, n * seconds * 16000).astype(np.int16))
+    generator.MAX_TIME_SECONDS = seconds
+    return [generator.get_next_signature() for _ in range(n)]
+
+
+def response(title):
+    return {"track": {"title": title, "subtitle": "Artist", "genres": {"primary": "Techno"}}}
+
+
+class TestRecognitionCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache", "recognitions.sqlite")
+        self.signatures = signatures(4)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_put_and_persistence(self):
+        with RecognitionCache(self.path) as cache:
+            self.assertIsNone(cache.get(self.signatures[0]))
+            self.assertTrue(cache.put(self.signatures[0], response("A")))
+            # Responses without a track are not cached by default
+            self.assertFalse(cache.put(self.signatures[1], {"matches": []}))
+            self.assertEqual(cache.get(self.signatures[0]), response("A"))
+            self.assertIsNone(cache.get(self.signatures[1]))
+            self.assertEqual((cache.stats["hits"], cache.stats["misses"]), (1, 2))
+            self.assertAlmostEqual(cache.hit_rate, 1 / 3)
+
+        with RecognitionCache(self.path) as cache:
+            # The key depends on the content of the signature only
+            copy = DecodedMessage.decode_from_binary(self.signatures[0].encode_to_binary())
+            self.assertEqual(signature_key(copy), signature_key(self.signatures[0]))
+            self.assertEqual(cache.get(copy), response("A"))
+
+    def test_coarse_key(self):
+        near_duplicate = DecodedMessage.decode_from_binary(self.signatures[0].encode_to_binary())
+        for peaks in near_duplicate.frequency_band_to_sound_peaks.values():
+            peaks.array["peak_magnitude"] += 1
+        self.assertNotEqual(signature_key(near_duplicate), signature_key(self.signatures[0]))
+        self.assertEqual(coarse_signature_key(near_duplicate), coarse_signature_key(self.signatures[0]))
+        self.assertNotEqual(coarse_signature_key(self.signatures[1]), coarse_signature_key(self.signatures[0]))
+
+        with RecognitionCache(":memory:") as cache:
+            cache.put(self.signatures[0], response("A"))
+            self.assertIsNone(cache.get(near_duplicate))
+        with RecognitionCache(":memory:", coarse=True) as cache:
+            cache.put(self.signatures[0], response("A"))
+            self.assertEqual(cache.get(near_duplicate), response("A"))
+            self.assertEqual(cache.stats["coarse_hits"], 1)
+
+    def test_eviction(self):
+        with RecognitionCache(":memory:", ttl=0.2, max_entries=2) as cache:
+            for signature, title in zip(self.signatures[:2], "AB"):
+                cache.put(signature, response(title))
+            # "A" is used after "B", so "B" is the least recently used entry when "C" is added
+            cache.get(self.signatures[0])
+            cache.put(self.signatures[2], response("C"))
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.stats["evictions"], 1)
+            self.assertIsNone(cache.get(self.signatures[1]))
+
+            time.sleep(0.25)
+            self.assertIsNone(cache.get(self.signatures[0]))
+            self.assertEqual(cache.stats["expired"], 1)
+            self.assertEqual(cache.purge_expired(), 1)
+            self.assertEqual(len(cache), 0)
+
+    def test_shazam_requests(self):
+        samples = np.random.default_rng(1).normal(0, 3000, 20 * 16000).astype(np.int16)
+        shazam = Shazam(AudioSegment(samples.tobytes(), frame_rate=16000, sample_width=2, channels=1),
+                        cache=RecognitionCache(":memory:"))
+        signature = shazam.createSignatureGenerator(shazam.audio).get_next_signature()
+        shazam.cache.put(signature, response("A"))
+        # Answered from the cache, without any request
+        self.assertEqual(next(shazam.attempt_recognition())["name"], "A")
+        self.assertEqual(shazam.cache.stats["hits"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+import librosa
+import numpy as np
+import soundfile as sf
+from technob.audio.features.screening import Screener
+
+
+def chord_loop(frequencies, bpm, seconds=12, sample_rate=22050):
+    """Sustained chord with a kick click on every beat."""
+    t = np.arange(seconds * sample_rate) / sample_rate
+    chord = sum(np.sin(2 * np.pi * frequency * t) for frequency in frequencies) / len(frequencies)
+    clicks = librosa.clicks(times=np.arange(0.1, seconds, 60 / bpm), sr=sample_rate, length=len(t), click_freq=100,
+                            click_duration=0.05)
+    return (0.4 * chord + 0.6 * clicks).astype(np.float32)
+
+
+class TestScreener(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sample_rate = 22050
+        cls.screener = Screener()
+        # A minor triad (A3, C4, E4) at 128 BPM
+        cls.loop = chord_loop([220.0, 261.63, 329.63], 128, sample_rate=cls.sample_rate)
+        cls.quiet = (1e-4 * np.random.default_rng(0).normal(size=len(cls.loop))).astype(np.float32)
+
+    def test_estimate_key(self):
+        for tonic, frequencies, key in ((0, [261.63, 329.63, 392.0], "C major"), (9, [220.0, 261.63, 329.63], "A minor")):
+            with self.subTest(key=key):
+                chroma = np.zeros((12, 10))
+                for frequency in frequencies:
+                    chroma[int(round(12 * np.log2(frequency / 261.63))) % 12] = 1.0
+                estimated, confidence = Screener.estimate_key(chroma)
+                self.assertEqual(estimated, key)
+                self.assertGreater(confidence, 0.5)
+        self.assertEqual(Screener.estimate_key(np.zeros((12, 10))), (None, 0.0))
+
+    def test_summarize(self):
+        summary = self.screener.screen(self.loop, self.sample_rate)
+        self.assertEqual(summary["sample_rate"], 11025)
+        self.assertAlmostEqual(summary["duration"], 12, delta=0.01)
+        self.assertAlmostEqual(summary["tempo"], 128, delta=3)
+        self.assertEqual(summary["key"], "A minor")
+        self.assertEqual(len(summary["energy"]), 12)
+        # At least one onset per beat
+        self.assertGreaterEqual(summary["onset_density"], 128 / 60 - 0.2)
+
+        quiet = self.screener.screen(self.quiet, self.sample_rate)
+        self.assertLess(quiet["avg_energy"], summary["avg_energy"] - 40)
+
+    def test_passes(self):
+        summary = self.screener.screen(self.loop, self.sample_rate)
+        self.assertTrue(Screener.passes(summary))
+        self.assertTrue(Screener.passes(summary, bpm_range=(124, 132), keys={"A minor"}, min_energy=-30,
+                                        min_onset_density=1))
+        self.assertFalse(Screener.passes(summary, bpm_range=(90, 110)))
+        self.assertFalse(Screener.passes(summary, keys={"F minor"}))
+        self.assertFalse(Screener.passes(summary, min_onset_density=10))
+        self.assertFalse(Screener.passes(self.screener.screen(self.quiet, self.sample_rate), min_energy=-30))
+
+    def test_triage(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ("loop.wav", "quiet.wav")]
+            for path, audio in zip(paths, (self.loop, self.quiet)):
+                sf.write(path, audio, self.sample_rate)
+            results = self.screener.triage(paths, escalate=False, bpm_range=(120, 136), min_energy=-30)
+        self.assertEqual({path: result["passed"] for path, result in results.items()}, dict(zip(paths, (True, False))))
+        for result in results.values():
+            self.assertIsNone(result["features"])
+            self.assertEqual(result["full_time"], 0.0)
+            self.assertGreater(result["screening_time"], 0.0)
+        self.assertEqual(results[paths[0]]["screening"]["key"], "A minor")
+
+
+if __name__ == '__main__':
+    unittest.main()
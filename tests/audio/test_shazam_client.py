@@ -0,0 +1,156 @@
+import asyncio
+import unittest
+from unittest import mock
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from pydub import AudioSegment
+from technob.audio.search.shazam.algorithm import VectorizedSignatureGenerator
+from technob.audio.search.shazam.cache import RecognitionCache
+from technob.audio.search.shazam.client import AsyncShazamClient, TokenBucket
+from technob.audio.search.shazam.find import Shazam
+
+
+class MockShazamServer:
+    """Local stand-in of the recognition API: answers after `delay` seconds, failing the first requests."""
+
+    def __init__(self, delay=0.05, n_failures=0, failure_status=503):
+        self.delay = delay
+        self.n_failures = n_failures
+        self.failure_status = failure_status
+        self.n_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.payloads = []
+
+    async def handle(self, request):
+        self.n_requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            payload = await request.json()
+            await asyncio.sleep(self.delay)
+            if self.n_requests <= self.n_failures:
+                return web.Response(status=self.failure_status)
+            self.payloads.append(payload)
+            return web.json_response({"track": {"title": f"Song {len(payload['signature']['uri']) % 7}",
+                                                "subtitle": "Artist", "genres": {"primary": "Techno"}}})
+        finally:
+            self.in_flight -= 1
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/tag/{first}/{second}", self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.api_url = f"http://{self.server.host}:{self.server.port}/tag/%s/%s"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.server.close()
+
+
+def signatures(n, seconds=3):
+    rng = np.random.default_rng(0)
+    generator = VectorizedSignatureGenerator()
+    generator.feed_input((rng.normal(0, 3000, n * seconds * 16000)).astype(np.int16))
+    generator.MAX_TIME_SECONDS = seconds
+    return [generator.get_next_signature() for _ in range(n)]
+
+
+class TestAsyncShazamClient(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_limit(self):
+        async with MockShazamServer(delay=0.1) as server:
+            async with AsyncShazamClient(max_concurrency=8, requests_per_second=None, api_url=server.api_url) as client:
+                responses = await client.recognize_many(signatures(24))
+        self.assertEqual(len(responses), 24)
+        self.assertTrue(all("track" in response for response in responses))
+        # Requests overlap, up to the limit and no further
+        self.assertEqual(server.max_in_flight, 8)
+
+    async def test_retries(self):
+        async with MockShazamServer(delay=0, n_failures=2) as server:
+            async with AsyncShazamClient(max_retries=3, backoff=0.01, api_url=server.api_url) as client:
+                response = await client.recognize(signatures(1)[0])
+            self.assertIn("track", response)
+            self.assertEqual(client.stats, {"requests": 3, "retries": 2, "failures": 0})
+
+        async with MockShazamServer(delay=0, n_failures=10, failure_status=404) as server:
+            async with AsyncShazamClient(backoff=0.01, api_url=server.api_url) as client:
+                with self.assertRaises(Exception):
+                    await client.recognize(signatures(1)[0])
+            # Client errors are not retried
+            self.assertEqual(server.n_requests, 1)
+
+    async def test_timeout(self):
+        async with MockShazamServer(delay=1.0) as server:
+            async with AsyncShazamClient(timeout=0.1, max_retries=1, backoff=0.01, api_url=server.api_url) as client:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await client.recognize(signatures(1)[0])
+            self.assertEqual(client.stats["requests"], 2)
+
+    async def test_cache(self):
+        async with MockShazamServer(delay=0) as server:
+            async with AsyncShazamClient(api_url=server.api_url, cache=RecognitionCache(":memory:")) as client:
+                first = await client.recognize_many(signatures(5))
+                second = await client.recognize_many(signatures(5))
+        self.assertEqual(first, second)
+        self.assertEqual(server.n_requests, 5)
+        self.assertEqual(client.cache.stats["hits"], 5)
+
+    async def test_token_bucket(self):
+        # Simulated clock, advanced only by the waits of the bucket. The rate is a power of two, so that the waits
+        # add up exactly
+        clock = [100.0]
+        waits = []
+
+        async def sleep(delay):
+            waits.append(delay)
+            clock[0] += delay
+
+        with mock.patch("technob.audio.search.shazam.client.time", mock.Mock(monotonic=lambda: clock[0])), \
+                mock.patch("technob.audio.search.shazam.client.asyncio.sleep", sleep):
+            bucket = TokenBucket(rate=64, capacity=4)
+            for _ in range(4):
+                await bucket.acquire()
+            self.assertEqual(waits, [])
+            for _ in range(8):
+                await bucket.acquire()
+            # A burst of 4, then 8 more at 64 per second
+            self.assertEqual(waits, [1 / 64] * 8)
+            self.assertEqual(clock[0], 100.0 + 8 / 64)
+
+            # Idle time refills the bucket up to its capacity only
+            clock[0] += 10
+            for _ in range(4):
+                await bucket.acquire()
+            self.assertEqual(len(waits), 8)
+            await bucket.acquire()
+            self.assertEqual(waits[8:], [1 / 64])
+
+    async def test_async_get_songs(self):
+        samples = (np.random.default_rng(1).normal(0, 3000, 60 * 16000)).astype(np.int16)
+        shazam = Shazam(AudioSegment(samples.tobytes(), frame_rate=16000, sample_width=2, channels=1))
+        shazam.MAX_TIME_SECONDS = 3
+        async with MockShazamServer(delay=0.05) as server:
+            async with AsyncShazamClient(max_concurrency=4, api_url=server.api_url) as client:
+                songs = await shazam.async_get_songs(n_iterations=10, consecutive_matches=100, client=client)
+        self.assertEqual(len(server.payloads), 10)
+        self.assertTrue(songs)
+        self.assertTrue(all(song["artist"] == "Artist" for song in songs.values()))
+
+    async def test_get_songs_in_running_loop(self):
+        samples = (np.random.default_rng(1).normal(0, 3000, 30 * 16000)).astype(np.int16)
+        shazam = Shazam(AudioSegment(samples.tobytes(), frame_rate=16000, sample_width=2, channels=1))
+        shazam.MAX_TIME_SECONDS = 3
+        response = {"track": {"title": "Song", "subtitle": "Artist", "genres": {"primary": "Techno"}}}
+        # asyncio.run would fail in this loop: the recognitions fall back to the serial path
+        with mock.patch.object(shazam, "sendRecognizeRequest", return_value=response) as send, \
+                self.assertWarnsRegex(RuntimeWarning, "async_get_songs"):
+            songs = shazam.get_songs(n_iterations=4, consecutive_matches=100, max_concurrency=4)
+        self.assertEqual(send.call_count, 4)
+        self.assertEqual(list(songs), ["Song"])
+
+
+if __name__ == '__main__':
+    unittest.main()
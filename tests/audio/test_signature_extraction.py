@@ -0,0 +1,40 @@
+import unittest
+import numpy as np
+from pydub import AudioSegment
+from technob.audio.search.shazam.algorithm import VectorizedSignatureGenerator
+from technob.audio.search.shazam.extraction import SignatureExtractor
+from synthetic_audio import synthetic_track
+
+
+class TestSignatureExtractor(unittest.TestCase):
+    def setUp(self):
+        self.samples = synthetic_track(60)
+
+    def test_window_offsets(self):
+        extractor = SignatureExtractor(signature_seconds=8, hop_seconds=15)
+        np.testing.assert_array_equal(extractor.window_offsets(60), [0, 15, 30, 45])
+        np.testing.assert_array_equal(extractor.window_offsets(5), [0])
+
+    def test_parallel_matches_serial(self):
+        generator = VectorizedSignatureGenerator()
+        generator.feed_input(self.samples)
+        offsets = [37.5, 0, 12.25, 3, 59.99, 80]
+        expected = [(offset, generator.signature_at(offset, 8).encode_to_binary()) for offset in sorted(offsets)[:-1]]
+
+        for n_workers in (1, 2):
+            with self.subTest(n_workers=n_workers):
+                extractor = SignatureExtractor(signature_seconds=8, n_workers=n_workers, chunk_size=2)
+                result = extractor.extract(self.samples, offsets)
+                self.assertEqual([(offset, signature.encode_to_binary()) for offset, signature in result], expected)
+
+    def test_audio_segment_input(self):
+        segment = AudioSegment(self.samples.tobytes(), frame_rate=16000, sample_width=2, channels=1)
+        samples = SignatureExtractor.load_samples(segment)
+        np.testing.assert_array_equal(samples, self.samples)
+        result = SignatureExtractor(signature_seconds=4, hop_seconds=20, n_workers=1).extract(segment)
+        self.assertEqual([offset for offset, _ in result], [0, 20, 40])
+        self.assertTrue(all(signature.number_samples == 4 * 16000 for _, signature in result))
+
+
+if __name__ == '__main__':
+    unittest.main()
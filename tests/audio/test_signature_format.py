@@ -0,0 +1,136 @@
+import unittest
+from io import BytesIO
+import numpy as np
+from technob.audio.search.shazam.signature_format import (DecodedMessage, FrequencyBand, FrequencyPeak, FrequencyPeaks,
+                                                          decode_frequency_peaks, encode_frequency_peaks)
+
+
+def random_signature(rng, number_peaks=300, max_gap=40):
+    signature = DecodedMessage()
+    signature.sample_rate_hz = 16000
+    signature.number_samples = int(rng.integers(0, 16000 * 20))
+    signature.frequency_band_to_sound_peaks = {}
+    for band in rng.choice(list(FrequencyBand)[1:], size=int(rng.integers(1, 5)), replace=False):
+        n = int(rng.integers(0, number_peaks))
+        signature.frequency_band_to_sound_peaks[FrequencyBand(band)] = FrequencyPeaks.from_arrays(
+            np.cumsum(rng.integers(0, max_gap, n)), rng.integers(0, 1 << 16, n), rng.integers(0, 1 << 16, n))
+    return signature
+
+
+def reference_encode(frequency_peaks):
+    """Per-peak encoding of a band, as written before the vectorized codec."""
+    peaks_buf = BytesIO()
+    fft_pass_number = 0
+    for frequency_peak in frequency_peaks:
+        assert frequency_peak.fft_pass_number >= fft_pass_number
+        if frequency_peak.fft_pass_number - fft_pass_number >= 255:
+            peaks_buf.write(b'\xff')
+            peaks_buf.write(frequency_peak.fft_pass_number.to_bytes(4, 'little'))
+            fft_pass_number = frequency_peak.fft_pass_number
+        peaks_buf.write(bytes([frequency_peak.fft_pass_number - fft_pass_number]))
+        peaks_buf.write(frequency_peak.peak_magnitude.to_bytes(2, 'little'))
+        peaks_buf.write(frequency_peak.corrected_peak_frequency_bin.to_bytes(2, 'little'))
+        fft_pass_number = frequency_peak.fft_pass_number
+    return peaks_buf.getvalue()
+
+
+def reference_decode(payload):
+    """Per-peak decoding of a band, as read before the vectorized codec."""
+    frequency_peaks_buf = BytesIO(payload)
+    fft_pass_number = 0
+    peaks = []
+    while True:
+        raw_fft_pass = frequency_peaks_buf.read(1)
+        if not raw_fft_pass:
+            return peaks
+        if raw_fft_pass[0] == 0xff:
+            fft_pass_number = int.from_bytes(frequency_peaks_buf.read(4), 'little')
+            continue
+        fft_pass_number += raw_fft_pass[0]
+        peaks.append((fft_pass_number, int.from_bytes(frequency_peaks_buf.read(2), 'little'),
+                      int.from_bytes(frequency_peaks_buf.read(2), 'little')))
+
+
+class TestFrequencyPeaks(unittest.TestCase):
+    def test_list_interface(self):
+        peaks = FrequencyPeaks(16000)
+        for i in range(100):
+            peaks.append(FrequencyPeak(i, 1000 + i, 20000 + i, 16000))
+        peaks.extend([100, 101], [5, 6], [7, 8])
+        self.assertEqual(len(peaks), 102)
+        self.assertEqual((peaks[3].fft_pass_number, peaks[3].peak_magnitude, peaks[3].corrected_peak_frequency_bin),
+                         (3, 1003, 20003))
+        self.assertEqual(peaks[-1].corrected_peak_frequency_bin, 8)
+        self.assertEqual([peak.fft_pass_number for peak in peaks[98:]], [98, 99, 100, 101])
+        self.assertEqual([peak.fft_pass_number for peak in peaks[::25]], [0, 25, 50, 75, 100])
+        self.assertAlmostEqual(peaks[0].get_frequency_hz(), 20000 * 16000 / 2 / 1024 / 64)
+        self.assertEqual(peaks.array.nbytes, 102 * 8)
+        with self.assertRaises(OverflowError):
+            peaks.extend([1], [1 << 16], [0])
+
+    def test_binary_and_json_round_trip(self):
+        signature = random_signature(np.random.default_rng(0))
+        decoded = DecodedMessage.decode_from_binary(signature.encode_to_binary())
+        self.assertEqual(decoded.frequency_band_to_sound_peaks, signature.frequency_band_to_sound_peaks)
+        self.assertEqual(decoded.number_peaks, signature.number_peaks)
+        self.assertEqual(decoded.encode_to_json(), signature.encode_to_json())
+
+    def test_stepped_slice_round_trip(self):
+        signature = random_signature(np.random.default_rng(4))
+        for band, peaks in signature.frequency_band_to_sound_peaks.items():
+            signature.frequency_band_to_sound_peaks[band] = peaks[::2]
+        decoded = DecodedMessage.decode_from_binary(signature.encode_to_binary())
+        self.assertEqual(decoded.frequency_band_to_sound_peaks, signature.frequency_band_to_sound_peaks)
+
+
+
+class TestPeakCodec(unittest.TestCase):
+    def test_encoding_fuzz(self):
+        rng = np.random.default_rng(1)
+        for _ in range(300):
+            # Gaps around the 255 escape threshold, repeated pass numbers and large jumps
+            n = int(rng.integers(0, 200))
+            gaps = rng.choice([0, 1, 254, 255, 256, 1000, 1 << 20], size=n, p=[.3, .3, .1, .1, .1, .05, .05])
+            peaks = FrequencyPeaks.from_arrays(np.cumsum(gaps) + int(rng.integers(0, 300)),
+                                               rng.integers(0, 1 << 16, n), rng.integers(0, 1 << 16, n))
+            payload = encode_frequency_peaks(peaks)
+            self.assertEqual(payload, reference_encode(list(peaks)))
+            self.assertEqual(payload, encode_frequency_peaks(list(peaks)))
+            self.assertEqual(decode_frequency_peaks(payload, 16000), peaks)
+
+    def test_encoding_of_non_contiguous_arrays(self):
+        rng = np.random.default_rng(5)
+        peaks = FrequencyPeaks.from_arrays(np.cumsum(rng.integers(0, 400, 100)), rng.integers(0, 1 << 16, 100),
+                                           rng.integers(0, 1 << 16, 100))
+        # Arrays built by the caller: a strided view, and the peak fields inside a wider record
+        wide = np.zeros(len(peaks), dtype=[('peak', peaks.array.dtype), ('extra', '<u4')])
+        wide['peak'] = peaks.array
+        for array in (peaks.array[::3], wide['peak']):
+            with self.subTest(strides=array.strides):
+                self.assertFalse(array.flags.c_contiguous)
+                payload = encode_frequency_peaks(FrequencyPeaks(16000, array))
+                self.assertEqual(payload, reference_encode(list(FrequencyPeaks(16000, array.copy()))))
+
+    def test_decoding_fuzz(self):
+        rng = np.random.default_rng(2)
+        for _ in range(300):
+            # Arbitrary 5-byte records, including consecutive escapes that the encoder never writes
+            records = rng.integers(0, 256, size=(int(rng.integers(0, 200)), 5), dtype=np.uint8)
+            records[rng.random(len(records)) < 0.2, 0] = 0xff
+            records[records[:, 0] == 0xff, 4] %= 8
+            payload = records.tobytes()
+            decoded = decode_frequency_peaks(payload, 16000)
+            self.assertEqual(decoded.array.tolist(), reference_decode(payload))
+
+    def test_signature_round_trip(self):
+        rng = np.random.default_rng(3)
+        for signature in [random_signature(rng, number_peaks=2000) for _ in range(20)]:
+            encoded = signature.encode_to_binary()
+            result = DecodedMessage.decode_from_binary(encoded)
+            self.assertEqual(result.frequency_band_to_sound_peaks, signature.frequency_band_to_sound_peaks)
+            self.assertEqual(result.number_samples, signature.number_samples)
+            self.assertEqual(result.encode_to_binary(), encoded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+from array import array
+import numpy as np
+from technob.audio.search.shazam.algorithm import (SampleBuffer, SignatureGenerator, VectorizedSignatureGenerator,
+                                                   spread_fft_outputs)
+from synthetic_audio import synthetic_track
+
+
+def signatures(generator, samples, max_time_seconds=3.1, skipped_samples=0):
+    generator.feed_input(samples)
+    generator.MAX_TIME_SECONDS = max_time_seconds
+    generator.samples_processed += skipped_samples
+    result = []
+    while True:
+        signature = generator.get_next_signature()
+        if not signature:
+            return result
+        result.append((signature.encode_to_binary(), generator.samples_processed))
+
+
+def buffer_of(samples):
+    buffer = SampleBuffer()
+    buffer.append(samples)
+    return buffer
+
+
+class TestVectorizedSignatureGenerator(unittest.TestCase):
+    def setUp(self):
+        self.samples = synthetic_track(12)
+
+    def test_identical_to_signature_generator(self):
+        for max_time_seconds, skipped_samples in ((3.1, 0), (8, 16000 + 64)):
+            with self.subTest(max_time_seconds=max_time_seconds):
+                expected = signatures(SignatureGenerator(), self.samples.tolist(), max_time_seconds, skipped_samples)
+                result = signatures(VectorizedSignatureGenerator(), self.samples, max_time_seconds, skipped_samples)
+                self.assertGreater(len(expected), 1)
+                self.assertEqual(result, expected)
+
+    def test_fed_in_chunks_and_silence(self):
+        generator = VectorizedSignatureGenerator()
+        for chunk in np.array_split(self.samples, 7):
+            generator.feed_input(chunk)
+        self.assertEqual(signatures(generator, []), signatures(VectorizedSignatureGenerator(), self.samples))
+
+        silent = VectorizedSignatureGenerator()
+        silent.feed_input(np.zeros(16000 * 4 + 100, dtype=np.int16))
+        signature = silent.get_next_signature()
+        self.assertEqual(signature.number_samples, 16000 * 4 // 128 * 128)
+        self.assertEqual(signature.frequency_band_to_sound_peaks, {})
+        self.assertIsNone(silent.get_next_signature())
+
+    def test_signature_at(self):
+        generator = VectorizedSignatureGenerator()
+        generator.feed_input(self.samples)
+        for offset_seconds in (0.0, 2.5, 7.01):
+            start = int(round(offset_seconds * 16000))
+
+            # Without warm-up: the signature that get_next_signature() returns from that offset
+            stream = VectorizedSignatureGenerator()
+            stream.feed_input(self.samples)
+            stream.samples_processed, stream.MAX_TIME_SECONDS, stream.MAX_PEAKS = start, 4.0, 0
+            cold = generator.signature_at(offset_seconds, 4.0, warm_up=False)
+            self.assertEqual(cold.encode_to_binary(), stream.get_next_signature().encode_to_binary())
+
+            # With warm-up: the peaks of a stream started 60 hops (45 FFTs and a full ring buffer) earlier
+            warm = generator.signature_at(offset_seconds, 4.0)
+            stream = VectorizedSignatureGenerator()
+            stream.feed_input(np.concatenate((np.zeros(60 * 128, dtype=np.int16), self.samples)))
+            stream.samples_processed, stream.MAX_PEAKS = start, 0
+            stream.MAX_TIME_SECONDS = warm.number_samples / 16000 + 60 * 128 / 16000
+            expected = {}
+            for band, peaks in stream.get_next_signature().frequency_band_to_sound_peaks.items():
+                expected[band] = peaks.array[peaks.array['fft_pass_number'] >= 60]
+                expected[band]['fft_pass_number'] -= 60
+            self.assertEqual({band: peaks.array.tolist() for band, peaks in warm.frequency_band_to_sound_peaks.items()},
+                             {band: peaks.tolist() for band, peaks in expected.items() if len(peaks)})
+
+        self.assertEqual(generator.samples_processed, 0)
+        self.assertIsNone(generator.signature_at(len(self.samples) / 16000))
+
+    def test_sample_buffer(self):
+        pcm = array('h', self.samples.tolist())
+        for fed in (self.samples, pcm, memoryview(pcm), self.samples.tobytes(), self.samples.tolist()):
+            buffer = SampleBuffer()
+            buffer += fed
+            np.testing.assert_array_equal(buffer[:], self.samples)
+        self.assertTrue(np.shares_memory(buffer_of(self.samples)[100:228], self.samples))
+        self.assertTrue(np.shares_memory(buffer_of(pcm)[100:228], np.frombuffer(pcm, dtype=np.int16)))
+
+        # Slices spanning chunks are stitched together
+        buffer = SampleBuffer()
+        for chunk in np.array_split(self.samples, [1000, 1100, 1101, 50000]):
+            buffer.append(chunk)
+        self.assertEqual(len(buffer), len(self.samples))
+        for start, stop in ((0, 128), (900, 1300), (1099, 1102), (49990, 50010), (len(self.samples) - 5, None)):
+            np.testing.assert_array_equal(buffer[start:stop], self.samples[start:stop])
+
+        # Integer indices and strided slices behave as for a list
+        self.assertEqual((buffer[0], buffer[1100], buffer[-1]),
+                         (int(self.samples[0]), int(self.samples[1100]), int(self.samples[-1])))
+        np.testing.assert_array_equal(buffer[990:1110:7], self.samples[990:1110:7])
+        with self.assertRaises(IndexError):
+            buffer[len(self.samples)]
+        with self.assertRaises(TypeError):
+            buffer["0"]
+
+        # Other integer formats keep their values, and samples that are not 16-bit integers are rejected
+        np.testing.assert_array_equal(buffer_of(array('b', [-128, 5, 127]))[:], [-128, 5, 127])
+        np.testing.assert_array_equal(buffer_of(array('i', [-7, 1, 2]))[:], [-7, 1, 2])
+        with self.assertRaises(ValueError):
+            buffer_of(array('i', [70000, 1, 2]))
+        with self.assertRaises(TypeError):
+            buffer_of(array('f', [0.5, 1.0]))
+
+        generator = SignatureGenerator()
+        generator.feed_input(pcm)
+        expected = VectorizedSignatureGenerator()
+        expected.feed_input(self.samples)
+        self.assertEqual(generator.get_next_signature().encode_to_binary(),
+                         expected.get_next_signature().encode_to_binary())
+
+    def test_spreading_matches_sequential_updates(self):
+        fft_outputs = np.random.default_rng(1).exponential(size=(80, 1025))
+        # Ring of spread FFTs updated in place, one position at a time, as in the original list-based loop
+        ring = [[0] * 1025 for _ in range(256)]
+        for number, fft_output in enumerate(fft_outputs):
+            spread = list(fft_output)
+            for position in range(1025):
+                if position < 1023:
+                    spread[position] = max(spread[position:position + 3])
+                max_value = spread[position]
+                for former in (-1, -3, -6):
+                    ring[(number + former) % 256][position] = max_value = max(ring[(number + former) % 256][position], max_value)
+            ring[number] = spread
+        expected = np.array([ring[number % 256] for number in range(-45, 80 - 6)])
+        np.testing.assert_array_equal(spread_fft_outputs(fft_outputs)[:len(expected)], expected)
+
+    def test_long_clip(self):
+        result = signatures(VectorizedSignatureGenerator(), synthetic_track(120))
+        self.assertGreater(len(result), 30)
+        self.assertEqual(result[-1][1], 120 * 16000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from technob.audio.search.similarity import SimilarityIndex, track_embedding
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # Clustered embeddings, closer to a music library than uniform noise
+        centers = rng.normal(size=(50, 64))
+        vectors = centers[rng.integers(0, 50, 5000)] + 0.3 * rng.normal(size=(5000, 64))
+        self.vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+        self.ids = [f"track-{i}" for i in range(len(self.vectors))]
+        self.queries = self.vectors[rng.integers(0, len(self.vectors), 50)]
+
+    def test_track_embedding(self):
+        rng = np.random.default_rng(1)
+        features = {
+            "timbre_frames": np.matrix(rng.normal(size=(100, 39))),
+            "pitch_frames": rng.random((100, 12)),
+            "intensity_frames": rng.normal(size=(100, 84)) - 40,
+        }
+        embedding = track_embedding(features)
+        self.assertEqual(embedding.shape, (2 * (39 + 12 + 84),))
+        self.assertAlmostEqual(float(np.linalg.norm(embedding)), 1.0, places=5)
+
+    def test_exact_search(self):
+        index = SimilarityIndex(64)
+        index.add(self.ids, self.vectors)
+        results = index.search(self.vectors[42], k=5)
+        self.assertEqual(results[0][0], "track-42")
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(a[1] >= b[1] for a, b in zip(results, results[1:])))
+
+    def test_ivf_recall(self):
+        exact = SimilarityIndex(64)
+        exact.add(self.ids, self.vectors)
+        for pq_subvectors in (None, 8):
+            with self.subTest(pq_subvectors=pq_subvectors):
+                index = SimilarityIndex(64, mode="ivf", n_lists=32, n_probe=8, pq_subvectors=pq_subvectors)
+                index.add(self.ids, self.vectors)
+                index.train()
+                recall = np.mean([
+                    len({i for i, _ in index.search(q, 10)} & {i for i, _ in exact.search(q, 10)}) / 10
+                    for q in self.queries
+                ])
+                self.assertGreater(recall, 0.8)
+
+    def test_incremental_insertion_and_persistence(self):
+        index = SimilarityIndex(64, mode="ivf", n_lists=16, n_probe=16, pq_subvectors=8)
+        index.add(self.ids[:4000], self.vectors[:4000])
+        index.train()
+        for track_id, vector in zip(self.ids[4000:], self.vectors[4000:]):
+            index.add(track_id, vector)
+        self.assertEqual(len(index), 5000)
+        self.assertEqual(index.search(self.vectors[4321], 1)[0][0], "track-4321")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.npz")
+            index.save(path)
+            loaded = SimilarityIndex.load(path)
+        self.assertEqual(len(loaded), 5000)
+        for query in self.queries[:10]:
+            self.assertEqual(loaded.search(query, 5), index.search(query, 5))
+        loaded.add("new-track", self.vectors[0])
+        self.assertEqual(len(loaded), 5001)
+
+    def test_incremental_lists_match_rebuilt_lists(self):
+        index = SimilarityIndex(64, mode="ivf", n_lists=16, n_probe=4)
+        index.add(self.ids[:2000], self.vectors[:2000])
+        index.train()
+        index.add(self.ids[2000:3000], self.vectors[2000:3000])
+        # Replace tracks with vectors from other cells, one of them twice in the same call
+        index.add(self.ids[:10] + [self.ids[0]], self.vectors[-11:])
+        index.add(self.ids[2000], self.vectors[0])
+
+        incremental = [set(index._cell_rows(c).tolist()) for c in range(len(index.centroids))]
+        results = [index.search(q, 10) for q in self.queries]
+        index._build_lists()
+        self.assertEqual(incremental, [set(index._cell_rows(c).tolist()) for c in range(len(index.centroids))])
+        self.assertEqual(sum(map(len, incremental)), len(index))
+        self.assertEqual(results, [index.search(q, 10) for q in self.queries])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import soundfile as sf
+from technob.audio.stretch import TimeStretcher, VarispeedFile, varispeed
+
+
+class TestTimeStretcher(unittest.TestCase):
+    def setUp(self):
+        self.sample_rate = 22050
+        self.length = 10 * self.sample_rate
+        t = np.arange(self.length) / self.sample_rate
+        self.tone = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+        self.click_times = np.arange(0.5, 9.5, 0.5)
+        self.clicks = np.zeros(self.length, dtype=np.float32)
+        self.clicks[np.round(self.click_times * self.sample_rate).astype(int)] = 1.0
+        self.ratio = 128 / 125
+        self.time_map = [(0, 0), (self.length, int(self.length / self.ratio))]
+
+    def test_length_and_pitch_preserved(self):
+        for method in ("phase_vocoder", "wsola"):
+            with self.subTest(method=method):
+                output = TimeStretcher(method).stretch(self.tone, self.time_map)
+                self.assertEqual(output.dtype, np.float32)
+                self.assertEqual(len(output), self.time_map[-1][1])
+                segment = output[self.sample_rate:5 * self.sample_rate]
+                frequency = np.argmax(np.abs(np.fft.rfft(segment))) * self.sample_rate / len(segment)
+                self.assertAlmostEqual(frequency, 440, delta=1)
+                self.assertAlmostEqual(float(segment.std() / self.tone.std()), 1.0, delta=0.05)
+
+    def test_beats_follow_time_map(self):
+        stretcher = TimeStretcher("wsola")
+        output = stretcher.stretch(self.clicks, self.time_map)
+        expected = np.round(self.click_times * self.sample_rate / self.ratio).astype(int)
+        window = self.sample_rate // 20
+        errors = [np.argmax(np.abs(output[e - window:e + window])) - window for e in expected]
+        self.assertLessEqual(np.max(np.abs(errors)), stretcher.tolerance + 1)
+
+    def test_stream_matches_stretch_and_keeps_channels(self):
+        stereo = np.stack([self.tone, self.clicks], axis=1)
+        for method in ("phase_vocoder", "wsola"):
+            with self.subTest(method=method):
+                output = TimeStretcher(method).stretch(stereo, self.time_map)
+                chunks = list(TimeStretcher(method, chunk_size=4096).stream(stereo, self.time_map))
+                self.assertGreater(len(chunks), 1)
+                self.assertEqual(output.shape, (self.time_map[-1][1], 2))
+                np.testing.assert_allclose(np.concatenate(chunks), output, atol=1e-5)
+
+    def test_varispeed_changes_tempo_and_pitch_together(self):
+        output, speed = varispeed(self.tone, self.ratio)
+        self.assertAlmostEqual(speed, self.ratio, places=6)
+        self.assertEqual(output.dtype, np.float32)
+        self.assertAlmostEqual(len(output), self.length / self.ratio, delta=1)
+        segment = output[self.sample_rate:5 * self.sample_rate]
+        frequency = np.argmax(np.abs(np.fft.rfft(segment))) * self.sample_rate / len(segment)
+        self.assertAlmostEqual(frequency, 440 * self.ratio, delta=1)
+
+    def test_varispeed_file_reads_blocks_of_varispeed(self):
+        stereo = np.stack([self.tone, self.clicks], axis=1)
+        with tempfile.TemporaryDirectory() as directory:
+            for audio_data in (self.tone, stereo):
+                path = os.path.join(directory, "loop.wav")
+                sf.write(path, audio_data, self.sample_rate, subtype="FLOAT")
+                for speed in (self.ratio, 1 / self.ratio, 1.0):
+                    expected, _ = varispeed(audio_data, speed)
+                    with VarispeedFile(path, speed) as f:
+                        self.assertEqual(f.frames, len(expected))
+                        for block_size in (1000, 30001):
+                            with self.subTest(channels=audio_data.ndim, speed=speed, block_size=block_size):
+                                f.seek(0)
+                                blocks = [f.read(block_size) for _ in range(0, f.frames, block_size)]
+                                np.testing.assert_allclose(np.concatenate(blocks), expected, atol=1e-6)
+                        # Reads from the middle of the file
+                        f.seek(12345)
+                        np.testing.assert_allclose(f.read(5000, always_2d=True),
+                                                   expected[12345:17345].reshape(5000, -1), atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from technob.audio.quantize import QuantizeRenderer
+from technob.audio.stretch import TimeStretcher
+
+
+class TestTimeMap(unittest.TestCase):
+    """Property checks of the beat grid and time map over seeded random beat sequences."""
+
+    def setUp(self):
+        self.renderer = QuantizeRenderer()
+        self.rng = np.random.default_rng(0)
+
+    def random_case(self):
+        sample_rate = int(self.rng.choice([22050, 44100, 48000]))
+        n_samples = int(self.rng.integers(0, 30 * sample_rate))
+        original_bpm = float(self.rng.uniform(60, 200))
+        target_bpm = float(self.rng.uniform(60, 200))
+        n_beats = int(self.rng.integers(0, 80))
+        # Beats may repeat, or fall on the first sample or past the end of the audio
+        beat_frames = np.sort(self.rng.integers(0, max(1, int(n_samples * 1.1)), n_beats))
+        if n_beats and self.rng.random() < 0.2:
+            beat_frames[0] = 0
+        return sample_rate, n_samples, original_bpm, target_bpm, beat_frames
+
+    def test_fixed_beats_follow_target_tempo(self):
+        for _ in range(200):
+            sample_rate, _, original_bpm, target_bpm, beat_frames = self.random_case()
+            fixed = self.renderer.calculate_fixed_beat_frames(beat_frames, original_bpm, target_bpm, sample_rate)
+            self.assertEqual(fixed.dtype, np.int64)
+            self.assertEqual(len(fixed), len(beat_frames))
+            if len(fixed) > 1:
+                self.assertLessEqual(np.abs(np.diff(fixed) - 60 * sample_rate / target_bpm).max(), 1)
+
+    def test_time_map_properties(self):
+        for _ in range(500):
+            sample_rate, n_samples, original_bpm, target_bpm, beat_frames = self.random_case()
+            fixed = self.renderer.calculate_fixed_beat_frames(beat_frames, original_bpm, target_bpm, sample_rate)
+            time_map = self.renderer.create_time_map(beat_frames, fixed, n_samples, original_bpm, target_bpm)
+            with self.subTest(n_samples=n_samples, n_beats=len(beat_frames)):
+                self.assertEqual(time_map.dtype, np.int64)
+                self.assertEqual(time_map.shape[1], 2)
+                # End points: starts at (0, 0), ends at the length of the audio
+                np.testing.assert_array_equal(time_map[0], [0, 0])
+                self.assertEqual(time_map[-1, 0], n_samples)
+                self.assertGreaterEqual(time_map[-1, 1], 0)
+                # Monotonic, strictly between the end points
+                if n_samples > 0:
+                    self.assertTrue(np.all(np.diff(time_map[:, 0]) > 0))
+                    self.assertTrue(np.all(np.diff(time_map[:-1, 1]) > 0))
+                    self.assertTrue(np.all(np.diff(time_map[:, 1]) >= 0))
+                # Every pair inside the map moves a beat to its fixed beat
+                pairs = {tuple(pair) for pair in np.stack([beat_frames, fixed], axis=1).tolist()}
+                self.assertTrue(all(tuple(pair) in pairs for pair in time_map[1:-1].tolist()))
+
+    def test_time_map_feeds_native_stretcher(self):
+        for _ in range(5):
+            sample_rate, n_samples, original_bpm, target_bpm, beat_frames = self.random_case()
+            n_samples = min(n_samples, 2 * sample_rate) + 1
+            beat_frames = beat_frames[beat_frames < n_samples]
+            fixed = self.renderer.calculate_fixed_beat_frames(beat_frames, original_bpm, target_bpm, sample_rate)
+            time_map = self.renderer.create_time_map(beat_frames, fixed, n_samples, original_bpm, target_bpm)
+            audio = self.rng.normal(size=n_samples).astype(np.float32)
+            self.assertEqual(len(TimeStretcher("wsola").stretch(audio, time_map)), time_map[-1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()